@@ -0,0 +1,18 @@
+"""
+Celery app for the backend. Workers and beat run with:
+
+    celery -A backend worker
+    celery -A backend beat
+
+Tasks are discovered from each app's tasks.py; the periodic schedule is
+CELERY_BEAT_SCHEDULE in settings.
+"""
+import os
+
+from celery import Celery
+
+os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'backend.settings')
+
+app = Celery('backend')
+app.config_from_object('django.conf:settings', namespace='CELERY')
+app.autodiscover_tasks()
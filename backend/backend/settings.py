@@ -34,6 +34,9 @@ ALLOWED_HOSTS = ["*", "127.0.0.1", "localhost"]
 # APPLICATIONS
 # ---------------------------------------------------------------------
 INSTALLED_APPS = [
+    # ASGI server; must precede staticfiles so runserver serves WebSockets too
+    "daphne",
+
     # Django apps
     "django.contrib.admin",
     "django.contrib.auth",
@@ -47,6 +50,7 @@ INSTALLED_APPS = [
     "rest_framework",
     "rest_framework_simplejwt",
     "corsheaders",
+    "channels",
 
     # Your apps
     "employees",
@@ -59,7 +63,7 @@ INSTALLED_APPS = [
     "chats",
     "dashboard",
     "reports",
-    
+    "ticketing",
 ]
 
 # ---------------------------------------------------------------------
@@ -98,6 +102,7 @@ TEMPLATES = [
 ]
 
 WSGI_APPLICATION = "backend.wsgi.application"
+ASGI_APPLICATION = "backend.asgi.application"
 
 # ---------------------------------------------------------------------
 # DATABASE CONFIG (Neon → Fallback to SQLite automatically)
@@ -187,6 +192,76 @@ LOGGING = {
     "root": {"handlers": ["console"], "level": "INFO"},
 }
 
+# ---------------------------------------------------------------------
+# CACHING
+# ---------------------------------------------------------------------
+# Seconds the landing-page dashboard aggregates are served from cache
+DASHBOARD_CACHE_TTL = int(os.getenv("DASHBOARD_CACHE_TTL", "15"))
+
+# ---------------------------------------------------------------------
+# TICKETING
+# ---------------------------------------------------------------------
+# Ticket numbers each worker reserves from TicketSequence per round trip
+TICKET_NUMBER_BLOCK_SIZE = int(os.getenv("TICKET_NUMBER_BLOCK_SIZE", "20"))
+
+# Base URL used for ticket links in notification emails
+FRONTEND_URL = os.getenv("FRONTEND_URL", "http://localhost:3000")
+
+# Arm a Celery ETA timer per ticket deadline; the periodic sweep remains the safety net
+SLA_TIMERS_ENABLED = os.getenv("SLA_TIMERS_ENABLED", "True") == "True"
+
+# Overdue tickets processed per transaction by check_sla_breaches
+SLA_SWEEP_BATCH_SIZE = int(os.getenv("SLA_SWEEP_BATCH_SIZE", "500"))
+
+# How often check_sla_breaches sweeps for breaches whose timer was lost
+SLA_SWEEP_INTERVAL_MINUTES = int(os.getenv("SLA_SWEEP_INTERVAL_MINUTES", "10"))
+
+# Notification outbox: rows claimed per dispatch, delivery attempts, first retry delay
+NOTIFICATION_BATCH_SIZE = int(os.getenv("NOTIFICATION_BATCH_SIZE", "200"))
+NOTIFICATION_MAX_ATTEMPTS = int(os.getenv("NOTIFICATION_MAX_ATTEMPTS", "5"))
+NOTIFICATION_RETRY_SECONDS = int(os.getenv("NOTIFICATION_RETRY_SECONDS", "60"))
+
+# Digest recipients get their buffered events early once this many are waiting
+NOTIFICATION_DIGEST_MAX_EVENTS = int(os.getenv("NOTIFICATION_DIGEST_MAX_EVENTS", "50"))
+
+# Safety-net dispatch for retries and digests whose scheduled flush was lost
+NOTIFICATION_DISPATCH_INTERVAL_MINUTES = int(os.getenv("NOTIFICATION_DISPATCH_INTERVAL_MINUTES", "5"))
+
+# Chunked attachment uploads: largest accepted chunk and file, in bytes
+ATTACHMENT_CHUNK_MAX_BYTES = int(os.getenv("ATTACHMENT_CHUNK_MAX_BYTES", str(8 * 1024 * 1024)))
+ATTACHMENT_MAX_BYTES = int(os.getenv("ATTACHMENT_MAX_BYTES", str(2 * 1024 * 1024 * 1024)))
+
+# Unfinished uploads idle this long are purged with their chunks, checked this often
+ATTACHMENT_UPLOAD_MAX_AGE_HOURS = int(os.getenv("ATTACHMENT_UPLOAD_MAX_AGE_HOURS", "48"))
+ATTACHMENT_PURGE_INTERVAL_HOURS = int(os.getenv("ATTACHMENT_PURGE_INTERVAL_HOURS", "1"))
+
+# How often the auto-assignment load counters are recomputed from the tickets,
+# repairing drift from queryset updates and deletes that bypass Ticket.save()
+ASSIGNEE_LOAD_REFRESH_INTERVAL_MINUTES = int(os.getenv("ASSIGNEE_LOAD_REFRESH_INTERVAL_MINUTES", "30"))
+
+# Most tickets one bulk transition/assign/close request may change
+TICKET_BULK_MAX = int(os.getenv("TICKET_BULK_MAX", "500"))
+
+# Most records one /tickets/ingest/ batch may carry
+TICKET_INGEST_MAX = int(os.getenv("TICKET_INGEST_MAX", "1000"))
+
+# Real-time ticket events (Django Channels). The in-memory layer only reaches
+# sockets served by the same process; set CHANNEL_REDIS_URL to share events
+# between ASGI workers.
+CHANNEL_REDIS_URL = os.getenv("CHANNEL_REDIS_URL")
+CHANNEL_LAYERS = {
+    "default": {
+        "BACKEND": "channels_redis.core.RedisChannelLayer",
+        "CONFIG": {"hosts": [CHANNEL_REDIS_URL]},
+    } if CHANNEL_REDIS_URL else {
+        "BACKEND": "channels.layers.InMemoryChannelLayer",
+    },
+}
+
+# Closed tickets untouched for this many days move to the archive tables, in chunks
+TICKET_ARCHIVE_AFTER_DAYS = int(os.getenv("TICKET_ARCHIVE_AFTER_DAYS", "365"))
+TICKET_ARCHIVE_CHUNK_SIZE = int(os.getenv("TICKET_ARCHIVE_CHUNK_SIZE", "500"))
+
 # ---------------------------------------------------------------------
 # SIMPLE JWT SETTINGS
 # ---------------------------------------------------------------------
@@ -199,3 +274,52 @@ SIMPLE_JWT = {
     "BLACKLIST_AFTER_ROTATION": True,
     "AUTH_HEADER_TYPES": ("Bearer",),
 }
+
+# ---------------------------------------------------------------------
+# CELERY
+# ---------------------------------------------------------------------
+from celery.schedules import crontab
+
+CELERY_BROKER_URL = os.getenv("CELERY_BROKER_URL", "redis://localhost:6379/0")
+CELERY_TIMEZONE = TIME_ZONE
+
+# When the nightly dashboard metrics snapshot is taken (CELERY_TIMEZONE)
+DASHBOARD_SNAPSHOT_HOUR = int(os.getenv("DASHBOARD_SNAPSHOT_HOUR", "23"))
+DASHBOARD_SNAPSHOT_MINUTE = int(os.getenv("DASHBOARD_SNAPSHOT_MINUTE", "55"))
+
+# How often new ticket activity is folded into the analytics aggregates
+TICKET_ANALYTICS_INTERVAL_MINUTES = int(os.getenv("TICKET_ANALYTICS_INTERVAL_MINUTES", "15"))
+
+# When the nightly archival of old closed tickets runs (CELERY_TIMEZONE)
+TICKET_ARCHIVE_HOUR = int(os.getenv("TICKET_ARCHIVE_HOUR", "2"))
+
+CELERY_BEAT_SCHEDULE = {
+    "capture-daily-metrics": {
+        "task": "dashboard.tasks.capture_daily_metrics",
+        "schedule": crontab(hour=DASHBOARD_SNAPSHOT_HOUR, minute=DASHBOARD_SNAPSHOT_MINUTE),
+    },
+    "update-ticket-analytics": {
+        "task": "ticketing.tasks.update_ticket_analytics",
+        "schedule": timedelta(minutes=TICKET_ANALYTICS_INTERVAL_MINUTES),
+    },
+    "check-sla-breaches": {
+        "task": "ticketing.tasks.check_sla_breaches",
+        "schedule": timedelta(minutes=SLA_SWEEP_INTERVAL_MINUTES),
+    },
+    "dispatch-notifications": {
+        "task": "ticketing.tasks.dispatch_notifications",
+        "schedule": timedelta(minutes=NOTIFICATION_DISPATCH_INTERVAL_MINUTES),
+    },
+    "archive-closed-tickets": {
+        "task": "ticketing.tasks.archive_closed_tickets",
+        "schedule": crontab(hour=TICKET_ARCHIVE_HOUR, minute=0),
+    },
+    "purge-stale-uploads": {
+        "task": "ticketing.tasks.purge_stale_uploads",
+        "schedule": timedelta(hours=ATTACHMENT_PURGE_INTERVAL_HOURS),
+    },
+    "refresh-assignee-loads": {
+        "task": "ticketing.tasks.refresh_assignee_loads",
+        "schedule": timedelta(minutes=ASSIGNEE_LOAD_REFRESH_INTERVAL_MINUTES),
+    },
+}
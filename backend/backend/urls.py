@@ -26,6 +26,9 @@ urlpatterns = [
     # DASHBOARD
     path('api/dashboard/', include('dashboard.urls')),
 
+    # TICKETING
+    path('api/', include('ticketing.urls')),
+
     path('api-auth/', include('rest_framework.urls')),
 ]
 
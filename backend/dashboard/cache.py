@@ -0,0 +1,43 @@
+import time
+
+from django.core.cache import cache
+
+LOCK_TIMEOUT = 10      # seconds a recompute may hold the lock
+COLD_WAIT = 2.0        # seconds a caller waits for another worker's first fill
+POLL_INTERVAL = 0.05
+
+
+def get_or_refresh(key, compute, ttl, grace=60):
+    """
+    Return the cached value for `key`, recomputing it at most once per `ttl`.
+
+    Entries carry a soft expiry and live `grace` seconds past it. Once stale,
+    a single caller wins a cache.add() lock and recomputes while everyone
+    else keeps serving the stale value, so expiry never causes a stampede.
+    On a cold cache the losers wait briefly for the winner's result.
+    """
+    lock_key = f"{key}:lock"
+    entry = cache.get(key)
+
+    if entry is not None:
+        value, fresh_until = entry
+        if time.time() < fresh_until or not cache.add(lock_key, 1, LOCK_TIMEOUT):
+            return value
+        have_lock = True
+    else:
+        have_lock = cache.add(lock_key, 1, LOCK_TIMEOUT)
+        if not have_lock:
+            deadline = time.time() + COLD_WAIT
+            while time.time() < deadline:
+                time.sleep(POLL_INTERVAL)
+                entry = cache.get(key)
+                if entry is not None:
+                    return entry[0]
+
+    try:
+        value = compute()
+        cache.set(key, (value, time.time() + ttl), ttl + grace)
+    finally:
+        if have_lock:
+            cache.delete(lock_key)
+    return value
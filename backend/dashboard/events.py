@@ -0,0 +1,141 @@
+"""
+In-process publisher for live dashboard counters.
+
+Model signals only mark the counters dirty; the next subscriber to wake
+recomputes them with one aggregate (at most once per `min_interval`) and
+every open stream receives the resulting delta. N viewers therefore cost
+one query per change, not N. Counters are also resynced every
+`resync_interval` seconds to pick up writes made by other processes and
+the midnight rollover of "present today".
+
+Streams are async generators served by the ASGI app, so an idle viewer
+holds no thread. `invalidate()` is thread-safe: signals fire from the
+sync threads Django runs views and tasks in.
+"""
+import asyncio
+import threading
+import time
+from datetime import date
+
+from asgiref.sync import sync_to_async
+from django.apps import apps
+from django.db.models import Count, Q
+
+from attendance.models import Attendance
+
+
+def compute_live_counters():
+    counters = Attendance.objects.filter(date=date.today()).aggregate(
+        present_today=Count('id', filter=Q(status="Present")),
+    )
+    if apps.is_installed('ticketing'):
+        from ticketing.models import Ticket
+        counters.update(Ticket.objects.exclude(status__in=['closed', 'resolved']).aggregate(
+            open_tickets=Count('id', distinct=True),
+            sla_breaches=Count('id', filter=Q(sla_records__breached=True), distinct=True),
+        ))
+    return counters
+
+
+def _wake(future):
+    if not future.done():
+        future.set_result(None)
+
+
+class CounterPublisher:
+    def __init__(self, compute, min_interval=1.0, resync_interval=60.0):
+        self.compute = compute
+        self.min_interval = min_interval
+        self.resync_interval = resync_interval
+        self._lock = threading.Lock()
+        self._waiters = set()  # (loop, future) per stream waiting for a change
+        self._counters = None
+        self._version = 0
+        self._dirty = True
+        self._refreshing = False
+        self._last_refresh = 0.0
+
+    def _notify_all(self):
+        with self._lock:
+            waiters, self._waiters = self._waiters, set()
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(_wake, future)
+
+    def invalidate(self):
+        with self._lock:
+            self._dirty = True
+        self._notify_all()
+
+    async def refresh(self, force=False):
+        """Recompute the counters if they are due; only one caller computes at a time."""
+        with self._lock:
+            elapsed = time.monotonic() - self._last_refresh
+            due = self._dirty or elapsed >= self.resync_interval
+            if self._refreshing or not (force or (due and elapsed >= self.min_interval)):
+                return
+            self._refreshing = True
+            self._dirty = False
+
+        counters = None
+        try:
+            counters = await sync_to_async(self.compute)()
+        finally:
+            with self._lock:
+                self._refreshing = False
+                self._last_refresh = time.monotonic()
+                if counters is None:
+                    self._dirty = True
+                elif counters != self._counters:
+                    self._counters = counters
+                    self._version += 1
+            self._notify_all()
+
+    def _wait_timeout(self, heartbeat):
+        if self._dirty:
+            return max(self.min_interval - (time.monotonic() - self._last_refresh), 0.05)
+        return heartbeat
+
+    async def stream(self, heartbeat=15.0):
+        """
+        Yield ('snapshot', counters) once, then ('delta', changes) whenever
+        counters move, and ('heartbeat', None) when idle.
+        """
+        if self._counters is None:
+            await self.refresh(force=True)
+
+        loop = asyncio.get_running_loop()
+        seen, version = None, None
+        last_sent = time.monotonic()
+        while True:
+            waiter = None
+            with self._lock:
+                if self._version == version:
+                    waiter = (loop, loop.create_future())
+                    self._waiters.add(waiter)
+                    timeout = self._wait_timeout(heartbeat)
+            if waiter is not None:
+                try:
+                    await asyncio.wait_for(waiter[1], timeout)
+                except asyncio.TimeoutError:
+                    pass
+                finally:
+                    with self._lock:
+                        self._waiters.discard(waiter)
+            with self._lock:
+                counters, current = self._counters, self._version
+
+            if current != version and counters is not None:
+                if seen is None:
+                    yield 'snapshot', counters
+                else:
+                    yield 'delta', {k: v - seen.get(k, 0) for k, v in counters.items() if v != seen.get(k)}
+                seen, version = counters, current
+                last_sent = time.monotonic()
+            elif time.monotonic() - last_sent >= heartbeat:
+                yield 'heartbeat', None
+                last_sent = time.monotonic()
+
+            await self.refresh()
+
+
+publisher = CounterPublisher(compute_live_counters)
@@ -0,0 +1,34 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:53
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DailyMetricsSnapshot',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('total_employees', models.IntegerField(default=0)),
+                ('active_employees', models.IntegerField(default=0)),
+                ('present', models.IntegerField(default=0)),
+                ('absent', models.IntegerField(default=0)),
+                ('on_leave', models.IntegerField(default=0)),
+                ('attendance_rate', models.DecimalField(decimal_places=2, default=0, max_digits=5)),
+                ('payroll_records', models.IntegerField(default=0)),
+                ('payroll_cost', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'ordering': ['date'],
+            },
+        ),
+    ]
@@ -1,3 +1,22 @@
 from django.db import models
 
-# Create your models here.
+
+class DailyMetricsSnapshot(models.Model):
+    """One row per day, written by the capture_daily_metrics task; trend charts read only these."""
+    date = models.DateField(unique=True)
+    total_employees = models.IntegerField(default=0)
+    active_employees = models.IntegerField(default=0)
+    present = models.IntegerField(default=0)
+    absent = models.IntegerField(default=0)
+    on_leave = models.IntegerField(default=0)
+    attendance_rate = models.DecimalField(max_digits=5, decimal_places=2, default=0)
+    payroll_records = models.IntegerField(default=0)
+    payroll_cost = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        ordering = ['date']
+
+    def __str__(self):
+        return f"Metrics {self.date}"
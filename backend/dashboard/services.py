@@ -0,0 +1,60 @@
+from django.db.models import Count, Q, Sum
+
+from employees.models import Employee
+from attendance.models import Attendance
+from payroll.models import PayrollCostRollup
+
+
+def compute_dashboard(today):
+    # 1️⃣ Employees — one conditional aggregate
+    employees = Employee.objects.aggregate(
+        total=Count('id'),
+        active=Count('id', filter=Q(is_active=True)),
+    )
+
+    # 2️⃣ Attendance summary (today)
+    attendance = Attendance.objects.filter(date=today).aggregate(
+        present=Count('id', filter=Q(status="Present")),
+        absent=Count('id', filter=Q(status="Absent")),
+        on_leave=Count('id', filter=Q(status="On Leave")),
+    )
+
+    # 3️⃣ Payroll summary (current month) — read from the department rollups
+    payroll = PayrollCostRollup.objects.filter(year=today.year, month=today.month).aggregate(
+        records=Sum('payroll_count'),
+        net=Sum('net_total'),
+    )
+
+    return {
+        "total_employees": employees["total"],
+        "active_employees": employees["active"],
+        "present_today": attendance["present"],
+        "absent_today": attendance["absent"],
+        "on_leave_today": attendance["on_leave"],
+        "total_payroll_records": payroll["records"] or 0,
+        "total_salary_sum": float(payroll["net"] or 0),
+    }
+
+
+def capture_daily_snapshot(day):
+    """Store (or overwrite) the metrics snapshot for `day`."""
+    from .models import DailyMetricsSnapshot
+
+    data = compute_dashboard(day)
+    active = data["active_employees"]
+    rate = round(data["present_today"] * 100 / active, 2) if active else 0
+
+    snapshot, _ = DailyMetricsSnapshot.objects.update_or_create(
+        date=day,
+        defaults={
+            "total_employees": data["total_employees"],
+            "active_employees": active,
+            "present": data["present_today"],
+            "absent": data["absent_today"],
+            "on_leave": data["on_leave_today"],
+            "attendance_rate": rate,
+            "payroll_records": data["total_payroll_records"],
+            "payroll_cost": data["total_salary_sum"],
+        },
+    )
+    return snapshot
@@ -0,0 +1,21 @@
+from django.apps import apps
+from django.db import transaction
+from django.db.models.signals import post_save, post_delete
+
+from attendance.models import Attendance
+from .events import publisher
+
+
+def invalidate_live_counters(sender, **kwargs):
+    transaction.on_commit(publisher.invalidate)
+
+
+def connect_signals():
+    senders = [Attendance]
+    if apps.is_installed('ticketing'):
+        from ticketing.models import Ticket, SLARecord
+        senders += [Ticket, SLARecord]
+
+    for sender in senders:
+        post_save.connect(invalidate_live_counters, sender=sender, dispatch_uid=f"dashboard_counters_save_{sender.__name__}")
+        post_delete.connect(invalidate_live_counters, sender=sender, dispatch_uid=f"dashboard_counters_delete_{sender.__name__}")
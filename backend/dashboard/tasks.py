@@ -0,0 +1,13 @@
+from datetime import date
+
+from celery import shared_task
+
+from .services import capture_daily_snapshot
+
+
+@shared_task
+def capture_daily_metrics(day=None):
+    # scheduled nightly by CELERY_BEAT_SCHEDULE; defaults to today so re-runs just overwrite
+    day = date.fromisoformat(day) if day else date.today()
+    capture_daily_snapshot(day)
+    return day.isoformat()
@@ -1,3 +1,141 @@
-from django.test import TestCase
+import json
+from datetime import date
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from asgiref.sync import async_to_sync, sync_to_async
+from asgiref.testing import ApplicationCommunicator
+from django.core.cache import cache
+from django.test import TestCase, TransactionTestCase
+from rest_framework_simplejwt.tokens import AccessToken
+from rest_framework.test import APIClient
+from django.contrib.auth import get_user_model
+
+from employees.models import Employee
+from attendance.models import Attendance
+from .events import CounterPublisher, compute_live_counters
+from .tasks import capture_daily_metrics
+
+
+class DashboardViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.client.force_authenticate(get_user_model().objects.create_user("hr", "hr@test.com", "password"))
+
+    def test_dashboard_aggregates_are_cached(self):
+        emp = Employee.objects.create(emp_code="E1", first_name="Asha", email="asha@test.com")
+        Employee.objects.create(emp_code="E2", first_name="Bala", email="bala@test.com", is_active=False)
+        Attendance.objects.create(employee=emp, date=date.today(), status="Present")
+
+        resp = self.client.get('/api/dashboard/dashboard/')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(resp.data["total_employees"], 2)
+        self.assertEqual(resp.data["active_employees"], 1)
+        self.assertEqual(resp.data["present_today"], 1)
+        self.assertEqual(resp.data["absent_today"], 0)
+
+        with self.assertNumQueries(0):
+            cached = self.client.get('/api/dashboard/dashboard/')
+        self.assertEqual(cached.data, resp.data)
+
+    def test_trends_read_daily_snapshots(self):
+        emp = Employee.objects.create(emp_code="E1", first_name="Asha", email="asha@test.com")
+        Attendance.objects.create(employee=emp, date=date.today(), status="Present")
+        capture_daily_metrics()
+
+        resp = self.client.get('/api/dashboard/trends/?metrics=headcount,attendance_rate')
+        self.assertEqual(resp.status_code, 200)
+        self.assertEqual(len(resp.data["series"]), 1)
+        self.assertEqual(resp.data["series"][0]["headcount"], 1)
+        self.assertEqual(resp.data["series"][0]["attendance_rate"], Decimal("100.00"))
+
+        self.assertEqual(self.client.get('/api/dashboard/trends/?metrics=bogus').status_code, 400)
+
+
+class CounterPublisherTests(TestCase):
+    def test_stream_sends_snapshot_then_deltas(self):
+        calls = []
+        values = iter([{"present_today": 3, "open_tickets": 5}, {"present_today": 4, "open_tickets": 5}])
+
+        def compute():
+            calls.append(1)
+            return next(values)
+
+        async def scenario():
+            publisher = CounterPublisher(compute, min_interval=0)
+            viewer_a, viewer_b = publisher.stream(), publisher.stream()
+
+            self.assertEqual(await anext(viewer_a), ("snapshot", {"present_today": 3, "open_tickets": 5}))
+            self.assertEqual(await anext(viewer_b), ("snapshot", {"present_today": 3, "open_tickets": 5}))
+
+            publisher.invalidate()
+            self.assertEqual(await anext(viewer_a), ("delta", {"present_today": 1}))
+            self.assertEqual(await anext(viewer_b), ("delta", {"present_today": 1}))
+            self.assertEqual(len(calls), 2)
+
+        async_to_sync(scenario)()
+
+
+class DashboardStreamTests(TransactionTestCase):
+    """Reads the event stream through the ASGI app, the way daphne serves it."""
+
+    def setUp(self):
+        self.user = get_user_model().objects.create_user("hr", "hr@test.com", "password")
+        self.publisher = CounterPublisher(compute_live_counters, min_interval=0)
+        for target in ("dashboard.views.publisher", "dashboard.signals.publisher"):
+            patcher = mock.patch(target, self.publisher)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def open_stream(self, query):
+        from backend.asgi import application
+
+        return ApplicationCommunicator(application, {
+            "type": "http", "http_version": "1.1", "method": "GET", "scheme": "http",
+            "path": "/api/dashboard/stream/", "raw_path": b"/api/dashboard/stream/",
+            "query_string": query.encode(), "root_path": "", "headers": [(b"host", b"testserver")],
+            "client": ("127.0.0.1", 1234), "server": ("testserver", 80),
+        })
+
+    def test_stream_delivers_snapshot_and_delta_frames(self):
+        emp = Employee.objects.create(emp_code="E1", first_name="Asha", email="asha@test.com")
+
+        async def scenario():
+            stream = self.open_stream(f"token={AccessToken.for_user(self.user)}")
+            await stream.send_input({"type": "http.request", "body": b"", "more_body": False})
+            start = await stream.receive_output(timeout=5)
+            self.assertEqual(start["status"], 200)
+            self.assertIn((b"Content-Type", b"text/event-stream"), start["headers"])
+
+            snapshot = (await stream.receive_output(timeout=5))["body"].decode()
+            self.assertTrue(snapshot.startswith("event: snapshot\n"))
+            self.assertEqual(json.loads(snapshot.split("data: ", 1)[1])["present_today"], 0)
+
+            await sync_to_async(Attendance.objects.create)(employee=emp, date=date.today(), status="Present")
+            delta = (await stream.receive_output(timeout=5))["body"].decode()
+            self.assertEqual(delta, 'event: delta\ndata: {"present_today": 1}\n\n')
+
+            await stream.send_input({"type": "http.disconnect"})
+            await stream.wait(timeout=5)
+
+        async_to_sync(scenario)()
+
+    def test_stream_requires_a_token(self):
+        async def scenario():
+            for query in ("", "token=not-a-jwt"):
+                stream = self.open_stream(query)
+                await stream.send_input({"type": "http.request", "body": b"", "more_body": False})
+                self.assertEqual((await stream.receive_output(timeout=5))["status"], 401)
+                await stream.wait(timeout=5)
+
+        async_to_sync(scenario)()
+
+
+class BeatScheduleTests(TestCase):
+    def test_nightly_snapshot_is_scheduled(self):
+        from backend.celery import app
+
+        app.loader.import_default_modules()
+        entry = app.conf.beat_schedule["capture-daily-metrics"]
+        self.assertIn(entry["task"], app.tasks)
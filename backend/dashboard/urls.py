@@ -1,6 +1,8 @@
 from django.urls import path
-from .views import DashboardView
+from .views import DashboardView, DashboardTrendView, DashboardStreamView
 
 urlpatterns = [
     path('dashboard/', DashboardView.as_view(), name='dashboard'),
+    path('trends/', DashboardTrendView.as_view(), name='dashboard-trends'),
+    path('stream/', DashboardStreamView.as_view(), name='dashboard-stream'),
 ]
@@ -1,42 +1,121 @@
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework import status
-from datetime import date
+from datetime import date, timedelta
+import json
 
-from employees.models import Employee
-from attendance.models import Attendance
-from payroll.models import EmployeePayroll   # ✅ FIXED
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.http import JsonResponse, StreamingHttpResponse
+from django.views import View
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+
+from .cache import get_or_refresh
+from .events import publisher
+from .models import DailyMetricsSnapshot
+from .services import compute_dashboard
 
 
 class DashboardView(APIView):
     def get(self, request):
-        # 1️⃣ Total employees
-        total_employees = Employee.objects.count()
-
-        # 2️⃣ Attendance summary (today)
         today = date.today()
-        present_today = Attendance.objects.filter(date=today, status="Present").count()
-        absent_today = Attendance.objects.filter(date=today, status="Absent").count()
+        data = get_or_refresh(
+            f"dashboard:summary:{today.isoformat()}",
+            lambda: compute_dashboard(today),
+            ttl=settings.DASHBOARD_CACHE_TTL,
+        )
+        return Response(data, status=status.HTTP_200_OK)
 
-        # 3️⃣ Payroll summary (for current month)
-        current_year = today.year
-        current_month = today.month
 
-        payroll_records = EmployeePayroll.objects.filter(
-            paid_on__year=current_year, 
-            paid_on__month=current_month
-        )
+async def sse_messages(events):
+    async for kind, payload in events:
+        if kind == "heartbeat":
+            yield ": keepalive\n\n"
+        else:
+            yield f"event: {kind}\ndata: {json.dumps(payload, cls=DjangoJSONEncoder)}\n\n"
 
-        total_payroll_this_month = payroll_records.count()
-        total_salary_sum = sum(float(r.total_salary or 0) for r in payroll_records)
 
-        # 4️⃣ Final dashboard response
-        data = {
-            "total_employees": total_employees,
-            "present_today": present_today,
-            "absent_today": absent_today,
-            "total_payroll_records": total_payroll_this_month,
-            "total_salary_sum": total_salary_sum,
-        }
+@sync_to_async
+def stream_user(request):
+    """
+    The JWT from the Authorization header or, since EventSource cannot set
+    headers, from `?token=`.
+    """
+    auth = JWTAuthentication()
+    try:
+        raw_token = request.GET.get("token")
+        if raw_token:
+            return auth.get_user(auth.get_validated_token(raw_token))
+        authenticated = auth.authenticate(request)
+    except (InvalidToken, AuthenticationFailed):
+        return None
+    return authenticated[0] if authenticated else None
 
-        return Response(data, status=status.HTTP_200_OK)
+
+class DashboardStreamView(View):
+    """
+    Server-sent events: one `snapshot` of the live counters (present today,
+    open tickets, SLA breaches), then a `delta` event whenever they change.
+    All streams share the in-process publisher in dashboard/events.py.
+
+    An async view so that, under the ASGI app, a viewer waiting for the next
+    change holds no worker thread.
+    """
+    async def get(self, request):
+        if await stream_user(request) is None:
+            return JsonResponse({"detail": "Authentication credentials were not provided."}, status=401)
+        response = StreamingHttpResponse(sse_messages(publisher.stream()), content_type="text/event-stream")
+        response["Cache-Control"] = "no-cache"
+        response["X-Accel-Buffering"] = "no"
+        return response
+
+
+# metric name -> DailyMetricsSnapshot field
+TREND_METRICS = {
+    "headcount": "active_employees",
+    "total_employees": "total_employees",
+    "present": "present",
+    "absent": "absent",
+    "on_leave": "on_leave",
+    "attendance_rate": "attendance_rate",
+    "payroll_records": "payroll_records",
+    "payroll_cost": "payroll_cost",
+}
+MAX_TREND_DAYS = 731
+
+
+class DashboardTrendView(APIView):
+    """
+    GET ?metrics=headcount,attendance_rate,payroll_cost&start=YYYY-MM-DD&end=YYYY-MM-DD
+    Defaults to every metric over the last 365 days. Reads only the daily
+    snapshots: one range scan on the unique date index.
+    """
+    def get(self, request):
+        try:
+            end = date.fromisoformat(request.query_params.get("end") or date.today().isoformat())
+            start = request.query_params.get("start")
+            start = date.fromisoformat(start) if start else end - timedelta(days=364)
+        except ValueError:
+            return Response({"detail": "start/end must be YYYY-MM-DD"}, status=status.HTTP_400_BAD_REQUEST)
+
+        if start > end:
+            return Response({"detail": "start must be before end"}, status=status.HTTP_400_BAD_REQUEST)
+        if (end - start).days >= MAX_TREND_DAYS:
+            return Response({"detail": f"window is limited to {MAX_TREND_DAYS} days"}, status=status.HTTP_400_BAD_REQUEST)
+
+        requested = request.query_params.get("metrics")
+        metrics = requested.split(",") if requested else list(TREND_METRICS)
+        unknown = [m for m in metrics if m not in TREND_METRICS]
+        if unknown:
+            return Response({"detail": f"Unknown metrics: {', '.join(unknown)}"}, status=status.HTTP_400_BAD_REQUEST)
+
+        rows = DailyMetricsSnapshot.objects.filter(date__range=(start, end)).values_list(
+            "date", *(TREND_METRICS[m] for m in metrics)
+        )
+        series = [
+            {"date": row[0], **dict(zip(metrics, row[1:]))}
+            for row in rows
+        ]
+        return Response({"start": start, "end": end, "metrics": metrics, "series": series})
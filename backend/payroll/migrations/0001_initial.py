@@ -0,0 +1,47 @@
+# Generated by Django 5.2.18 on 2026-10-19 20:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        ('employees', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SalaryComponent',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=120)),
+                ('component_type', models.CharField(choices=[('earning', 'Earning'), ('deduction', 'Deduction')], max_length=20)),
+                ('amount', models.DecimalField(decimal_places=2, help_text='Fixed amount', max_digits=12)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='EmployeePayroll',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.PositiveSmallIntegerField()),
+                ('year', models.PositiveSmallIntegerField()),
+                ('basic_salary', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('hra', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('gross_salary', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('total_deductions', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('net_salary', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('notes', models.TextField(blank=True, null=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='payrolls', to='employees.employee')),
+                ('components', models.ManyToManyField(blank=True, to='payroll.salarycomponent')),
+            ],
+            options={
+                'ordering': ['-year', '-month', '-employee'],
+                'unique_together': {('employee', 'month', 'year')},
+            },
+        ),
+    ]
@@ -0,0 +1,68 @@
+# Generated by Django 5.2.18 on 2026-10-19 20:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.db.models import OuterRef, Subquery
+
+
+def book_existing_payroll_to_departments(apps, schema_editor):
+    # rows saved before the column existed are booked to the employee's current department
+    EmployeePayroll = apps.get_model('payroll', 'EmployeePayroll')
+    Employee = apps.get_model('employees', 'Employee')
+    EmployeePayroll.objects.filter(department__isnull=True).update(
+        department_id=Subquery(Employee.objects.filter(pk=OuterRef('employee_id')).values('department_id')[:1]),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0001_initial'),
+        ('payroll', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='employeepayroll',
+            name='department',
+            field=models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='payrolls', to='employees.department'),
+        ),
+        migrations.CreateModel(
+            name='EmployeeYTDPayroll',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('financial_year', models.PositiveSmallIntegerField(help_text='Year the financial year starts in (2025 = FY 2025-26)')),
+                ('months_paid', models.PositiveSmallIntegerField(default=0)),
+                ('gross_ytd', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('deductions_ytd', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('net_ytd', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='ytd_payrolls', to='employees.employee')),
+            ],
+            options={
+                'ordering': ['-financial_year', 'employee'],
+                'indexes': [models.Index(fields=['financial_year'], name='payroll_emp_financi_7b40e7_idx')],
+                'unique_together': {('employee', 'financial_year')},
+            },
+        ),
+        migrations.CreateModel(
+            name='PayrollCostRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('month', models.PositiveSmallIntegerField()),
+                ('year', models.PositiveSmallIntegerField()),
+                ('payroll_count', models.IntegerField(default=0)),
+                ('gross_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('deductions_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('net_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('department', models.ForeignKey(blank=True, null=True, on_delete=django.db.models.deletion.CASCADE, related_name='payroll_rollups', to='employees.department')),
+            ],
+            options={
+                'ordering': ['-year', '-month', 'department'],
+                'indexes': [models.Index(fields=['year', 'month'], name='payroll_pay_year_7abaab_idx')],
+                'unique_together': {('department', 'month', 'year')},
+            },
+        ),
+        migrations.RunPython(book_existing_payroll_to_departments, migrations.RunPython.noop),
+    ]
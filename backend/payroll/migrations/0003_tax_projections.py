@@ -0,0 +1,49 @@
+# Generated by Django 5.2.18 on 2026-10-19 20:15
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('employees', '0001_initial'),
+        ('payroll', '0002_payroll_rollups'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TaxDeclaration',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('financial_year', models.PositiveSmallIntegerField()),
+                ('regime', models.CharField(choices=[('new', 'New Regime'), ('old', 'Old Regime')], default='new', max_length=10)),
+                ('exemptions', models.DecimalField(decimal_places=2, default=0, help_text='Declared deductions/exemptions (80C, HRA, ...), used under the old regime only', max_digits=12)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tax_declarations', to='employees.employee')),
+            ],
+            options={
+                'unique_together': {('employee', 'financial_year')},
+            },
+        ),
+        migrations.CreateModel(
+            name='TaxProjection',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('financial_year', models.PositiveSmallIntegerField()),
+                ('regime', models.CharField(default='new', max_length=10)),
+                ('gross_ytd', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('projected_gross', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('taxable_income', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('projected_tax', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('monthly_tds', models.DecimalField(decimal_places=2, default=0, max_digits=12)),
+                ('inputs_signature', models.CharField(max_length=200)),
+                ('computed_at', models.DateTimeField(auto_now=True)),
+                ('employee', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='tax_projections', to='employees.employee')),
+            ],
+            options={
+                'ordering': ['employee'],
+                'unique_together': {('employee', 'financial_year')},
+            },
+        ),
+    ]
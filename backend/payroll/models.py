@@ -1,8 +1,8 @@
-from django.db import models
+from django.db import models, transaction
 from django.utils import timezone
 
 # import your employee model - change path only if employee app label differs
-from employees.models import Employee
+from employees.models import Employee, Department
 
 
 class SalaryComponent(models.Model):
@@ -20,6 +20,13 @@ class SalaryComponent(models.Model):
 
 class EmployeePayroll(models.Model):
     employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name="payrolls")
+    # the department the cost is booked to, captured from the employee when the row is created,
+    # so a later transfer does not move past payroll between department rollups
+    department = models.ForeignKey(
+        Department, on_delete=models.SET_NULL,
+        null=True, blank=True,
+        related_name="payrolls"
+    )
     month = models.PositiveSmallIntegerField()  # 1..12
     year = models.PositiveSmallIntegerField()
     basic_salary = models.DecimalField(max_digits=12, decimal_places=2, default=0)
@@ -42,6 +49,26 @@ class EmployeePayroll(models.Model):
     def __str__(self):
         return f"{self.employee} - {self.month}/{self.year}"
 
+    def save(self, *args, **kwargs):
+        from .services import ROLLUP_FIELDS, apply_payroll_rollup_delta
+        with transaction.atomic():
+            previous = None
+            if self._state.adding:
+                if self.department_id is None:
+                    self.department_id = self.employee.department_id
+            else:
+                previous = EmployeePayroll.objects.filter(pk=self.pk).values(*ROLLUP_FIELDS).first()
+            super().save(*args, **kwargs)
+            apply_payroll_rollup_delta(previous, self)
+
+    def delete(self, *args, **kwargs):
+        from .services import ROLLUP_FIELDS, apply_payroll_rollup_delta
+        with transaction.atomic():
+            previous = EmployeePayroll.objects.filter(pk=self.pk).values(*ROLLUP_FIELDS).first()
+            result = super().delete(*args, **kwargs)
+            apply_payroll_rollup_delta(previous, None)
+        return result
+
     def calculate(self):
         earnings = sum([c.amount for c in self.components.filter(component_type='earning')])
         deductions = sum([c.amount for c in self.components.filter(component_type='deduction')])
@@ -50,3 +77,98 @@ class EmployeePayroll(models.Model):
         self.total_deductions = deductions
         self.net_salary = gross - deductions
         return self.net_salary
+
+
+# ======================================
+#      ROLLUPS (maintained by services)
+# ======================================
+class PayrollCostRollup(models.Model):
+    """Salary cost per department per payroll month."""
+    department = models.ForeignKey(
+        Department, on_delete=models.CASCADE,
+        null=True, blank=True,
+        related_name="payroll_rollups"
+    )
+    month = models.PositiveSmallIntegerField()
+    year = models.PositiveSmallIntegerField()
+    payroll_count = models.IntegerField(default=0)
+    gross_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    deductions_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    net_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('department', 'month', 'year')
+        ordering = ['-year', '-month', 'department']
+        indexes = [
+            models.Index(fields=['year', 'month']),
+        ]
+
+    def __str__(self):
+        return f"{self.department or 'Unassigned'} - {self.month}/{self.year}"
+
+
+class EmployeeYTDPayroll(models.Model):
+    """Year-to-date payroll totals per employee for an April-March financial year."""
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name="ytd_payrolls")
+    financial_year = models.PositiveSmallIntegerField(help_text="Year the financial year starts in (2025 = FY 2025-26)")
+    months_paid = models.PositiveSmallIntegerField(default=0)
+    gross_ytd = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    deductions_ytd = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    net_ytd = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('employee', 'financial_year')
+        ordering = ['-financial_year', 'employee']
+        indexes = [
+            models.Index(fields=['financial_year']),
+        ]
+
+    def __str__(self):
+        return f"{self.employee} - FY {self.financial_year}"
+
+
+# ======================================
+#            INCOME TAX
+# ======================================
+class TaxDeclaration(models.Model):
+    REGIME_CHOICES = (
+        ('new', 'New Regime'),
+        ('old', 'Old Regime'),
+    )
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name="tax_declarations")
+    financial_year = models.PositiveSmallIntegerField()
+    regime = models.CharField(max_length=10, choices=REGIME_CHOICES, default='new')
+    exemptions = models.DecimalField(
+        max_digits=12, decimal_places=2, default=0,
+        help_text="Declared deductions/exemptions (80C, HRA, ...), used under the old regime only"
+    )
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('employee', 'financial_year')
+
+    def __str__(self):
+        return f"{self.employee} - FY {self.financial_year} ({self.regime})"
+
+
+class TaxProjection(models.Model):
+    """Cached result of the batch tax engine; recomputed when inputs_signature changes."""
+    employee = models.ForeignKey(Employee, on_delete=models.CASCADE, related_name="tax_projections")
+    financial_year = models.PositiveSmallIntegerField()
+    regime = models.CharField(max_length=10, default='new')
+    gross_ytd = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    projected_gross = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    taxable_income = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    projected_tax = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    monthly_tds = models.DecimalField(max_digits=12, decimal_places=2, default=0)
+    inputs_signature = models.CharField(max_length=200)
+    computed_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        unique_together = ('employee', 'financial_year')
+        ordering = ['employee']
+
+    def __str__(self):
+        return f"{self.employee} - FY {self.financial_year}: {self.projected_tax}"
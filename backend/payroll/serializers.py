@@ -1,5 +1,12 @@
 from rest_framework import serializers
-from .models import SalaryComponent, EmployeePayroll
+from .models import (
+    SalaryComponent,
+    EmployeePayroll,
+    PayrollCostRollup,
+    EmployeeYTDPayroll,
+    TaxDeclaration,
+    TaxProjection,
+)
 from employees.models import Employee
 
 
@@ -16,11 +23,11 @@ class EmployeePayrollSerializer(serializers.ModelSerializer):
     class Meta:
         model = EmployeePayroll
         fields = [
-            'id', 'employee', 'employee_name', 'month', 'year',
+            'id', 'employee', 'employee_name', 'department', 'month', 'year',
             'basic_salary', 'hra', 'components', 'components_details',
             'gross_salary', 'total_deductions', 'net_salary', 'notes', 'created_at'
         ]
-        read_only_fields = ('gross_salary','total_deductions','net_salary','created_at')
+        read_only_fields = ('department','gross_salary','total_deductions','net_salary','created_at')
 
     def validate(self, data):
         # Prevent duplicate payroll entries
@@ -48,3 +55,67 @@ class EmployeePayrollSerializer(serializers.ModelSerializer):
         instance.calculate()
         instance.save()
         return instance
+
+
+class RollupRefreshSerializer(serializers.Serializer):
+    year = serializers.IntegerField(min_value=1900, max_value=9999)
+    month = serializers.IntegerField(min_value=1, max_value=12, required=False, allow_null=True)
+
+
+class TaxProjectionQuerySerializer(serializers.Serializer):
+    financial_year = serializers.IntegerField(min_value=1900, max_value=9999, required=False)
+    employee = serializers.IntegerField(min_value=1, required=False)
+
+
+class PayrollCostRollupSerializer(serializers.ModelSerializer):
+    department_name = serializers.CharField(source='department.name', read_only=True, default=None)
+
+    class Meta:
+        model = PayrollCostRollup
+        fields = [
+            'id', 'department', 'department_name', 'month', 'year', 'payroll_count',
+            'gross_total', 'deductions_total', 'net_total', 'updated_at'
+        ]
+
+
+class EmployeeYTDPayrollSerializer(serializers.ModelSerializer):
+    emp_code = serializers.CharField(source='employee.emp_code', read_only=True)
+    employee_name = serializers.SerializerMethodField()
+
+    class Meta:
+        model = EmployeeYTDPayroll
+        fields = [
+            'id', 'employee', 'emp_code', 'employee_name', 'financial_year', 'months_paid',
+            'gross_ytd', 'deductions_ytd', 'net_ytd', 'updated_at'
+        ]
+
+    def get_employee_name(self, obj):
+        return f"{obj.employee.first_name} {obj.employee.last_name or ''}".strip()
+
+
+class RevisionRuleSerializer(serializers.Serializer):
+    role = serializers.ChoiceField(choices=Employee.EMPLOYEE_ROLES, required=False)
+    department = serializers.IntegerField(required=False)
+    employment_type = serializers.ChoiceField(choices=Employee.EMPLOYMENT_TYPES, required=False)
+    percent = serializers.DecimalField(max_digits=6, decimal_places=2, required=False, default=0)
+    amount = serializers.DecimalField(max_digits=12, decimal_places=2, required=False, default=0)
+
+
+class RevisionScenarioSerializer(serializers.Serializer):
+    name = serializers.CharField(required=False, allow_blank=True, default='')
+    rules = RevisionRuleSerializer(many=True)
+
+
+class TaxDeclarationSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = TaxDeclaration
+        fields = ['id', 'employee', 'financial_year', 'regime', 'exemptions', 'updated_at']
+
+
+class TaxProjectionSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = TaxProjection
+        fields = [
+            'employee', 'financial_year', 'regime', 'gross_ytd', 'projected_gross',
+            'taxable_income', 'projected_tax', 'monthly_tds', 'computed_at'
+        ]
@@ -0,0 +1,132 @@
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, F, OuterRef, Q, Subquery, Sum
+from django.utils import timezone
+
+from employees.models import Employee
+from .models import EmployeePayroll, PayrollCostRollup, EmployeeYTDPayroll
+
+# fields of EmployeePayroll that feed the rollup tables
+ROLLUP_FIELDS = ('employee_id', 'department_id', 'month', 'year', 'gross_salary', 'total_deductions', 'net_salary')
+
+
+def financial_year_for(month, year):
+    # April-March financial year, keyed by the year it starts in
+    return year if month >= 4 else year - 1
+
+
+def _payroll_state(payroll):
+    return {f: getattr(payroll, f) for f in ROLLUP_FIELDS}
+
+
+def _accumulate(deltas, key, sign, state):
+    row = deltas.setdefault(key, [0, Decimal('0'), Decimal('0'), Decimal('0')])
+    row[0] += sign
+    row[1] += sign * Decimal(state['gross_salary'] or 0)
+    row[2] += sign * Decimal(state['total_deductions'] or 0)
+    row[3] += sign * Decimal(state['net_salary'] or 0)
+
+
+def apply_payroll_rollup_delta(previous, payroll):
+    """
+    Move one payroll row's contribution in the rollup tables.
+    `previous` is the stored state before the write (None on create),
+    `payroll` the saved instance (None on delete).
+    """
+    current = _payroll_state(payroll) if payroll is not None else None
+    if previous == current:
+        return
+
+    cost_deltas, ytd_deltas = {}, {}
+    for state, sign in ((previous, -1), (current, 1)):
+        if not state:
+            continue
+        # keyed on the row's own department, not the employee's current one
+        _accumulate(cost_deltas, (state['department_id'], state['month'], state['year']), sign, state)
+        _accumulate(ytd_deltas, (state['employee_id'], financial_year_for(state['month'], state['year'])), sign, state)
+
+    now = timezone.now()
+    with transaction.atomic():
+        for (department_id, month, year), (count, gross, deductions, net) in cost_deltas.items():
+            if not (count or gross or deductions or net):
+                continue
+            key = {'department_id': department_id, 'month': month, 'year': year}
+            PayrollCostRollup.objects.get_or_create(**key)
+            PayrollCostRollup.objects.filter(**key).update(
+                payroll_count=F('payroll_count') + count,
+                gross_total=F('gross_total') + gross,
+                deductions_total=F('deductions_total') + deductions,
+                net_total=F('net_total') + net,
+                updated_at=now,
+            )
+
+        for (employee_id, fy), (count, gross, deductions, net) in ytd_deltas.items():
+            if not (count or gross or deductions or net):
+                continue
+            key = {'employee_id': employee_id, 'financial_year': fy}
+            EmployeeYTDPayroll.objects.get_or_create(**key)
+            EmployeeYTDPayroll.objects.filter(**key).update(
+                months_paid=F('months_paid') + count,
+                gross_ytd=F('gross_ytd') + gross,
+                deductions_ytd=F('deductions_ytd') + deductions,
+                net_ytd=F('net_ytd') + net,
+                updated_at=now,
+            )
+
+
+@transaction.atomic
+def refresh_payroll_rollups(year, month=None):
+    """
+    Rebuild the rollups touched by a payroll run with set-based queries.
+    Call this after bulk payroll writes that bypass EmployeePayroll.save().
+    """
+    period = Q(year=year) if month is None else Q(year=year, month=month)
+    # rows bulk-written without save() have no department yet: book them to the employee's
+    EmployeePayroll.objects.filter(period, department__isnull=True).update(
+        department_id=Subquery(Employee.objects.filter(pk=OuterRef('employee_id')).values('department_id')[:1])
+    )
+    totals = dict(
+        payroll_count=Count('id'),
+        gross=Sum('gross_salary'),
+        deductions=Sum('total_deductions'),
+        net=Sum('net_salary'),
+    )
+
+    PayrollCostRollup.objects.filter(period).delete()
+    PayrollCostRollup.objects.bulk_create([
+        PayrollCostRollup(
+            department_id=row['department_id'],
+            month=row['month'],
+            year=row['year'],
+            payroll_count=row['payroll_count'],
+            gross_total=row['gross'] or 0,
+            deductions_total=row['deductions'] or 0,
+            net_total=row['net'] or 0,
+        )
+        for row in EmployeePayroll.objects.filter(period)
+        .values('department_id', 'month', 'year')
+        .annotate(**totals)
+        .order_by()
+    ])
+
+    if month is None:
+        financial_years = {year - 1, year}
+    else:
+        financial_years = {financial_year_for(month, year)}
+
+    for fy in financial_years:
+        EmployeeYTDPayroll.objects.filter(financial_year=fy).delete()
+        EmployeeYTDPayroll.objects.bulk_create([
+            EmployeeYTDPayroll(
+                employee_id=row['employee_id'],
+                financial_year=fy,
+                months_paid=row['payroll_count'],
+                gross_ytd=row['gross'] or 0,
+                deductions_ytd=row['deductions'] or 0,
+                net_ytd=row['net'] or 0,
+            )
+            for row in EmployeePayroll.objects.filter(
+                Q(year=fy, month__gte=4) | Q(year=fy + 1, month__lt=4)
+            ).values('employee_id').annotate(**totals).order_by()
+        ])
@@ -0,0 +1,128 @@
+"""
+What-if salary revision simulator.
+
+Employee salaries and fixed allowances are loaded once into numpy arrays;
+revision rules are then evaluated as vectorized masks, so a scenario over
+the whole hospital costs a few array operations and never writes a row.
+"""
+import numpy as np
+from django.db.models import OuterRef, Q, Subquery, Sum
+
+from employees.models import Employee
+from .models import EmployeePayroll
+
+ROLE_CODES = {role: i for i, (role, _) in enumerate(Employee.EMPLOYEE_ROLES)}
+EMPLOYMENT_TYPE_CODES = {t: i for i, (t, _) in enumerate(Employee.EMPLOYMENT_TYPES)}
+
+
+class SalaryDataset:
+    """Column arrays for all active employees, indexed by position."""
+
+    def __init__(self, employee_ids, salary, allowances, role, employment_type, department, department_names):
+        self.employee_ids = employee_ids
+        self.salary = salary
+        self.allowances = allowances
+        self.role = role
+        self.employment_type = employment_type
+        self.department = department            # department id per employee, 0 = unassigned
+        self.department_names = department_names
+
+    def __len__(self):
+        return len(self.employee_ids)
+
+    @classmethod
+    def load(cls):
+        rows = list(
+            Employee.objects.filter(is_active=True)
+            .values_list('id', 'salary', 'role', 'employment_type', 'department_id', 'department__name')
+            .order_by('id')
+        )
+        allowances = cls._load_allowances()
+
+        n = len(rows)
+        employee_ids = np.fromiter((r[0] for r in rows), dtype=np.int64, count=n)
+        salary = np.fromiter((float(r[1] or 0) for r in rows), dtype=np.float64, count=n)
+        role = np.fromiter((ROLE_CODES.get(r[2], -1) for r in rows), dtype=np.int16, count=n)
+        employment_type = np.fromiter((EMPLOYMENT_TYPE_CODES.get(r[3], -1) for r in rows), dtype=np.int16, count=n)
+        department = np.fromiter((r[4] or 0 for r in rows), dtype=np.int64, count=n)
+        fixed = np.fromiter((allowances.get(r[0], 0.0) for r in rows), dtype=np.float64, count=n)
+        department_names = {r[4] or 0: r[5] or 'Unassigned' for r in rows}
+
+        return cls(employee_ids, salary, fixed, role, employment_type, department, department_names)
+
+    @staticmethod
+    def _load_allowances():
+        # HRA plus fixed earning components from each employee's own latest payroll row
+        latest = (
+            EmployeePayroll.objects.filter(employee_id=OuterRef('employee_id'))
+            .order_by('-year', '-month').values('pk')[:1]
+        )
+        return {
+            emp_id: float(hra or 0) + float(earnings or 0)
+            for emp_id, hra, earnings in EmployeePayroll.objects.filter(
+                employee__is_active=True, pk=Subquery(latest),
+            )
+            .annotate(earnings=Sum('components__amount', filter=Q(components__component_type='earning')))
+            .values_list('employee_id', 'hra', 'earnings')
+        }
+
+
+def simulate_revision(dataset, rules):
+    """
+    Apply revision rules to a loaded dataset and return projected monthly totals.
+
+    Each rule may filter on role, department and employment_type and carries
+    a `percent` raise on salary and/or a flat `amount`. Rules are applied in
+    order and a later matching rule overrides an earlier one, so a blanket
+    rule can be followed by exceptions.
+    """
+    n = len(dataset)
+    percent = np.zeros(n)
+    amount = np.zeros(n)
+
+    for rule in rules:
+        mask = np.ones(n, dtype=bool)
+        if rule.get('role'):
+            mask &= dataset.role == ROLE_CODES[rule['role']]
+        if rule.get('employment_type'):
+            mask &= dataset.employment_type == EMPLOYMENT_TYPE_CODES[rule['employment_type']]
+        if rule.get('department'):
+            mask &= dataset.department == rule['department']
+        percent[mask] = float(rule.get('percent') or 0)
+        amount[mask] = float(rule.get('amount') or 0)
+
+    current = dataset.salary + dataset.allowances
+    projected_salary = dataset.salary * (1 + percent / 100) + amount
+    projected = projected_salary + dataset.allowances
+    affected = (percent != 0) | (amount != 0)
+
+    dept_ids, dept_index = np.unique(dataset.department, return_inverse=True)
+    headcount = np.bincount(dept_index, minlength=len(dept_ids))
+    dept_current = np.bincount(dept_index, weights=current, minlength=len(dept_ids))
+    dept_projected = np.bincount(dept_index, weights=projected, minlength=len(dept_ids))
+    dept_affected = np.bincount(dept_index, weights=affected, minlength=len(dept_ids))
+
+    current_total = float(current.sum())
+    projected_total = float(projected.sum())
+
+    return {
+        'employees': n,
+        'employees_affected': int(affected.sum()),
+        'current_monthly_total': round(current_total, 2),
+        'projected_monthly_total': round(projected_total, 2),
+        'monthly_delta': round(projected_total - current_total, 2),
+        'annual_delta': round((projected_total - current_total) * 12, 2),
+        'delta_percent': round((projected_total / current_total - 1) * 100, 2) if current_total else 0.0,
+        'departments': [
+            {
+                'department': int(dept_id) or None,
+                'department_name': dataset.department_names.get(int(dept_id), 'Unassigned'),
+                'headcount': int(headcount[i]),
+                'employees_affected': int(dept_affected[i]),
+                'current_monthly_total': round(float(dept_current[i]), 2),
+                'projected_monthly_total': round(float(dept_projected[i]), 2),
+                'monthly_delta': round(float(dept_projected[i] - dept_current[i]), 2),
+            }
+            for i, dept_id in enumerate(dept_ids)
+        ],
+    }
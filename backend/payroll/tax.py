@@ -0,0 +1,166 @@
+"""
+Batch income-tax projection.
+
+Projected annual income = YTD gross (from EmployeeYTDPayroll) + remaining
+months x expected monthly salary. Tax for the whole organisation is then
+computed in one vectorized pass per regime. Results are stored in
+TaxProjection together with a signature of their inputs, so an employee is
+only recomputed after their YTD payroll, salary or declaration changes.
+"""
+from decimal import Decimal
+
+import numpy as np
+from django.utils import timezone
+
+from employees.models import Employee
+from .models import EmployeeYTDPayroll, TaxDeclaration, TaxProjection
+
+CESS_RATE = 0.04
+
+# FY 2025-26 slabs: (upper bound of slab, rate)
+REGIMES = {
+    'new': {
+        'standard_deduction': 75000,
+        'rebate_limit': 1200000,
+        'slabs': [
+            (400000, 0.0),
+            (800000, 0.05),
+            (1200000, 0.10),
+            (1600000, 0.15),
+            (2000000, 0.20),
+            (2400000, 0.25),
+            (np.inf, 0.30),
+        ],
+    },
+    'old': {
+        'standard_deduction': 50000,
+        'rebate_limit': 500000,
+        'slabs': [
+            (250000, 0.0),
+            (500000, 0.05),
+            (1000000, 0.20),
+            (np.inf, 0.30),
+        ],
+    },
+}
+
+
+def _slab_tax(taxable, slabs):
+    tax = np.zeros_like(taxable)
+    lower = 0.0
+    for upper, rate in slabs:
+        tax += np.clip(taxable - lower, 0, upper - lower) * rate
+        lower = upper
+    return tax
+
+
+def compute_tax(gross, exemptions, is_old):
+    """Vectorized annual tax (including cess) for arrays of projected gross income."""
+    taxable = np.zeros_like(gross)
+    tax = np.zeros_like(gross)
+    for name, regime in REGIMES.items():
+        mask = is_old if name == 'old' else ~is_old
+        income = gross[mask] - regime['standard_deduction']
+        if name == 'old':
+            income = income - exemptions[mask]
+        income = np.maximum(income, 0)
+        regime_tax = _slab_tax(income, regime['slabs'])
+        regime_tax[income <= regime['rebate_limit']] = 0  # section 87A rebate
+        taxable[mask] = income
+        tax[mask] = regime_tax
+    return taxable, np.round(tax * (1 + CESS_RATE), 2)
+
+
+def _load_inputs(financial_year, employee_ids=None):
+    employees = Employee.objects.filter(is_active=True)
+    if employee_ids is not None:
+        employees = employees.filter(pk__in=employee_ids)
+    salaries = dict(employees.values_list('id', 'salary'))
+
+    ytd = {
+        row[0]: row[1:]
+        for row in EmployeeYTDPayroll.objects.filter(financial_year=financial_year, employee_id__in=salaries)
+        .values_list('employee_id', 'months_paid', 'gross_ytd')
+    }
+    declarations = {
+        row[0]: row[1:]
+        for row in TaxDeclaration.objects.filter(financial_year=financial_year, employee_id__in=salaries)
+        .values_list('employee_id', 'regime', 'exemptions')
+    }
+
+    inputs = []
+    for emp_id, salary in salaries.items():
+        months_paid, gross_ytd = ytd.get(emp_id, (0, Decimal('0')))
+        regime, exemptions = declarations.get(emp_id, ('new', Decimal('0')))
+        if salary:
+            expected_monthly = salary
+        elif months_paid:
+            expected_monthly = gross_ytd / months_paid
+        else:
+            expected_monthly = Decimal('0')
+        inputs.append((emp_id, min(months_paid, 12), gross_ytd, expected_monthly, regime, exemptions))
+    return inputs
+
+
+def _signature(months_paid, gross_ytd, expected_monthly, regime, exemptions):
+    return f"{months_paid}|{gross_ytd:.2f}|{expected_monthly:.2f}|{regime}|{exemptions:.2f}"
+
+
+def project_taxes(financial_year, employee_ids=None):
+    """
+    Return TaxProjection rows for active employees (optionally a subset),
+    recomputing only those whose inputs changed since the last run.
+    """
+    inputs = _load_inputs(financial_year, employee_ids)
+    cached = {
+        p.employee_id: p
+        for p in TaxProjection.objects.filter(
+            financial_year=financial_year, employee_id__in=[row[0] for row in inputs]
+        )
+    }
+
+    stale = []
+    for row in inputs:
+        signature = _signature(*row[1:])
+        projection = cached.get(row[0])
+        if projection is None or projection.inputs_signature != signature:
+            stale.append((row, signature))
+
+    if stale:
+        months_paid = np.array([row[1] for row, _ in stale], dtype=np.float64)
+        gross_ytd = np.array([float(row[2]) for row, _ in stale])
+        expected = np.array([float(row[3]) for row, _ in stale])
+        is_old = np.array([row[4] == 'old' for row, _ in stale])
+        exemptions = np.array([float(row[5]) for row, _ in stale])
+
+        projected_gross = gross_ytd + (12 - months_paid) * expected
+        taxable, tax = compute_tax(projected_gross, exemptions, is_old)
+        monthly_tds = np.round(tax / 12, 2)
+
+        now = timezone.now()
+        rows = []
+        for i, (row, signature) in enumerate(stale):
+            projection = cached.get(row[0]) or TaxProjection(employee_id=row[0], financial_year=financial_year)
+            projection.regime = row[4]
+            projection.gross_ytd = row[2]
+            projection.projected_gross = Decimal(f"{projected_gross[i]:.2f}")
+            projection.taxable_income = Decimal(f"{taxable[i]:.2f}")
+            projection.projected_tax = Decimal(f"{tax[i]:.2f}")
+            projection.monthly_tds = Decimal(f"{monthly_tds[i]:.2f}")
+            projection.inputs_signature = signature
+            projection.computed_at = now
+            rows.append(projection)
+            cached[row[0]] = projection
+
+        # an upsert, so concurrent requests computing the same employee and year both succeed
+        TaxProjection.objects.bulk_create(
+            rows,
+            update_conflicts=True,
+            unique_fields=['employee', 'financial_year'],
+            update_fields=[
+                'regime', 'gross_ytd', 'projected_gross', 'taxable_income',
+                'projected_tax', 'monthly_tds', 'inputs_signature', 'computed_at',
+            ],
+        )
+
+    return [cached[row[0]] for row in inputs]
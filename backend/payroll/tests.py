@@ -1,3 +1,168 @@
+from decimal import Decimal
+from unittest import mock
+
+from django.contrib.auth import get_user_model
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from employees.models import Department, Employee
+from .models import EmployeePayroll, PayrollCostRollup, SalaryComponent, EmployeeYTDPayroll, TaxDeclaration, TaxProjection
+from .services import refresh_payroll_rollups
+from .simulator import SalaryDataset, simulate_revision
+from .tax import project_taxes
+
+
+class PayrollRollupTests(TestCase):
+    def setUp(self):
+        self.dept = Department.objects.create(name="Nursing")
+        self.emp = Employee.objects.create(emp_code="E1", first_name="Asha", email="asha@test.com", department=self.dept)
+
+    def test_save_updates_rollups_incrementally(self):
+        payroll = EmployeePayroll.objects.create(employee=self.emp, month=5, year=2025, basic_salary=1000)
+        payroll.calculate()
+        payroll.save()
+
+        rollup = PayrollCostRollup.objects.get(department=self.dept, month=5, year=2025)
+        self.assertEqual(rollup.payroll_count, 1)
+        self.assertEqual(rollup.gross_total, Decimal('1000'))
+
+        payroll.basic_salary = 1500
+        payroll.calculate()
+        payroll.save()
+
+        ytd = EmployeeYTDPayroll.objects.get(employee=self.emp, financial_year=2025)
+        self.assertEqual(ytd.months_paid, 1)
+        self.assertEqual(ytd.gross_ytd, Decimal('1500'))
+
+        payroll.delete()
+        rollup.refresh_from_db()
+        self.assertEqual(rollup.payroll_count, 0)
+        self.assertEqual(rollup.net_total, Decimal('0'))
+
+    def test_department_transfer_keeps_past_rollups(self):
+        payroll = EmployeePayroll.objects.create(employee=self.emp, month=5, year=2025, basic_salary=1000)
+        payroll.calculate()
+        payroll.save()
+
+        surgery = Department.objects.create(name="Surgery")
+        self.emp.department = surgery
+        self.emp.save()
+        payroll.refresh_from_db()
+        payroll.basic_salary = 1200
+        payroll.calculate()
+        payroll.save()
+
+        rollup = PayrollCostRollup.objects.get(department=self.dept, month=5, year=2025)
+        self.assertEqual((rollup.payroll_count, rollup.gross_total), (1, Decimal('1200')))
+        self.assertFalse(PayrollCostRollup.objects.filter(department=surgery).exclude(payroll_count=0).exists())
+
+        payroll.delete()
+        rollup.refresh_from_db()
+        self.assertEqual((rollup.payroll_count, rollup.gross_total), (0, Decimal('0')))
+
+    def test_rollup_endpoints_are_for_admin_and_hr(self):
+        client = APIClient()
+        client.force_authenticate(get_user_model().objects.create_user("emp", "emp@test.com", "pw", role="Employee"))
+        self.assertEqual(client.get('/api/payroll/cost-rollups/').status_code, 403)
+        self.assertEqual(client.get('/api/payroll/ytd/').status_code, 403)
+        self.assertEqual(client.post('/api/payroll/payroll/refresh-rollups/', {'year': 2025}).status_code, 403)
+
+        client.force_authenticate(get_user_model().objects.create_user("hr", "hr@test.com", "pw", role="HR"))
+        self.assertEqual(client.get('/api/payroll/cost-rollups/').status_code, 200)
+        resp = client.post('/api/payroll/payroll/refresh-rollups/', {'year': 'abc', 'month': 13})
+        self.assertEqual(resp.status_code, 400)
+        self.assertEqual(set(resp.data), {'year', 'month'})
+        self.assertEqual(client.post('/api/payroll/payroll/refresh-rollups/', {'year': 2025}).status_code, 200)
+
+    def test_refresh_rebuilds_after_bulk_run(self):
+        EmployeePayroll.objects.bulk_create([
+            EmployeePayroll(employee=self.emp, month=1, year=2026, gross_salary=800, net_salary=700),
+            EmployeePayroll(employee=self.emp, month=3, year=2026, gross_salary=900, net_salary=800),
+        ])
+        refresh_payroll_rollups(2026)
+
+        self.assertEqual(PayrollCostRollup.objects.filter(year=2026).count(), 2)
+        ytd = EmployeeYTDPayroll.objects.get(employee=self.emp, financial_year=2025)
+        self.assertEqual(ytd.months_paid, 2)
+        self.assertEqual(ytd.net_ytd, Decimal('1500'))
+
+
+class SalaryRevisionSimulatorTests(TestCase):
+    def test_rules_apply_by_role_and_later_rules_override(self):
+        dept = Department.objects.create(name="Wards")
+        Employee.objects.create(emp_code="N1", first_name="N", email="n@test.com", role="Nurse", salary=1000, department=dept)
+        Employee.objects.create(emp_code="T1", first_name="T", email="t@test.com", role="Technician", salary=2000)
+
+        result = simulate_revision(SalaryDataset.load(), [
+            {'percent': 5},
+            {'role': 'Nurse', 'percent': 8},
+        ])
+
+        self.assertEqual(result['employees_affected'], 2)
+        self.assertEqual(result['current_monthly_total'], 3000.0)
+        self.assertEqual(result['projected_monthly_total'], 1080.0 + 2100.0)
+        wards = next(d for d in result['departments'] if d['department'] == dept.id)
+        self.assertEqual(wards['monthly_delta'], 80.0)
+        self.assertEqual(EmployeePayroll.objects.count(), 0)
+
+    def test_allowances_come_from_each_employees_latest_payroll(self):
+        a = Employee.objects.create(emp_code="A1", first_name="A", email="a@test.com", salary=1000)
+        b = Employee.objects.create(emp_code="B1", first_name="B", email="b@test.com", salary=2000)
+        meals = SalaryComponent.objects.create(name="Meals", component_type="earning", amount=50)
+        loan = SalaryComponent.objects.create(name="Loan", component_type="deduction", amount=70)
+        EmployeePayroll.objects.create(employee=a, month=1, year=2026, hra=100)
+        EmployeePayroll.objects.create(employee=a, month=3, year=2026, hra=300).components.add(meals, loan)
+        # b has no row in March; their February row still counts
+        EmployeePayroll.objects.create(employee=b, month=2, year=2026, hra=400).components.add(meals)
+
+        dataset = SalaryDataset.load()
+        allowances = dict(zip(dataset.employee_ids.tolist(), dataset.allowances.tolist()))
+        self.assertEqual(allowances, {a.id: 350.0, b.id: 450.0})
+        self.assertEqual(simulate_revision(dataset, [])['current_monthly_total'], 3800.0)
+
+
+class TaxProjectionTests(TestCase):
+    def setUp(self):
+        self.emp = Employee.objects.create(emp_code="D1", first_name="Ravi", email="ravi@test.com", salary=150000)
+
+    def test_projection_is_regime_aware_and_cached(self):
+        payroll = EmployeePayroll.objects.create(employee=self.emp, month=4, year=2025, basic_salary=150000)
+        payroll.calculate()
+        payroll.save()
+
+        # 12 x 1.5L = 18L gross, new regime taxable 17.25L
+        [projection] = project_taxes(2025)
+        self.assertEqual(projection.regime, 'new')
+        self.assertEqual(projection.projected_gross, Decimal('1800000.00'))
+        self.assertEqual(projection.projected_tax, Decimal('150800.00'))
+        computed_at = projection.computed_at
+
+        [cached] = project_taxes(2025)
+        self.assertEqual(cached.computed_at, computed_at)
+
+        TaxDeclaration.objects.create(employee=self.emp, financial_year=2025, regime='old', exemptions=150000)
+        [old] = project_taxes(2025)
+        self.assertEqual(old.regime, 'old')
+        self.assertEqual(old.taxable_income, Decimal('1600000.00'))
+        self.assertEqual(old.projected_tax, Decimal('304200.00'))
+
+    def test_projection_endpoint_validates_query_and_upserts(self):
+        client = APIClient()
+        client.force_authenticate(get_user_model().objects.create_user("hr", "hr@test.com", "pw", role="HR"))
+        self.assertEqual(client.get('/api/payroll/tax-projections/?financial_year=next').status_code, 400)
+        self.assertEqual(client.get('/api/payroll/tax-projections/?employee=x').status_code, 400)
+
+        # a concurrent request stores the same projection between our read and our write
+        from . import tax
+        compute_tax = tax.compute_tax
+
+        def racing_compute_tax(*args):
+            TaxProjection.objects.create(employee=self.emp, financial_year=2025, inputs_signature='other')
+            return compute_tax(*args)
 
-# Create your tests here.
+        with mock.patch.object(tax, 'compute_tax', racing_compute_tax):
+            resp = client.get(f'/api/payroll/tax-projections/?financial_year=2025&employee={self.emp.pk}')
+        self.assertEqual(resp.status_code, 200)
+        projection = TaxProjection.objects.get(employee=self.emp, financial_year=2025)
+        self.assertNotEqual(projection.inputs_signature, 'other')
+        self.assertEqual(resp.data[0]['projected_tax'], str(projection.projected_tax))
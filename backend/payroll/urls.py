@@ -1,8 +1,23 @@
+from django.urls import path
 from rest_framework.routers import DefaultRouter
-from .views import SalaryComponentViewSet, EmployeePayrollViewSet
+from .views import (
+    SalaryComponentViewSet,
+    EmployeePayrollViewSet,
+    PayrollCostRollupViewSet,
+    EmployeeYTDPayrollViewSet,
+    SalaryRevisionSimulationView,
+    TaxDeclarationViewSet,
+    TaxProjectionViewSet,
+)
 
 router = DefaultRouter()
 router.register(r'salary-components', SalaryComponentViewSet, basename='salary-components')
 router.register(r'payroll', EmployeePayrollViewSet, basename='payroll')
+router.register(r'cost-rollups', PayrollCostRollupViewSet, basename='cost-rollups')
+router.register(r'ytd', EmployeeYTDPayrollViewSet, basename='ytd')
+router.register(r'tax-declarations', TaxDeclarationViewSet, basename='tax-declarations')
+router.register(r'tax-projections', TaxProjectionViewSet, basename='tax-projections')
 
-urlpatterns = router.urls
+urlpatterns = router.urls + [
+    path('simulate-revision/', SalaryRevisionSimulationView.as_view(), name='simulate-revision'),
+]
@@ -1,12 +1,30 @@
+from datetime import date
+
 from rest_framework import viewsets
 from rest_framework.decorators import action
 from rest_framework.response import Response
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.views import APIView
+
+from users.permissions import IsAdminOrHR
 
-from .models import SalaryComponent, EmployeePayroll
+from .models import (
+    SalaryComponent,
+    EmployeePayroll,
+    PayrollCostRollup,
+    EmployeeYTDPayroll,
+    TaxDeclaration,
+)
 from .serializers import (
     SalaryComponentSerializer,
-    EmployeePayrollSerializer
+    EmployeePayrollSerializer,
+    PayrollCostRollupSerializer,
+    EmployeeYTDPayrollSerializer,
+    RevisionScenarioSerializer,
+    RollupRefreshSerializer,
+    TaxDeclarationSerializer,
+    TaxProjectionQuerySerializer,
+    TaxProjectionSerializer,
 )
 
 
@@ -53,3 +71,127 @@ class EmployeePayrollViewSet(viewsets.ModelViewSet):
         payroll.save()
         serializer = self.get_serializer(payroll)
         return Response(serializer.data)
+
+    @action(detail=False, methods=['post'], url_path='refresh-rollups', permission_classes=[IsAdminOrHR])
+    def refresh_rollups(self, request):
+        """Rebuild rollups once a payroll run for the given month/year has completed."""
+        serializer = RollupRefreshSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+
+        from .services import refresh_payroll_rollups
+        refresh_payroll_rollups(serializer.validated_data['year'], serializer.validated_data.get('month'))
+        return Response({'detail': 'Rollups refreshed'})
+
+
+# -----------------------------
+# Analytics (read rollups only)
+# -----------------------------
+class PayrollCostRollupViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = PayrollCostRollup.objects.all().select_related('department')
+    serializer_class = PayrollCostRollupSerializer
+    permission_classes = [IsAdminOrHR]
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        dept = self.request.query_params.get('department')
+        month = self.request.query_params.get('month')
+        year = self.request.query_params.get('year')
+
+        if dept:
+            qs = qs.filter(department_id=dept)
+        if month:
+            qs = qs.filter(month=month)
+        if year:
+            qs = qs.filter(year=year)
+
+        return qs
+
+
+class EmployeeYTDPayrollViewSet(viewsets.ReadOnlyModelViewSet):
+    queryset = EmployeeYTDPayroll.objects.all().select_related('employee')
+    serializer_class = EmployeeYTDPayrollSerializer
+    permission_classes = [IsAdminOrHR]
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        emp = self.request.query_params.get('employee')
+        fy = self.request.query_params.get('financial_year')
+
+        if emp:
+            qs = qs.filter(employee_id=emp)
+        if fy:
+            qs = qs.filter(financial_year=fy)
+
+        return qs
+
+
+# -----------------------------
+# What-if salary revisions
+# -----------------------------
+class SalaryRevisionSimulationView(APIView):
+    """
+    POST {"scenarios": [{"name": "...", "rules": [{"role": "Nurse", "percent": 8}, ...]}]}
+    or a single {"rules": [...]}. Nothing is written; salaries are loaded once
+    per request and every scenario is evaluated against the same arrays.
+    """
+    permission_classes = [IsAdminOrHR]
+
+    def post(self, request):
+        scenarios = request.data.get('scenarios')
+        if scenarios is None:
+            scenarios = [{'name': '', 'rules': request.data.get('rules', [])}]
+
+        serializer = RevisionScenarioSerializer(data=scenarios, many=True)
+        serializer.is_valid(raise_exception=True)
+
+        from .simulator import SalaryDataset, simulate_revision
+        dataset = SalaryDataset.load()
+        results = [
+            {'name': scenario['name'], **simulate_revision(dataset, scenario['rules'])}
+            for scenario in serializer.validated_data
+        ]
+        return Response({'scenarios': results})
+
+
+# -----------------------------
+# Income tax
+# -----------------------------
+class TaxDeclarationViewSet(viewsets.ModelViewSet):
+    queryset = TaxDeclaration.objects.all().order_by('-financial_year', 'employee')
+    serializer_class = TaxDeclarationSerializer
+    permission_classes = [IsAdminOrHR]
+
+    def get_queryset(self):
+        qs = super().get_queryset()
+        emp = self.request.query_params.get('employee')
+        fy = self.request.query_params.get('financial_year')
+
+        if emp:
+            qs = qs.filter(employee_id=emp)
+        if fy:
+            qs = qs.filter(financial_year=fy)
+
+        return qs
+
+
+class TaxProjectionViewSet(viewsets.ViewSet):
+    """
+    Projected annual tax and monthly TDS for every active employee
+    (or ?employee=<id>) in ?financial_year= (defaults to the current one).
+    """
+    permission_classes = [IsAdminOrHR]
+
+    def list(self, request):
+        from .services import financial_year_for
+        from .tax import project_taxes
+
+        query = TaxProjectionQuerySerializer(data=request.query_params)
+        query.is_valid(raise_exception=True)
+        fy = query.validated_data.get('financial_year')
+        if fy is None:
+            today = date.today()
+            fy = financial_year_for(today.month, today.year)
+
+        emp = query.validated_data.get('employee')
+        projections = project_taxes(fy, [emp] if emp else None)
+        return Response(TaxProjectionSerializer(projections, many=True).data)
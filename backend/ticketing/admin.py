@@ -1,5 +1,8 @@
 from django.contrib import admin
-from .models import Ticket, TicketCategory, WorkflowStage, WorkflowTransition, TicketComment
+from .models import (
+    Ticket, TicketCategory, WorkflowStage, WorkflowTransition, TicketComment,
+    SLACalendar, SLAWorkingHours, SLAHoliday, NotificationOutbox, ArchivedTicket,
+)
 
 @admin.register(TicketCategory)
 class TicketCategoryAdmin(admin.ModelAdmin):
@@ -9,8 +12,56 @@ class TicketCategoryAdmin(admin.ModelAdmin):
 class WorkflowStageAdmin(admin.ModelAdmin):
     list_display = ('name','category','position','sla_hours')
 
+@admin.register(WorkflowTransition)
+class WorkflowTransitionAdmin(admin.ModelAdmin):
+    list_display = ('category','from_stage','to_stage','condition')
+    list_filter = ('category',)
+
 @admin.register(Ticket)
 class TicketAdmin(admin.ModelAdmin):
     list_display = ('ticket_number','title','category','current_stage','status','assigned_to')
     list_filter = ('category','status','priority')
     search_fields = ('ticket_number','title','description')
+
+
+class SLAWorkingHoursInline(admin.TabularInline):
+    model = SLAWorkingHours
+    extra = 0
+
+class SLAHolidayInline(admin.TabularInline):
+    model = SLAHoliday
+    extra = 0
+
+@admin.register(SLACalendar)
+class SLACalendarAdmin(admin.ModelAdmin):
+    list_display = ('name','department','time_zone','is_active','updated_at')
+    inlines = [SLAWorkingHoursInline, SLAHolidayInline]
+    actions = ['recompute_deadlines']
+
+    @admin.action(description='Recompute deadlines of open tickets')
+    def recompute_deadlines(self, request, queryset):
+        from .sla import recompute_sla_deadlines
+        changed = sum(recompute_sla_deadlines(calendar) for calendar in queryset)
+        self.message_user(request, f'{changed} ticket deadline(s) updated.')
+
+
+@admin.register(NotificationOutbox)
+class NotificationOutboxAdmin(admin.ModelAdmin):
+    list_display = ('event','ticket','recipient','status','attempts','next_attempt_at','sent_at')
+    list_filter = ('status','event')
+
+
+@admin.register(ArchivedTicket)
+class ArchivedTicketAdmin(admin.ModelAdmin):
+    list_display = ('ticket_number','title','category','status','archived_at')
+    list_filter = ('category','status')
+    search_fields = ('ticket_number','title')
+    exclude = ('search_text',)
+    actions = ['restore']
+
+    @admin.action(description='Restore to the live ticket tables')
+    def restore(self, request, queryset):
+        from .archive import restore_ticket
+        for ticket_id in queryset.values_list('pk', flat=True):
+            restore_ticket(ticket_id)
+        self.message_user(request, f'{len(queryset)} ticket(s) restored.')
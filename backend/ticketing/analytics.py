@@ -0,0 +1,234 @@
+"""
+Incremental ticket analytics.
+
+TicketActivity is the event log. process_activities() folds new events,
+in (created_at, id) keyset order from a stored cursor, into:
+
+* StageDwell      - one row per stay of a ticket in a stage
+* TicketMetrics   - per-ticket resolution time and SLA outcome
+* DailyTicketAggregate - per day/category (volume, resolution, SLA) and
+                    per day/category/stage (dwell) sums
+
+Each chunk is one transaction that also advances the cursor, so a crash
+never double-counts. Events younger than SETTLE_DELAY are left for the
+next run: a transaction that commits late with an older timestamp still
+lands ahead of the cursor. Reports read only DailyTicketAggregate.
+"""
+from collections import defaultdict
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import F, Q, Sum
+from django.utils import timezone
+
+from .models import (
+    AnalyticsCursor, DailyTicketAggregate, StageDwell, Ticket, TicketActivity, TicketMetrics,
+    WorkflowStage, CLOSED_STATUSES,
+)
+
+PIPELINE = 'ticket_activity'
+SETTLE_DELAY = timedelta(minutes=5)
+TRACKED_ACTIONS = ('ticket_created', 'stage_changed', 'status_changed', 'sla_breached')
+AGGREGATE_FIELDS = ('created', 'resolved', 'resolution_seconds', 'sla_met', 'sla_breached',
+                    'stage_exits', 'dwell_seconds')
+
+
+class _Fold:
+    """State for folding one chunk of events; all reads are batched up front."""
+
+    def __init__(self, events):
+        ticket_ids = {e['ticket_id'] for e in events}
+        self.tickets = {
+            t['id']: t for t in Ticket.objects.filter(id__in=ticket_ids)
+            .values('id', 'category_id', 'created_at', 'sla_deadline')
+        }
+        self.open_dwells = {
+            d.ticket_id: d for d in StageDwell.objects.filter(ticket_id__in=ticket_ids, exited_at__isnull=True)
+        }
+        self.metrics = {m.ticket_id: m for m in TicketMetrics.objects.filter(ticket_id__in=ticket_ids)}
+        referenced = {
+            (e['meta'] or {}).get(key) for e in events if e['action'] == 'stage_changed' for key in ('from', 'to')
+        }
+        self.stages = {str(pk) for pk in WorkflowStage.objects.filter(pk__in=[s for s in referenced if s])
+                       .values_list('pk', flat=True)}
+        self.new_dwells, self.closed_dwells = [], []
+        self.new_metrics, self.changed_metrics = [], set()
+        self.daily = defaultdict(lambda: dict.fromkeys(AGGREGATE_FIELDS, 0))
+
+    def _metrics_for(self, ticket):
+        m = self.metrics.get(ticket['id'])
+        if m is None:
+            m = TicketMetrics(ticket_id=ticket['id'], category_id=ticket['category_id'], created_at=ticket['created_at'])
+            self.metrics[ticket['id']] = m
+            self.new_metrics.append(m)
+        elif m.ticket_id not in self.changed_metrics:
+            self.changed_metrics.add(m.ticket_id)
+        return m
+
+    def _close(self, dwell, at):
+        dwell.exited_at = at
+        dwell.seconds = max(int((at - dwell.entered_at).total_seconds()), 0)
+        bucket = self.daily[(timezone.localdate(at), dwell.category_id, dwell.stage_id)]
+        bucket['stage_exits'] += 1
+        bucket['dwell_seconds'] += dwell.seconds
+        if dwell.pk is not None:
+            self.closed_dwells.append(dwell)
+
+    def _open(self, ticket, stage_id, at):
+        dwell = StageDwell(ticket_id=ticket['id'], stage_id=stage_id, category_id=ticket['category_id'], entered_at=at)
+        self.new_dwells.append(dwell)
+        return dwell
+
+    def apply(self, event):
+        ticket = self.tickets.get(event['ticket_id'])
+        if ticket is None:
+            return
+        action, meta, at = event['action'], event['meta'] or {}, event['created_at']
+        day_bucket = self.daily[(timezone.localdate(at), ticket['category_id'], None)]
+
+        if action == 'ticket_created':
+            self._metrics_for(ticket)
+            day_bucket['created'] += 1
+
+        elif action == 'stage_changed':
+            dwell = self.open_dwells.pop(ticket['id'], None)
+            if dwell is None and meta.get('from') in self.stages:
+                # no recorded entry: the ticket has been in its first stage since creation
+                dwell = self._open(ticket, meta['from'], ticket['created_at'])
+            if dwell is not None:
+                self._close(dwell, at)
+            if meta.get('to') in self.stages:
+                self.open_dwells[ticket['id']] = self._open(ticket, meta['to'], at)
+
+        elif action == 'status_changed':
+            if meta.get('to') in CLOSED_STATUSES and meta.get('from') not in CLOSED_STATUSES:
+                m = self._metrics_for(ticket)
+                if m.resolved_at is None:
+                    m.resolved_at = at
+                    m.resolution_seconds = max(int((at - ticket['created_at']).total_seconds()), 0)
+                    day_bucket['resolved'] += 1
+                    day_bucket['resolution_seconds'] += m.resolution_seconds
+                    deadline = ticket['sla_deadline']
+                    if deadline and not m.sla_breached:
+                        if at <= deadline:
+                            day_bucket['sla_met'] += 1
+                        else:
+                            # resolved late without a recorded breach
+                            m.sla_breached = True
+                            day_bucket['sla_breached'] += 1
+                dwell = self.open_dwells.pop(ticket['id'], None)
+                if dwell is not None:
+                    self._close(dwell, at)
+
+        elif action == 'sla_breached':
+            m = self._metrics_for(ticket)
+            if not m.sla_breached:
+                m.sla_breached = True
+                day_bucket['sla_breached'] += 1
+
+    def save(self):
+        StageDwell.objects.bulk_create(self.new_dwells)
+        StageDwell.objects.bulk_update(self.closed_dwells, ['exited_at', 'seconds'])
+        TicketMetrics.objects.bulk_create(self.new_metrics)
+        TicketMetrics.objects.bulk_update(
+            [self.metrics[tid] for tid in self.changed_metrics],
+            ['resolved_at', 'resolution_seconds', 'sla_breached'],
+        )
+        for (day, category_id, stage_id), sums in self.daily.items():
+            sums = {k: v for k, v in sums.items() if v}
+            if not sums:
+                continue
+            key = {'date': day, 'category_id': category_id, 'stage_id': stage_id}
+            DailyTicketAggregate.objects.get_or_create(**key)
+            DailyTicketAggregate.objects.filter(**key).update(**{k: F(k) + v for k, v in sums.items()})
+
+
+def process_activities(chunk_size=1000, until=None):
+    """Fold every settled activity after the cursor; returns the number of events processed."""
+    until = until or timezone.now() - SETTLE_DELAY
+    total = 0
+    while True:
+        with transaction.atomic():
+            AnalyticsCursor.objects.get_or_create(name=PIPELINE)
+            cursor = AnalyticsCursor.objects.select_for_update().get(name=PIPELINE)
+            events = TicketActivity.objects.filter(created_at__lte=until, action__in=TRACKED_ACTIONS)
+            if cursor.last_created_at is not None:
+                events = events.filter(
+                    Q(created_at__gt=cursor.last_created_at)
+                    | Q(created_at=cursor.last_created_at, id__gt=cursor.last_id)
+                )
+            events = list(
+                events.order_by('created_at', 'id')
+                .values('id', 'ticket_id', 'action', 'meta', 'created_at')[:chunk_size]
+            )
+            if not events:
+                break
+
+            fold = _Fold(events)
+            for event in events:
+                fold.apply(event)
+            fold.save()
+
+            cursor.last_created_at, cursor.last_id = events[-1]['created_at'], events[-1]['id']
+            cursor.save()
+        total += len(events)
+        if len(events) < chunk_size:
+            break
+    return total
+
+
+def reset_analytics():
+    with transaction.atomic():
+        DailyTicketAggregate.objects.all().delete()
+        StageDwell.objects.all().delete()
+        TicketMetrics.objects.all().delete()
+        AnalyticsCursor.objects.filter(name=PIPELINE).delete()
+
+
+def _hours(seconds, count):
+    return round(seconds / count / 3600, 2) if count else None
+
+
+def ticket_report(start, end, category=None):
+    """MTTR, SLA compliance and stage dwell for [start, end], from the daily aggregates only."""
+    rows = DailyTicketAggregate.objects.filter(date__range=(start, end))
+    if category:
+        rows = rows.filter(category_id=category)
+
+    categories = []
+    for row in (
+        rows.filter(stage__isnull=True).values('category_id', 'category__name')
+        .annotate(created_total=Sum('created'), resolved_total=Sum('resolved'),
+                  resolution_total=Sum('resolution_seconds'), met=Sum('sla_met'), breached=Sum('sla_breached'))
+        .order_by('category__name')
+    ):
+        judged = row['met'] + row['breached']
+        categories.append({
+            'category': row['category_id'],
+            'category_name': row['category__name'],
+            'created': row['created_total'],
+            'resolved': row['resolved_total'],
+            'mttr_hours': _hours(row['resolution_total'], row['resolved_total']),
+            'sla_compliance': round(row['met'] * 100 / judged, 2) if judged else None,
+        })
+
+    stages = [
+        {
+            'stage': row['stage_id'],
+            'stage_name': row['stage__name'],
+            'category': row['category_id'],
+            'exits': row['exits'],
+            'avg_dwell_hours': _hours(row['dwell'], row['exits']),
+        }
+        for row in (
+            rows.filter(stage__isnull=False).values('stage_id', 'stage__name', 'category_id')
+            .annotate(exits=Sum('stage_exits'), dwell=Sum('dwell_seconds'))
+            .order_by('category_id', 'stage__position')
+        )
+    ]
+
+    series = list(
+        rows.filter(stage__isnull=True).values('date')
+        .annotate(created=Sum('created'), resolved=Sum('resolved')).order_by('date')
+    )
+    return {'start': start, 'end': end, 'categories': categories, 'stages': stages, 'series': series}
@@ -0,0 +1,131 @@
+"""
+Hot/cold archival of closed tickets.
+
+Closed tickets untouched for TICKET_ARCHIVE_AFTER_DAYS move, with their
+comments, activity, attachments and assignment history, into the
+Archived* tables, one chunk per transaction: copy with bulk_create, then
+delete the hot rows (the remaining per-ticket rows - search document, SLA
+records, outbox, analytics detail - go with them; the daily analytics
+aggregates are unaffected). The hot tables and their indexes then only
+hold live work.
+
+Archived rows keep their ids and column names, so the ticket views fall
+back to them with the same permission checks. The archive has no
+full-text index: archive search scans its denormalised search_text,
+which is acceptable for rarely searched cold data.
+"""
+import re
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+from django.utils.html import escape
+
+from .models import (
+    ArchivedTicket, ArchivedTicketActivity, ArchivedTicketAssignment, ArchivedTicketAttachment,
+    ArchivedTicketComment, SLARecord, Ticket, TicketActivity, TicketAssignment, TicketAttachment,
+    TicketComment, CLOSED_STATUSES,
+)
+
+# (hot model, archive model) for the rows that travel with a ticket
+CHILDREN = (
+    (TicketComment, ArchivedTicketComment),
+    (TicketActivity, ArchivedTicketActivity),
+    (TicketAttachment, ArchivedTicketAttachment),
+    (TicketAssignment, ArchivedTicketAssignment),
+)
+SNIPPET_CHARS = 80
+
+
+def _copy(target, row, **extra):
+    """An unsaved `target` with every column it shares with `row`."""
+    values = {f.attname: getattr(row, f.attname) for f in target._meta.concrete_fields if hasattr(row, f.attname)}
+    values.update(extra)
+    return target(**values)
+
+
+def archivable(cutoff):
+    return Ticket.objects.filter(status__in=CLOSED_STATUSES, updated_at__lt=cutoff)
+
+
+def archive_chunk(cutoff, chunk_size):
+    """Move up to `chunk_size` archivable tickets in one transaction; returns how many moved."""
+    with transaction.atomic():
+        tickets = list(
+            archivable(cutoff).select_for_update(skip_locked=True).order_by('updated_at', 'pk')[:chunk_size]
+        )
+        if not tickets:
+            return 0
+        ids = [t.pk for t in tickets]
+
+        children = {
+            archive_model: [_copy(archive_model, row) for row in model.objects.filter(ticket_id__in=ids).order_by()]
+            for model, archive_model in CHILDREN
+        }
+        texts = {t.pk: [t.ticket_number, t.title, t.description or ''] for t in tickets}
+        for comment in children[ArchivedTicketComment]:
+            if not comment.is_internal:
+                texts[comment.ticket_id].append(comment.content)
+        breached = set(SLARecord.objects.filter(ticket_id__in=ids, breached=True).values_list('ticket_id', flat=True))
+
+        now = timezone.now()
+        ArchivedTicket.objects.bulk_create([
+            _copy(ArchivedTicket, t, sla_breached=t.pk in breached, search_text='\n'.join(texts[t.pk]), archived_at=now)
+            for t in tickets
+        ])
+        for archive_model, rows in children.items():
+            archive_model.objects.bulk_create(rows, batch_size=1000)
+        Ticket.objects.filter(pk__in=ids).delete()
+    return len(tickets)
+
+
+def archive_closed_tickets(days=None, chunk_size=None):
+    days = settings.TICKET_ARCHIVE_AFTER_DAYS if days is None else days
+    chunk_size = chunk_size or settings.TICKET_ARCHIVE_CHUNK_SIZE
+    cutoff = timezone.now() - timedelta(days=days)
+    total = 0
+    while True:
+        moved = archive_chunk(cutoff, chunk_size)
+        total += moved
+        if moved < chunk_size:
+            return total
+
+
+@transaction.atomic
+def restore_ticket(ticket_id):
+    """Move an archived ticket (e.g. one being reopened) back into the hot tables."""
+    archived = ArchivedTicket.objects.select_for_update().get(pk=ticket_id)
+    # bulk_create skips Ticket.save: the ticket is closed, so there is no timer or load to restore
+    Ticket.objects.bulk_create([_copy(Ticket, archived)])
+    for model, archive_model in CHILDREN:
+        model.objects.bulk_create([_copy(model, row) for row in archive_model.objects.filter(ticket=archived)])
+    archived.delete()
+
+    from .search import schedule_index
+    schedule_index(archived.pk)
+    return Ticket.objects.get(pk=ticket_id)
+
+
+def _snippet(text, terms):
+    lowered = text.lower()
+    hits = [i for i in (lowered.find(term.lower()) for term in terms) if i >= 0]
+    start = max(min(hits, default=0) - SNIPPET_CHARS // 2, 0)
+    excerpt = escape(text[start:start + SNIPPET_CHARS])
+    pattern = re.compile('|'.join(re.escape(term) for term in terms), re.IGNORECASE)
+    return ('…' if start else '') + pattern.sub(lambda m: f'<mark>{m.group(0)}</mark>', excerpt)
+
+
+def search_archive(text, tickets, limit=20, offset=0):
+    """
+    Archived tickets in `tickets` containing every word of `text`, newest
+    first. Returns (archived_ticket, snippet) pairs in search_tickets'
+    snippet format.
+    """
+    terms = re.findall(r'\w+', text or '')
+    if not terms:
+        return []
+    for term in terms:
+        tickets = tickets.filter(search_text__icontains=term)
+    page = tickets.order_by('-created_at', '-pk')[offset:offset + limit]
+    return [(ticket, _snippet(ticket.search_text, terms)) for ticket in page]
@@ -0,0 +1,153 @@
+"""
+Load-balanced auto-assignment.
+
+A ticket with no assignee goes to the least-loaded active user holding the
+stage's (else the category's) default_assignee_role, matched against
+CustomUser.role or a group of that name. Load comes from AssigneeLoad
+counters, moved by Ticket.save whenever an assignment or open/closed
+status changes, so choosing an assignee never counts tickets. The chosen
+counter row is locked until the assignment commits (skipping rows other
+creators hold), so concurrent tickets spread across the pool instead of
+piling onto the same user.
+"""
+import heapq
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Count, F, Q
+from django.utils import timezone
+
+from .models import AssigneeLoad, Ticket, TicketActivity, TicketAssignment, CLOSED_STATUSES
+
+
+def _open_ticket_counts(user_ids=None):
+    tickets = Ticket.objects.filter(assigned_to__isnull=False).exclude(status__in=CLOSED_STATUSES)
+    if user_ids is not None:
+        tickets = tickets.filter(assigned_to_id__in=user_ids)
+    return dict(tickets.values('assigned_to_id').annotate(n=Count('id')).values_list('assigned_to_id', 'n'))
+
+
+def apply_load_delta(previous, current):
+    """Move one ticket's contribution between (assignee, is_open) states."""
+    apply_load_deltas([(previous, current)])
+
+
+def apply_load_deltas(changes):
+    """apply_load_delta for many tickets: one counter update per affected user."""
+    deltas = {}
+    for previous, current in changes:
+        for (user_id, is_open), sign in ((previous, -1), (current, 1)):
+            if user_id and is_open:
+                deltas[user_id] = deltas.get(user_id, 0) + sign
+    with transaction.atomic():
+        for user_id, delta in deltas.items():
+            if not delta:
+                continue
+            updated = AssigneeLoad.objects.filter(user_id=user_id).update(
+                open_tickets=F('open_tickets') + delta, updated_at=timezone.now(),
+            )
+            if not updated:
+                # first time we see this user: seed from the (already saved) tickets
+                ensure_load_rows([user_id])
+
+
+def ensure_load_rows(user_ids):
+    """Create missing counter rows, seeded with the users' real open-ticket counts."""
+    existing = set(AssigneeLoad.objects.filter(user_id__in=user_ids).values_list('user_id', flat=True))
+    missing = [uid for uid in user_ids if uid not in existing]
+    if missing:
+        counts = _open_ticket_counts(missing)
+        AssigneeLoad.objects.bulk_create(
+            [AssigneeLoad(user_id=uid, open_tickets=counts.get(uid, 0)) for uid in missing],
+            ignore_conflicts=True,
+        )
+
+
+def refresh_assignee_loads():
+    """Recompute every counter from the tickets (repairs drift from queryset updates/deletes)."""
+    counts = _open_ticket_counts()
+    with transaction.atomic():
+        AssigneeLoad.objects.exclude(user_id__in=list(counts)).exclude(open_tickets=0).update(open_tickets=0)
+        existing = set(AssigneeLoad.objects.filter(user_id__in=list(counts)).values_list('user_id', flat=True))
+        for user_id, n in counts.items():
+            if user_id in existing:
+                AssigneeLoad.objects.filter(user_id=user_id).exclude(open_tickets=n).update(open_tickets=n)
+        ensure_load_rows([user_id for user_id in counts if user_id not in existing])
+    return len(counts)
+
+
+def eligible_user_ids(role):
+    User = get_user_model()
+    match = Q(groups__name=role)
+    if any(f.name == 'role' for f in User._meta.fields):
+        match |= Q(role=role)
+    return list(User.objects.filter(match, is_active=True).values_list('pk', flat=True).distinct())
+
+
+def assignee_role(ticket):
+    stage = ticket.current_stage
+    if stage and stage.default_assignee_role:
+        return stage.default_assignee_role
+    return getattr(ticket.category, 'default_assignee_role', None)
+
+
+def pick_assignee(role, exclude=None):
+    """
+    Least-loaded eligible user id for `role`, or None. Call inside a
+    transaction: the chosen counter row stays locked until it commits.
+    """
+    user_ids = [uid for uid in eligible_user_ids(role) if uid != exclude]
+    if not user_ids:
+        return None
+    ensure_load_rows(user_ids)
+    candidates = AssigneeLoad.objects.filter(user_id__in=user_ids).order_by('open_tickets', 'updated_at', 'user_id')
+    load = candidates.select_for_update(skip_locked=True).first() or candidates.select_for_update().first()
+    return load.user_id if load else None
+
+
+def plan_assignees(role, count):
+    """
+    Spread `count` tickets over the role's users, least-loaded first, as
+    if they were auto-assigned one by one. Returns a user id per ticket
+    (empty when nobody holds the role). Call inside a transaction: the
+    counter rows stay locked until it commits.
+    """
+    user_ids = eligible_user_ids(role)
+    if not user_ids or count <= 0:
+        return []
+    ensure_load_rows(user_ids)
+    loads = (
+        AssigneeLoad.objects.filter(user_id__in=user_ids).select_for_update()
+        .order_by('open_tickets', 'updated_at', 'user_id').values_list('user_id', 'open_tickets')
+    )
+    heap = [(open_tickets, rank, user_id) for rank, (user_id, open_tickets) in enumerate(loads)]
+    heapq.heapify(heap)
+    picks = []
+    for _ in range(count):
+        open_tickets, rank, user_id = heapq.heappop(heap)
+        picks.append(user_id)
+        heapq.heappush(heap, (open_tickets + 1, rank, user_id))
+    return picks
+
+
+@transaction.atomic
+def auto_assign(ticket, actor=None, role=None):
+    """Assign `ticket` to the least-loaded holder of its default role. Returns the user or None."""
+    role = role or assignee_role(ticket)
+    if not role:
+        return None
+    user_id = pick_assignee(role, exclude=ticket.assigned_to_id)
+    if user_id is None:
+        return None
+
+    to_user = get_user_model().objects.get(pk=user_id)
+    TicketAssignment.objects.create(ticket=ticket, from_user=ticket.assigned_to, to_user=to_user,
+                                    to_role=role, reason='auto-assigned', performed_by=actor)
+    ticket.assigned_to = to_user
+    ticket.save(update_fields=['assigned_to', 'updated_at'])  # moves the load counters
+    TicketActivity.objects.create(ticket=ticket, actor=actor, action='auto_assigned',
+                                  meta={'to': str(to_user.id), 'role': role})
+
+    from .notifications import notify_assignment
+    notify_assignment(ticket, actor, to_user)
+    return to_user
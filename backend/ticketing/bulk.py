@@ -0,0 +1,308 @@
+"""
+Bulk ticket operations: transition, assign and close many tickets at once,
+and idempotent batch ingestion from upstream systems.
+
+The whole set is locked and validated first; if any ticket is missing,
+not the caller's to change, or cannot make the move, nothing is applied
+and every problem is reported. Otherwise the change is written with
+bulk_update/bulk_create in one transaction, and notifications go to the
+outbox as one batch (the dispatcher then coalesces them per recipient).
+The cost is a handful of queries whatever the number of tickets.
+
+save_tickets() repeats, for a batch, what Ticket.save does after a save:
+SLA timers, status_changed activities and assignee load counters.
+
+ingest_tickets() upserts on (source_system, source_id), so an integration
+can resend a batch after a timeout without creating duplicates.
+"""
+from collections import defaultdict
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import (
+    ArchivedTicket, Ticket, TicketActivity, TicketAssignment, TicketCategory, WorkflowStage, CLOSED_STATUSES,
+)
+from .realtime import publish, ticket_event
+
+# what a resent record may change on an existing ticket; routing fields are set only on creation
+INGEST_FIELDS = ('title', 'description', 'priority', 'department', 'due_date', 'is_internal')
+
+
+class BulkValidationError(Exception):
+    def __init__(self, errors):
+        super().__init__('No tickets were changed')
+        self.errors = errors  # {ticket id: reason}
+
+
+def lock_tickets(ticket_ids, actor):
+    """Lock the tickets in primary-key order (so concurrent bulk calls cannot deadlock)."""
+    from .permissions import can_transition
+
+    tickets = list(
+        Ticket.objects.filter(pk__in=ticket_ids)
+        .select_related('category', 'current_stage', 'raised_by', 'assigned_to')
+        .select_for_update(of=('self',))
+        .order_by('pk')
+    )
+    found = {str(t.pk) for t in tickets}
+    errors = {str(tid): 'Ticket not found' for tid in ticket_ids if str(tid) not in found}
+    errors.update({str(t.pk): 'Not allowed' for t in tickets if not can_transition(actor, t)})
+    if errors:
+        raise BulkValidationError(errors)
+    return tickets
+
+
+def save_tickets(tickets, fields, actor=None):
+    from .assignment import apply_load_deltas
+    from .services import sync_sla_timer
+
+    now = timezone.now()
+    for ticket in tickets:
+        ticket.updated_at = now
+    Ticket.objects.bulk_update(tickets, [*fields, 'updated_at'])
+
+    activities, load_changes = [], []
+    for ticket in tickets:
+        previous = ticket._sla_state
+        current = (ticket.sla_deadline, ticket.status)
+        if current != previous:
+            sync_sla_timer(ticket, *previous)
+            ticket._sla_state = current
+            if previous[1] != ticket.status:
+                activities.append(TicketActivity(ticket=ticket, actor=actor, action='status_changed',
+                                                 meta={'from': previous[1], 'to': ticket.status}, created_at=now))
+        load = ticket.load_state()
+        if load != ticket._load_state:
+            load_changes.append((ticket._load_state, load))
+            ticket._load_state = load
+    TicketActivity.objects.bulk_create(activities)
+    apply_load_deltas(load_changes)
+
+
+def _reassign(tickets, to_users, actor, reason='', role=None, action='assigned'):
+    """Point each ticket at its user (in memory) and return the audit rows to write."""
+    assignments, activities = [], []
+    for ticket, to_user in zip(tickets, to_users):
+        assignments.append(TicketAssignment(ticket=ticket, from_user_id=ticket.assigned_to_id, to_user=to_user,
+                                            to_role=role, reason=reason, performed_by=actor))
+        meta = {'to': str(to_user.pk)}
+        if role:
+            meta['role'] = role
+        activities.append(TicketActivity(ticket=ticket, actor=actor, action=action, meta=meta))
+        ticket.assigned_to = to_user
+    return assignments, activities
+
+
+def _assignment_rows(tickets, actor):
+    from .notifications import outbox_rows
+    return [row for ticket in tickets for row in outbox_rows('assigned', ticket, [ticket.assigned_to], actor)]
+
+
+@transaction.atomic
+def bulk_assign(ticket_ids, to_user, actor, reason=''):
+    from .notifications import save_outbox_rows
+
+    tickets = [t for t in lock_tickets(ticket_ids, actor) if t.assigned_to_id != to_user.pk]
+    assignments, activities = _reassign(tickets, [to_user] * len(tickets), actor, reason)
+    save_tickets(tickets, ['assigned_to'], actor)
+    TicketAssignment.objects.bulk_create(assignments)
+    TicketActivity.objects.bulk_create(activities)
+    save_outbox_rows(_assignment_rows(tickets, actor))
+    publish([ticket_event(t, 'assigned', actor, assigned_to=to_user.pk) for t in tickets])
+    return tickets
+
+
+@transaction.atomic
+def bulk_close(ticket_ids, actor, status='closed'):
+    if status not in CLOSED_STATUSES:
+        raise ValueError(f'status must be one of {", ".join(CLOSED_STATUSES)}')
+    tickets = [t for t in lock_tickets(ticket_ids, actor) if t.status not in CLOSED_STATUSES]
+    for ticket in tickets:
+        ticket.status = status
+    save_tickets(tickets, ['status'], actor)  # logs status_changed, cancels SLA timers, frees load
+    publish([ticket_event(t, 'status_changed', actor, status=status) for t in tickets])
+    return tickets
+
+
+@transaction.atomic
+def bulk_transition(ticket_ids, to_stage, actor, comment=None):
+    from .assignment import eligible_user_ids, plan_assignees
+    from .notifications import outbox_rows, save_outbox_rows
+    from .sla import start_sla_clocks
+    from .workflow import workflow_for
+
+    tickets = lock_tickets(ticket_ids, actor)
+    errors = {
+        str(t.pk): 'Invalid transition' for t in tickets
+        if t.category is None or not workflow_for(t.category).can_transition(t, to_stage.id)
+    }
+    if errors:
+        raise BulkValidationError(errors)
+
+    now = timezone.now()
+    previous = {t.pk: str(t.current_stage_id) if t.current_stage_id else None for t in tickets}
+    activities = []
+    for ticket in tickets:
+        activities.append(TicketActivity(
+            ticket=ticket, actor=actor, action='stage_changed', created_at=now,
+            meta={'from': previous[ticket.pk], 'to': str(to_stage.id)},
+        ))
+        ticket.current_stage = to_stage
+    if to_stage.sla_hours:
+        start_sla_clocks(tickets, now)
+
+    # hand tickets to the stage's role unless their assignee already holds it
+    assignments, reassigned = [], []
+    role = to_stage.default_assignee_role
+    if role:
+        eligible = set(eligible_user_ids(role))
+        reassigned = [t for t in tickets if t.assigned_to_id not in eligible]
+        picks = plan_assignees(role, len(reassigned))
+        if not picks:
+            reassigned = []
+        else:
+            users = get_user_model().objects.in_bulk(set(picks))
+            assignments, auto_activities = _reassign(reassigned, [users[uid] for uid in picks], actor,
+                                                     reason='auto-assigned', role=role, action='auto_assigned')
+            activities += auto_activities
+
+    save_tickets(tickets, ['current_stage', 'sla_started_at', 'sla_deadline', 'assigned_to'], actor)
+    TicketAssignment.objects.bulk_create(assignments)
+    TicketActivity.objects.bulk_create(activities)
+    save_outbox_rows(_assignment_rows(reassigned, actor) + [
+        row for ticket in tickets
+        for row in outbox_rows('stage_changed', ticket, [ticket.raised_by, ticket.assigned_to], actor,
+                               stage=to_stage.name, comment=comment)
+    ])
+    publish([
+        ticket_event(t, 'stage_changed', actor, stage={'id': str(to_stage.id), 'name': to_stage.name},
+                     previous_stage=previous[t.pk], assigned_to=t.assigned_to_id)
+        for t in tickets
+    ])
+    return tickets
+
+
+def _by_source(model, keys):
+    match = Q(pk__in=[])
+    systems = defaultdict(list)
+    for system, source_id in keys:
+        systems[system].append(source_id)
+    for system, source_ids in systems.items():
+        match |= Q(source_system=system, source_id__in=source_ids)
+    return model.objects.filter(match)
+
+
+def _first_stages(category_ids):
+    first = {}
+    for stage in WorkflowStage.objects.filter(category_id__in=category_ids).order_by('category_id', 'position'):
+        first.setdefault(stage.category_id, stage)
+    return first
+
+
+@transaction.atomic
+def ingest_tickets(items, actor):
+    """
+    Create or update one ticket per (source_system, source_id). New tickets
+    get their numbers in one allocation, start in their category's first
+    stage, start the SLA clock and are auto-assigned per role, all with bulk
+    writes. Records whose ticket has been archived are left alone. Returns
+    [(key, result, ticket)] in input order, with result being created,
+    updated, unchanged or archived.
+    """
+    from .assignment import apply_load_deltas, assignee_role, plan_assignees
+    from .notifications import outbox_rows, save_outbox_rows
+    from .search import index_tickets
+    from .services import generate_ticket_numbers, sync_sla_timer
+    from .sla import start_sla_clocks
+
+    batch = {}
+    for item in items:
+        batch[(item['source_system'], item['source_id'])] = item  # a record repeated in one batch: last wins
+
+    keys = {item['category'] for item in batch.values() if item.get('category')}
+    categories = {c.key: c for c in TicketCategory.objects.filter(key__in=keys)}
+    errors = {
+        f'{system}:{source_id}': f"Unknown category '{item['category']}'"
+        for (system, source_id), item in batch.items() if item.get('category') and item['category'] not in categories
+    }
+    if errors:
+        raise BulkValidationError(errors)
+
+    existing = {
+        (t.source_system, t.source_id): t
+        for t in _by_source(Ticket, batch).select_for_update(of=('self',)).order_by('pk')
+    }
+    archived = {(t.source_system, t.source_id): t for t in _by_source(ArchivedTicket, batch).only(
+        'id', 'ticket_number', 'source_system', 'source_id')}
+
+    # -- new tickets
+    fresh = [key for key in batch if key not in existing and key not in archived]
+    stages = _first_stages({c.pk for c in categories.values()})
+    now = timezone.now()
+    created = []
+    for (system, source_id), number in zip(fresh, generate_ticket_numbers(len(fresh)) if fresh else []):
+        item = batch[(system, source_id)]
+        category = categories.get(item.get('category'))
+        created.append(Ticket(
+            source_system=system, source_id=source_id, ticket_number=number, category=category,
+            current_stage=stages.get(category.pk) if category else None, raised_by=actor, created_at=now,
+            **{field: item[field] for field in INGEST_FIELDS if field in item},
+        ))
+    start_sla_clocks(created, now)
+    activities = [TicketActivity(ticket=t, actor=actor, action='ticket_created', meta={}, created_at=now)
+                  for t in created]
+    assignments, by_role = [], defaultdict(list)
+    for ticket in created:
+        role = assignee_role(ticket)
+        if role:
+            by_role[role].append(ticket)
+    for role, group in by_role.items():
+        # least-loaded holders of the role, as auto_assign would pick one by one
+        picks = plan_assignees(role, len(group))
+        if picks:
+            users = get_user_model().objects.in_bulk(set(picks))
+            rows, auto_activities = _reassign(group, [users[uid] for uid in picks], actor,
+                                              reason='auto-assigned', role=role, action='auto_assigned')
+            assignments += rows
+            activities += auto_activities
+    Ticket.objects.bulk_create(created, ignore_conflicts=True)
+
+    # a concurrent ingest of the same record won the insert: update its ticket instead
+    inserted = set(Ticket.objects.filter(pk__in=[t.pk for t in created]).values_list('pk', flat=True))
+    lost = [(t.source_system, t.source_id) for t in created if t.pk not in inserted]
+    if lost:
+        existing.update({
+            (t.source_system, t.source_id): t for t in _by_source(Ticket, lost).select_for_update(of=('self',))
+        })
+    created = [t for t in created if t.pk in inserted]
+
+    TicketAssignment.objects.bulk_create([a for a in assignments if a.ticket_id in inserted])
+    TicketActivity.objects.bulk_create([a for a in activities if a.ticket_id in inserted])
+    apply_load_deltas([((None, False), t.load_state()) for t in created])
+    for ticket in created:
+        sync_sla_timer(ticket, None, None)
+    save_outbox_rows([row for t in created for row in outbox_rows('ticket_created', t, [t.assigned_to], actor)])
+
+    # -- resent records
+    updated = []
+    for key, ticket in existing.items():
+        item = batch[key]
+        changed = [f for f in INGEST_FIELDS if f in item and getattr(ticket, f) != item[f]]
+        for field in changed:
+            setattr(ticket, field, item[field])
+        if changed:
+            updated.append(ticket)
+    save_tickets(updated, list(INGEST_FIELDS), actor)
+
+    reindex = [t.pk for t in created + updated]
+    if reindex:
+        transaction.on_commit(lambda: index_tickets(reindex))
+
+    results = {(t.source_system, t.source_id): ('created', t) for t in created}
+    changed = {t.pk for t in updated}
+    results.update({key: ('updated' if t.pk in changed else 'unchanged', t) for key, t in existing.items()})
+    results.update({key: ('archived', t) for key, t in archived.items()})
+    return [(key, *results[key]) for key in batch]
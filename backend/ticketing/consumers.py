@@ -0,0 +1,82 @@
+"""
+WebSocket endpoint for real-time ticket events (see ticketing/realtime.py).
+
+    ws://<host>/ws/tickets/?token=<JWT access token>[&ticket=<id>]
+
+A socket receives events for every ticket its user may see; `ticket`
+narrows it to one ticket for detail pages. Browsers cannot set headers on
+a WebSocket, so the access token travels in the query string; a Django
+session (admin) works too.
+"""
+from collections import deque
+from urllib.parse import parse_qs
+
+from channels.auth import AuthMiddlewareStack
+from channels.db import database_sync_to_async
+from channels.generic.websocket import AsyncJsonWebsocketConsumer
+from channels.middleware import BaseMiddleware
+
+from .realtime import PUBLIC_FIELDS, can_receive, subscriber_groups
+
+
+def _query(scope):
+    return {key: values[0] for key, values in parse_qs(scope.get('query_string', b'').decode()).items()}
+
+
+@database_sync_to_async
+def _user_for_token(raw_token):
+    from rest_framework_simplejwt.authentication import JWTAuthentication
+    from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+    auth = JWTAuthentication()
+    try:
+        return auth.get_user(auth.get_validated_token(raw_token))
+    except (InvalidToken, AuthenticationFailed):
+        return None
+
+
+class TokenAuthMiddleware(BaseMiddleware):
+    """Authenticates `?token=` with SimpleJWT, falling back to the session user."""
+
+    async def __call__(self, scope, receive, send):
+        token = _query(scope).get('token')
+        if token:
+            user = await _user_for_token(token)
+            if user is not None:
+                scope = {**scope, 'user': user}
+        return await super().__call__(scope, receive, send)
+
+
+def TokenAuthMiddlewareStack(inner):
+    return AuthMiddlewareStack(TokenAuthMiddleware(inner))
+
+
+class TicketEventsConsumer(AsyncJsonWebsocketConsumer):
+    async def connect(self):
+        user = self.scope.get('user')
+        if user is None or not user.is_authenticated:
+            await self.close(code=4401)
+            return
+        self.user = user
+        self.ticket_filter = _query(self.scope).get('ticket')
+        self.seen = deque(maxlen=256)  # an event can reach a user through two groups
+        self.subscribed = await database_sync_to_async(subscriber_groups)(user)
+        for group in self.subscribed:
+            await self.channel_layer.group_add(group, self.channel_name)
+        await self.accept()
+
+    async def disconnect(self, code):
+        for group in getattr(self, 'subscribed', ()):
+            await self.channel_layer.group_discard(group, self.channel_name)
+
+    async def receive_json(self, content, **kwargs):
+        if content.get('action') == 'ping':
+            await self.send_json({'event': 'pong'})
+
+    async def ticket_event(self, event):
+        if event['id'] in self.seen:
+            return
+        self.seen.append(event['id'])
+        if self.ticket_filter and event['ticket'] != self.ticket_filter:
+            return
+        if can_receive(self.user, event):
+            await self.send_json({field: event[field] for field in PUBLIC_FIELDS})
@@ -0,0 +1,16 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from ticketing.archive import archive_closed_tickets
+
+
+class Command(BaseCommand):
+    help = "Move closed tickets older than --days, with their comments and activity, to the archive tables."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int, default=settings.TICKET_ARCHIVE_AFTER_DAYS)
+        parser.add_argument('--chunk-size', type=int, default=settings.TICKET_ARCHIVE_CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        total = archive_closed_tickets(days=options['days'], chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Archived {total} ticket(s).'))
@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from ticketing.analytics import process_activities, reset_analytics
+
+
+class Command(BaseCommand):
+    help = "Rebuild ticket analytics (stage dwell, metrics, daily aggregates) from the full activity history."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000)
+        parser.add_argument('--resume', action='store_true',
+                            help="Continue from the stored cursor instead of starting over.")
+
+    def handle(self, *args, **options):
+        if not options['resume']:
+            reset_analytics()
+        # activities are read in keyset-ordered chunks, one transaction each
+        total = process_activities(chunk_size=options['chunk_size'], until=timezone.now())
+        self.stdout.write(self.style.SUCCESS(f'Processed {total} activit{"y" if total == 1 else "ies"}.'))
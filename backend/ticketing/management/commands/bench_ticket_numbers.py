@@ -0,0 +1,87 @@
+import threading
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.utils import timezone
+
+from ticketing.models import TicketSequence
+from ticketing.services import TicketNumberAllocator
+
+
+def row_lock_number():
+    # the previous implementation: one select_for_update per ticket
+    prefix = timezone.now().strftime('TCK-%Y%m')
+    with transaction.atomic():
+        seq_obj, created = TicketSequence.objects.select_for_update().get_or_create(id=prefix)
+        seq_obj.seq += 1
+        seq_obj.save()
+    return f'{prefix}-{seq_obj.seq:06d}'
+
+
+def in_transaction(allocate, hold):
+    def run():
+        with transaction.atomic():
+            number = allocate()
+            time.sleep(hold)  # the rest of the caller's transaction
+        return number
+    return run
+
+
+class Command(BaseCommand):
+    help = (
+        "Measure ticket number allocation throughput with concurrent writers, "
+        "comparing the per-ticket row lock with the block allocator. "
+        "--hold-ms runs each allocation inside a transaction that stays open that long, "
+        "as ticket creates, bulk operations and ingest do. "
+        "Run against PostgreSQL; SQLite serializes all writers regardless."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=32)
+        parser.add_argument('--per-writer', type=int, default=200)
+        parser.add_argument('--block-size', type=int, default=20)
+        parser.add_argument('--hold-ms', type=int, default=0,
+                            help="allocate inside a transaction held open this long (0: autocommit)")
+
+    def handle(self, *args, **options):
+        writers, per_writer = options['writers'], options['per_writer']
+        allocator = TicketNumberAllocator(block_size=options['block_size'])
+        hold = options['hold_ms'] / 1000
+
+        for label, allocate in (
+            ('row lock per ticket', row_lock_number),
+            (f"hi-lo blocks of {options['block_size']}", lambda: allocator.allocate()[0]),
+        ):
+            if hold:
+                allocate = in_transaction(allocate, hold)
+            numbers, errors, elapsed = self._run(allocate, writers, per_writer)
+            self.stdout.write(
+                f"{label:<24} {len(numbers)} numbers in {elapsed:.2f}s "
+                f"= {len(numbers) / elapsed:,.0f}/s  "
+                f"unique={len(set(numbers)) == len(numbers)}  failed_writers={errors}"
+            )
+
+    def _run(self, allocate, writers, per_writer):
+        results = [[] for _ in range(writers)]
+        errors = []
+        barrier = threading.Barrier(writers)
+
+        def writer(out):
+            try:
+                barrier.wait()
+                for _ in range(per_writer):
+                    out.append(allocate())
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=writer, args=(out,)) for out in results]
+        start = time.perf_counter()
+        for t in threads:
+            t.start()
+        for t in threads:
+            t.join()
+        elapsed = time.perf_counter() - start
+        return [n for out in results for n in out], len(errors), elapsed
@@ -0,0 +1,23 @@
+from django.core.management.base import BaseCommand
+
+from ticketing.models import Ticket
+from ticketing.search import index_tickets
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search documents of every ticket, in batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500)
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        ids = Ticket.objects.order_by('pk').values_list('pk', flat=True)
+        batch, total = [], 0
+        for ticket_id in ids.iterator(chunk_size=batch_size):
+            batch.append(ticket_id)
+            if len(batch) >= batch_size:
+                total += index_tickets(batch)
+                batch = []
+        total += index_tickets(batch) if batch else 0
+        self.stdout.write(self.style.SUCCESS(f'Indexed {total} ticket(s).'))
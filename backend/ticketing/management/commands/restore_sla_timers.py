@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+
+from ticketing.tasks import check_sla_breaches, restore_sla_timers
+
+
+class Command(BaseCommand):
+    help = ("Re-arm SLA deadline timers after the Celery broker lost its queued messages. "
+            "Run once: timers already queued would be duplicated.")
+
+    def handle(self, *args, **options):
+        breached = check_sla_breaches()
+        armed = restore_sla_timers()
+        self.stdout.write(self.style.SUCCESS(f'Recorded {breached} missed breach(es); re-armed {armed} timer(s).'))
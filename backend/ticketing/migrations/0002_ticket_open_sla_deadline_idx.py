@@ -0,0 +1,19 @@
+# Generated by Django 5.2.18 on 2026-10-19 18:56
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ticketing', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(condition=models.Q(('status__in', ('closed', 'resolved')), _negated=True), fields=['sla_deadline'], name='ticket_open_sla_deadline_idx'),
+        ),
+    ]
@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:00
+
+import django.db.models.deletion
+import django.utils.timezone
+import ticketing.models
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ticketing', '0002_ticket_open_sla_deadline_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SLACalendar',
+            fields=[
+                ('id', models.UUIDField(default=ticketing.models.gen_uuid, editable=False, primary_key=True, serialize=False)),
+                ('name', models.CharField(max_length=200)),
+                ('department', models.CharField(blank=True, max_length=100, null=True, unique=True)),
+                ('time_zone', models.CharField(default='Asia/Kolkata', max_length=64)),
+                ('is_active', models.BooleanField(default=True)),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='ticket',
+            name='sla_started_at',
+            field=models.DateTimeField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='ticketcategory',
+            name='default_sla_hours',
+            field=models.IntegerField(blank=True, null=True),
+        ),
+        migrations.AddField(
+            model_name='ticketcategory',
+            name='sla_business_hours',
+            field=models.BooleanField(default=False),
+        ),
+        migrations.CreateModel(
+            name='SLAWorkingHours',
+            fields=[
+                ('id', models.UUIDField(default=ticketing.models.gen_uuid, editable=False, primary_key=True, serialize=False)),
+                ('weekday', models.PositiveSmallIntegerField(choices=[(0, 'Monday'), (1, 'Tuesday'), (2, 'Wednesday'), (3, 'Thursday'), (4, 'Friday'), (5, 'Saturday'), (6, 'Sunday')])),
+                ('start_time', models.TimeField()),
+                ('end_time', models.TimeField()),
+                ('calendar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='working_hours', to='ticketing.slacalendar')),
+            ],
+            options={
+                'ordering': ['weekday', 'start_time'],
+            },
+        ),
+        migrations.CreateModel(
+            name='SLAHoliday',
+            fields=[
+                ('id', models.UUIDField(default=ticketing.models.gen_uuid, editable=False, primary_key=True, serialize=False)),
+                ('date', models.DateField()),
+                ('name', models.CharField(blank=True, max_length=200)),
+                ('calendar', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='holidays', to='ticketing.slacalendar')),
+            ],
+            options={
+                'ordering': ['date'],
+                'unique_together': {('calendar', 'date')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:02
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ticketing', '0003_sla_calendars'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='ticketcategory',
+            name='workflow_version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
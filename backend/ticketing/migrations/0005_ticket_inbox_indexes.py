@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:04
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ticketing', '0004_category_workflow_version'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['raised_by', '-created_at'], name='ticket_raised_by_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['assigned_to', '-created_at'], name='ticket_assignee_created_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticket',
+            index=models.Index(fields=['category', '-created_at'], name='ticket_category_created_idx'),
+        ),
+    ]
@@ -0,0 +1,82 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+DOCUMENT_TABLE = 'ticketing_ticketsearchdocument'
+FTS_TABLE = 'ticketing_ticket_fts'
+
+POSTGRES_SETUP = [
+    f"""ALTER TABLE {DOCUMENT_TABLE} ADD COLUMN search_vector tsvector GENERATED ALWAYS AS (
+        setweight(to_tsvector('english', coalesce(title, '')), 'A') ||
+        setweight(to_tsvector('english', coalesce(body, '')), 'B')
+    ) STORED""",
+    f"CREATE INDEX ticket_search_vector_idx ON {DOCUMENT_TABLE} USING GIN (search_vector)",
+]
+POSTGRES_TEARDOWN = [
+    "DROP INDEX IF EXISTS ticket_search_vector_idx",
+    f"ALTER TABLE {DOCUMENT_TABLE} DROP COLUMN IF EXISTS search_vector",
+]
+
+SQLITE_SETUP = [
+    f"""CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        title, body, content='{DOCUMENT_TABLE}', content_rowid='rowid', tokenize='porter unicode61'
+    )""",
+    f"""CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON {DOCUMENT_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, title, body) VALUES (new.rowid, new.title, new.body);
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON {DOCUMENT_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, body) VALUES ('delete', old.rowid, old.title, old.body);
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE ON {DOCUMENT_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, body) VALUES ('delete', old.rowid, old.title, old.body);
+        INSERT INTO {FTS_TABLE}(rowid, title, body) VALUES (new.rowid, new.title, new.body);
+    END""",
+]
+SQLITE_TEARDOWN = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+
+
+def _run(schema_editor, statements):
+    for sql in statements:
+        schema_editor.execute(sql)
+
+
+def install_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        _run(schema_editor, POSTGRES_SETUP)
+    elif vendor == 'sqlite':
+        _run(schema_editor, SQLITE_SETUP)
+
+
+def remove_search_index(apps, schema_editor):
+    vendor = schema_editor.connection.vendor
+    if vendor == 'postgresql':
+        _run(schema_editor, POSTGRES_TEARDOWN)
+    elif vendor == 'sqlite':
+        _run(schema_editor, SQLITE_TEARDOWN)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ticketing', '0005_ticket_inbox_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='TicketSearchDocument',
+            fields=[
+                ('ticket', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='search_document', serialize=False, to='ticketing.ticket')),
+                ('title', models.CharField(max_length=512)),
+                ('body', models.TextField(blank=True, default='')),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.RunPython(install_search_index, remove_search_index),
+    ]
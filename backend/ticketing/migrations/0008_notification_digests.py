@@ -0,0 +1,30 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:10
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ticketing', '0007_notification_outbox'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='NotificationPreference',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='ticket_notification_preference', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('delivery', models.CharField(choices=[('immediate', 'Immediate'), ('digest', 'Digest')], default='immediate', max_length=16)),
+                ('digest_interval_minutes', models.PositiveIntegerField(default=60)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='notificationoutbox',
+            name='digest',
+            field=models.BooleanField(default=False),
+        ),
+    ]
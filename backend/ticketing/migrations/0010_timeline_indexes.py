@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:13
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ticketing', '0009_attachment_uploads'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='ticketactivity',
+            index=models.Index(fields=['ticket', 'created_at'], name='activity_timeline_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticketassignment',
+            index=models.Index(fields=['ticket', 'created_at'], name='assignment_timeline_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='ticketcomment',
+            index=models.Index(fields=['ticket', 'created_at'], name='comment_timeline_idx'),
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:15
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ticketing', '0010_timeline_indexes'),
+        ('users', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AssigneeLoad',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='ticket_load', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('open_tickets', models.IntegerField(default=0)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['open_tickets', 'updated_at'], name='assignee_load_idx')],
+            },
+        ),
+    ]
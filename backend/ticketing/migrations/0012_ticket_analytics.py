@@ -0,0 +1,69 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:17
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ticketing', '0011_assignee_load'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalyticsCursor',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('last_created_at', models.DateTimeField(blank=True, null=True)),
+                ('last_id', models.UUIDField(blank=True, null=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='TicketMetrics',
+            fields=[
+                ('ticket', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='metrics', serialize=False, to='ticketing.ticket')),
+                ('created_at', models.DateTimeField()),
+                ('resolved_at', models.DateTimeField(blank=True, null=True)),
+                ('resolution_seconds', models.BigIntegerField(blank=True, null=True)),
+                ('sla_breached', models.BooleanField(default=False)),
+                ('category', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='ticketing.ticketcategory')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='DailyTicketAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField()),
+                ('created', models.IntegerField(default=0)),
+                ('resolved', models.IntegerField(default=0)),
+                ('resolution_seconds', models.BigIntegerField(default=0)),
+                ('sla_met', models.IntegerField(default=0)),
+                ('sla_breached', models.IntegerField(default=0)),
+                ('stage_exits', models.IntegerField(default=0)),
+                ('dwell_seconds', models.BigIntegerField(default=0)),
+                ('category', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='ticketing.ticketcategory')),
+                ('stage', models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='+', to='ticketing.workflowstage')),
+            ],
+            options={
+                'ordering': ['date'],
+                'unique_together': {('date', 'category', 'stage')},
+            },
+        ),
+        migrations.CreateModel(
+            name='StageDwell',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('entered_at', models.DateTimeField()),
+                ('exited_at', models.DateTimeField(blank=True, null=True)),
+                ('seconds', models.BigIntegerField(blank=True, null=True)),
+                ('category', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, related_name='+', to='ticketing.ticketcategory')),
+                ('stage', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='ticketing.workflowstage')),
+                ('ticket', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='stage_dwells', to='ticketing.ticket')),
+            ],
+            options={
+                'indexes': [models.Index(condition=models.Q(('exited_at__isnull', True)), fields=['ticket'], name='stage_dwell_open_idx')],
+            },
+        ),
+    ]
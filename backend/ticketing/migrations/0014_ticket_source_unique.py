@@ -0,0 +1,36 @@
+# Generated by Django 5.2.18 on 2026-10-19 19:30
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def clear_duplicate_sources(apps, schema_editor):
+    # retried integrations created duplicates before the constraint existed;
+    # the oldest ticket keeps the upstream key, later copies lose it
+    Ticket = apps.get_model('ticketing', 'Ticket')
+    dupes = (
+        Ticket.objects.filter(source_system__isnull=False, source_id__isnull=False)
+        .values('source_system', 'source_id').annotate(n=models.Count('id')).filter(n__gt=1)
+    )
+    for key in dupes.iterator():
+        ids = list(
+            Ticket.objects.filter(source_system=key['source_system'], source_id=key['source_id'])
+            .order_by('created_at', 'id').values_list('id', flat=True)
+        )
+        Ticket.objects.filter(id__in=ids[1:]).update(source_id=None)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ticketing', '0013_ticket_archive'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(clear_duplicate_sources, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='ticket',
+            constraint=models.UniqueConstraint(fields=('source_system', 'source_id'), name='ticket_source_uniq'),
+        ),
+    ]
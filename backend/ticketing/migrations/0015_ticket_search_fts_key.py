@@ -0,0 +1,78 @@
+from django.db import migrations
+
+DOCUMENT_TABLE = 'ticketing_ticketsearchdocument'
+FTS_TABLE = 'ticketing_ticket_fts'
+KEY_TABLE = 'ticketing_ticket_fts_key'
+SOURCE_VIEW = 'ticketing_ticket_fts_source'
+
+# The FTS5 index was keyed on the document table's implicit rowid. That table's
+# primary key is the ticket UUID, so VACUUM may renumber its rowids and desync
+# the index. Give each document an explicit INTEGER PRIMARY KEY in a key table
+# and index through a view over it instead.
+SQLITE_DROP_OLD = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+]
+SQLITE_SETUP = [
+    f"CREATE TABLE {KEY_TABLE} (id INTEGER PRIMARY KEY, ticket_id char(32) NOT NULL UNIQUE)",
+    f"""CREATE VIEW {SOURCE_VIEW} AS
+        SELECT k.id AS id, d.title AS title, d.body AS body
+        FROM {KEY_TABLE} k JOIN {DOCUMENT_TABLE} d ON d.ticket_id = k.ticket_id""",
+    f"""CREATE VIRTUAL TABLE {FTS_TABLE} USING fts5(
+        title, body, content='{SOURCE_VIEW}', content_rowid='id', tokenize='porter unicode61'
+    )""",
+    f"""CREATE TRIGGER {FTS_TABLE}_ai AFTER INSERT ON {DOCUMENT_TABLE} BEGIN
+        INSERT OR IGNORE INTO {KEY_TABLE}(ticket_id) VALUES (new.ticket_id);
+        INSERT INTO {FTS_TABLE}(rowid, title, body)
+        VALUES ((SELECT id FROM {KEY_TABLE} WHERE ticket_id = new.ticket_id), new.title, new.body);
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_ad AFTER DELETE ON {DOCUMENT_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, body)
+        VALUES ('delete', (SELECT id FROM {KEY_TABLE} WHERE ticket_id = old.ticket_id), old.title, old.body);
+        DELETE FROM {KEY_TABLE} WHERE ticket_id = old.ticket_id;
+    END""",
+    f"""CREATE TRIGGER {FTS_TABLE}_au AFTER UPDATE ON {DOCUMENT_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, title, body)
+        VALUES ('delete', (SELECT id FROM {KEY_TABLE} WHERE ticket_id = old.ticket_id), old.title, old.body);
+        INSERT INTO {FTS_TABLE}(rowid, title, body)
+        VALUES ((SELECT id FROM {KEY_TABLE} WHERE ticket_id = new.ticket_id), new.title, new.body);
+    END""",
+    f"INSERT INTO {KEY_TABLE}(ticket_id) SELECT ticket_id FROM {DOCUMENT_TABLE}",
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+]
+SQLITE_TEARDOWN = [
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_au",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ad",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_ai",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+    f"DROP VIEW IF EXISTS {SOURCE_VIEW}",
+    f"DROP TABLE IF EXISTS {KEY_TABLE}",
+]
+
+
+def rekey_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        for sql in SQLITE_DROP_OLD + SQLITE_SETUP:
+            schema_editor.execute(sql)
+
+
+def restore_rowid_index(apps, schema_editor):
+    if schema_editor.connection.vendor == 'sqlite':
+        from importlib import import_module
+        previous = import_module('ticketing.migrations.0006_ticket_search')
+        for sql in SQLITE_TEARDOWN + previous.SQLITE_SETUP:
+            schema_editor.execute(sql)
+        schema_editor.execute(f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ticketing', '0014_ticket_source_unique'),
+    ]
+
+    operations = [
+        migrations.RunPython(rekey_search_index, restore_rowid_index),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.18 on 2026-10-19 20:12
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('ticketing', '0015_ticket_search_fts_key'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='attachmentupload',
+            name='status',
+            field=models.CharField(choices=[('uploading', 'Uploading'), ('assembling', 'Assembling'), ('complete', 'Complete'), ('failed', 'Failed')], default='uploading', max_length=16),
+        ),
+    ]
@@ -23,6 +23,9 @@ STATUS_CHOICES = (
     ('closed', 'Closed'),
 )
 
+# statuses that stop the SLA clock
+CLOSED_STATUSES = ('closed', 'resolved')
+
 class TicketCategory(models.Model):
     id = models.UUIDField(primary_key=True, default=gen_uuid, editable=False)
     name = models.CharField(max_length=200)
@@ -30,6 +33,11 @@ class TicketCategory(models.Model):
     description = models.TextField(blank=True, null=True)
     is_active = models.BooleanField(default=True)
     default_assignee_role = models.CharField(max_length=100, blank=True, null=True)
+    default_sla_hours = models.IntegerField(null=True, blank=True)
+    # measure SLAs in SLACalendar working time instead of wall-clock hours (non-emergency categories)
+    sla_business_hours = models.BooleanField(default=False)
+    # bumped on every stage/transition edit; compiled workflow graphs are cached per version
+    workflow_version = models.PositiveIntegerField(default=0, editable=False)
     created_by = models.ForeignKey(User, null=True, blank=True, on_delete=models.SET_NULL, related_name='+')
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
@@ -37,6 +45,9 @@ class TicketCategory(models.Model):
     def __str__(self):
         return self.name
 
+    def bump_workflow_version(self):
+        TicketCategory.objects.filter(pk=self.pk).update(workflow_version=models.F('workflow_version') + 1)
+
 class WorkflowStage(models.Model):
     id = models.UUIDField(primary_key=True, default=gen_uuid, editable=False)
     category = models.ForeignKey(TicketCategory, related_name='stages', on_delete=models.CASCADE)
@@ -56,6 +67,15 @@ class WorkflowStage(models.Model):
     def __str__(self):
         return f"{self.category.key} - {self.name}"
 
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.category.bump_workflow_version()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        self.category.bump_workflow_version()
+        return result
+
 class Ticket(models.Model):
     id = models.UUIDField(primary_key=True, default=gen_uuid, editable=False)
     ticket_number = models.CharField(max_length=50, unique=True)  # generated human-friendly ID
@@ -69,6 +89,7 @@ class Ticket(models.Model):
     assigned_to = models.ForeignKey(User, related_name='assigned_tickets', on_delete=models.SET_NULL, null=True, blank=True)
     department = models.CharField(max_length=100, blank=True, null=True)
     due_date = models.DateTimeField(null=True, blank=True)
+    sla_started_at = models.DateTimeField(null=True, blank=True)
     sla_deadline = models.DateTimeField(null=True, blank=True)
     is_internal = models.BooleanField(default=False)
     source_system = models.CharField(max_length=100, null=True, blank=True)  # e.g., 'recruitment'
@@ -82,11 +103,82 @@ class Ticket(models.Model):
             models.Index(fields=['category']),
             models.Index(fields=['assigned_to']),
             models.Index(fields=['status']),
+            # inbox lookups: each visibility branch is a range scan in cursor order
+            models.Index(fields=['raised_by', '-created_at'], name='ticket_raised_by_created_idx'),
+            models.Index(fields=['assigned_to', '-created_at'], name='ticket_assignee_created_idx'),
+            models.Index(fields=['category', '-created_at'], name='ticket_category_created_idx'),
+            models.Index(
+                fields=['sla_deadline'], name='ticket_open_sla_deadline_idx',
+                condition=~models.Q(status__in=CLOSED_STATUSES),
+            ),
+        ]
+        constraints = [
+            # one ticket per upstream record; lets ingestion upsert (NULLs never collide)
+            models.UniqueConstraint(fields=['source_system', 'source_id'], name='ticket_source_uniq'),
         ]
 
     def __str__(self):
         return self.ticket_number
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        # None when .only()/.defer() left the SLA fields out: save() then reads them from the row
+        instance._sla_state = (
+            (instance.__dict__['sla_deadline'], instance.__dict__['status'])
+            if 'sla_deadline' in instance.__dict__ and 'status' in instance.__dict__ else None
+        )
+        instance._search_state = (instance.__dict__.get('title'), instance.__dict__.get('description'))
+        instance._load_state = instance.load_state()
+        return instance
+
+    def load_state(self):
+        # what this ticket contributes to AssigneeLoad: (assignee, counts as open)
+        status = self.__dict__.get('status')
+        return (self.__dict__.get('assigned_to_id'), status is not None and status not in CLOSED_STATUSES)
+
+    def save(self, *args, **kwargs):
+        if not self.ticket_number:
+            from .services import generate_ticket_number
+            self.ticket_number = generate_ticket_number()
+        previous = getattr(self, '_sla_state', (None, None))
+        if previous is None:
+            previous = Ticket.objects.filter(pk=self.pk).values_list('sla_deadline', 'status').first() or (None, None)
+        super().save(*args, **kwargs)
+
+        # arm, move or cancel the deadline timer when the SLA state changed
+        current = (self.sla_deadline, self.status)
+        if current != previous:
+            from .services import sync_sla_timer
+            sync_sla_timer(self, *previous)
+            self._sla_state = current
+            if previous[1] is not None and previous[1] != self.status:
+                # status moves feed the analytics pipeline (time to resolve)
+                TicketActivity.objects.create(ticket=self, action='status_changed',
+                                              meta={'from': previous[1], 'to': self.status})
+
+        # keep the assignees' open-ticket counters in step
+        load = self.load_state()
+        previous_load = getattr(self, '_load_state', (None, False))
+        if load != previous_load:
+            from .assignment import apply_load_delta
+            apply_load_delta(previous_load, load)
+            self._load_state = load
+
+        # refresh the search document only when the indexed text changed
+        searchable = (self.title, self.description)
+        if searchable != getattr(self, '_search_state', None):
+            from .search import schedule_index
+            schedule_index(self.pk)
+            self._search_state = searchable
+
+    def delete(self, *args, **kwargs):
+        previous_load = getattr(self, '_load_state', self.load_state())
+        result = super().delete(*args, **kwargs)
+        from .assignment import apply_load_delta
+        apply_load_delta(previous_load, (None, False))
+        return result
+
 class TicketComment(models.Model):
     id = models.UUIDField(primary_key=True, default=gen_uuid, editable=False)
     ticket = models.ForeignKey(Ticket, related_name='comments', on_delete=models.CASCADE)
@@ -96,6 +188,20 @@ class TicketComment(models.Model):
     created_at = models.DateTimeField(default=timezone.now)
     updated_at = models.DateTimeField(auto_now=True)
 
+    class Meta:
+        indexes = [models.Index(fields=['ticket', 'created_at'], name='comment_timeline_idx')]
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        from .search import schedule_index
+        schedule_index(self.ticket_id)
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        from .search import schedule_index
+        schedule_index(self.ticket_id)
+        return result
+
 class TicketActivity(models.Model):
     id = models.UUIDField(primary_key=True, default=gen_uuid, editable=False)
     ticket = models.ForeignKey(Ticket, related_name='activities', on_delete=models.CASCADE)
@@ -104,6 +210,9 @@ class TicketActivity(models.Model):
     meta = models.JSONField(null=True, blank=True)
     created_at = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        indexes = [models.Index(fields=['ticket', 'created_at'], name='activity_timeline_idx')]
+
 class TicketAttachment(models.Model):
     id = models.UUIDField(primary_key=True, default=gen_uuid, editable=False)
     ticket = models.ForeignKey(Ticket, related_name='attachments', on_delete=models.CASCADE)
@@ -114,6 +223,39 @@ class TicketAttachment(models.Model):
     size = models.BigIntegerField(null=True, blank=True)
     created_at = models.DateTimeField(default=timezone.now)
 
+UPLOAD_STATUS_CHOICES = (
+    ('uploading', 'Uploading'),
+    ('assembling', 'Assembling'),
+    ('complete', 'Complete'),
+    ('failed', 'Failed'),
+)
+
+class AttachmentUpload(models.Model):
+    """A resumable, chunked attachment upload in progress; see ticketing/uploads.py."""
+    id = models.UUIDField(primary_key=True, default=gen_uuid, editable=False)
+    ticket = models.ForeignKey(Ticket, related_name='uploads', on_delete=models.CASCADE)
+    uploaded_by = models.ForeignKey(User, null=True, related_name='+', on_delete=models.SET_NULL)
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100, blank=True, null=True)  # as declared by the client
+    size = models.BigIntegerField()
+    sha256 = models.CharField(max_length=64)
+    received = models.BigIntegerField(default=0)  # bytes stored so far: the offset to resume from
+    status = models.CharField(max_length=16, choices=UPLOAD_STATUS_CHOICES, default='uploading')
+    error = models.TextField(blank=True, default='')
+    attachment = models.OneToOneField(TicketAttachment, null=True, blank=True, related_name='upload', on_delete=models.SET_NULL)
+    created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+
+class AttachmentChunk(models.Model):
+    upload = models.ForeignKey(AttachmentUpload, related_name='chunks', on_delete=models.CASCADE)
+    offset = models.BigIntegerField()
+    size = models.BigIntegerField()
+    name = models.CharField(max_length=255)  # storage name of the chunk object
+
+    class Meta:
+        unique_together = ('upload', 'offset')
+        ordering = ['offset']
+
 class TicketAssignment(models.Model):
     id = models.UUIDField(primary_key=True, default=gen_uuid, editable=False)
     ticket = models.ForeignKey(Ticket, related_name='assignments', on_delete=models.CASCADE)
@@ -124,6 +266,9 @@ class TicketAssignment(models.Model):
     performed_by = models.ForeignKey(User, null=True, blank=True, related_name='+', on_delete=models.SET_NULL)
     created_at = models.DateTimeField(default=timezone.now)
 
+    class Meta:
+        indexes = [models.Index(fields=['ticket', 'created_at'], name='assignment_timeline_idx')]
+
 class WorkflowTransition(models.Model):
     id = models.UUIDField(primary_key=True, default=gen_uuid, editable=False)
     category = models.ForeignKey(TicketCategory, related_name='transitions', on_delete=models.CASCADE)
@@ -133,6 +278,23 @@ class WorkflowTransition(models.Model):
     auto_create_ticket = models.BooleanField(default=False)
     created_at = models.DateTimeField(default=timezone.now)
 
+    def clean(self):
+        from django.core.exceptions import ValidationError
+        from .workflow import compile_condition
+        try:
+            compile_condition(self.condition)
+        except ValueError as exc:
+            raise ValidationError({'condition': str(exc)})
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.category.bump_workflow_version()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        self.category.bump_workflow_version()
+        return result
+
 class SLARecord(models.Model):
     id = models.UUIDField(primary_key=True, default=gen_uuid, editable=False)
     ticket = models.ForeignKey(Ticket, related_name='sla_records', on_delete=models.CASCADE)
@@ -142,8 +304,267 @@ class SLARecord(models.Model):
     escalated_to = models.CharField(max_length=100, null=True, blank=True)
     created_at = models.DateTimeField(default=timezone.now)
 
+class TicketSearchDocument(models.Model):
+    """
+    A ticket's searchable text: title, description and non-internal comments.
+    The full-text index over it is maintained by the database itself (a
+    generated tsvector column on PostgreSQL, an FTS5 table kept in step by
+    triggers on SQLite); see ticketing/search.py.
+    """
+    ticket = models.OneToOneField(Ticket, primary_key=True, related_name='search_document', on_delete=models.CASCADE)
+    title = models.CharField(max_length=512)
+    body = models.TextField(blank=True, default='')
+    updated_at = models.DateTimeField(auto_now=True)
+
+OUTBOX_STATUS_CHOICES = (
+    ('pending', 'Pending'),
+    ('sent', 'Sent'),
+    ('failed', 'Failed'),
+)
+
+class NotificationOutbox(models.Model):
+    """
+    One email notification for one recipient, written in the same transaction
+    as the ticket change that caused it and delivered later by
+    tasks.dispatch_notifications.
+    """
+    id = models.UUIDField(primary_key=True, default=gen_uuid, editable=False)
+    event = models.CharField(max_length=50)
+    ticket = models.ForeignKey(Ticket, related_name='+', on_delete=models.CASCADE)
+    actor = models.ForeignKey(User, null=True, blank=True, related_name='+', on_delete=models.SET_NULL)
+    recipient = models.ForeignKey(User, related_name='ticket_notifications', on_delete=models.CASCADE)
+    payload = models.JSONField(default=dict, blank=True)  # values captured at enqueue time
+    digest = models.BooleanField(default=False)  # held until the recipient's next digest flush
+    status = models.CharField(max_length=16, choices=OUTBOX_STATUS_CHOICES, default='pending')
+    attempts = models.PositiveSmallIntegerField(default=0)
+    next_attempt_at = models.DateTimeField(default=timezone.now)
+    last_error = models.TextField(blank=True, default='')
+    created_at = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(
+                fields=['next_attempt_at'], name='outbox_pending_due_idx',
+                condition=models.Q(status='pending'),
+            ),
+        ]
+
+DELIVERY_CHOICES = (
+    ('immediate', 'Immediate'),
+    ('digest', 'Digest'),
+)
+
+class NotificationPreference(models.Model):
+    """How a user receives ticket notifications; users without a row get them immediately."""
+    user = models.OneToOneField(User, primary_key=True, related_name='ticket_notification_preference', on_delete=models.CASCADE)
+    delivery = models.CharField(max_length=16, choices=DELIVERY_CHOICES, default='immediate')
+    digest_interval_minutes = models.PositiveIntegerField(default=60)
+    updated_at = models.DateTimeField(auto_now=True)
+
+class AssigneeLoad(models.Model):
+    """
+    Cached count of open tickets assigned to a user, moved by Ticket.save on
+    assign/transition/close; auto-assignment reads this instead of counting.
+    """
+    user = models.OneToOneField(User, primary_key=True, related_name='ticket_load', on_delete=models.CASCADE)
+    open_tickets = models.IntegerField(default=0)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['open_tickets', 'updated_at'], name='assignee_load_idx')]
+
+class StageDwell(models.Model):
+    """One stay of a ticket in a workflow stage, derived from its activity log by ticketing/analytics.py."""
+    ticket = models.ForeignKey(Ticket, related_name='stage_dwells', on_delete=models.CASCADE)
+    stage = models.ForeignKey(WorkflowStage, related_name='+', on_delete=models.CASCADE)
+    category = models.ForeignKey(TicketCategory, null=True, related_name='+', on_delete=models.SET_NULL)
+    entered_at = models.DateTimeField()
+    exited_at = models.DateTimeField(null=True, blank=True)
+    seconds = models.BigIntegerField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            models.Index(fields=['ticket'], name='stage_dwell_open_idx', condition=models.Q(exited_at__isnull=True)),
+        ]
+
+class TicketMetrics(models.Model):
+    """Per-ticket resolution and SLA outcome, derived from its activity log."""
+    ticket = models.OneToOneField(Ticket, primary_key=True, related_name='metrics', on_delete=models.CASCADE)
+    category = models.ForeignKey(TicketCategory, null=True, related_name='+', on_delete=models.SET_NULL)
+    created_at = models.DateTimeField()
+    resolved_at = models.DateTimeField(null=True, blank=True)
+    resolution_seconds = models.BigIntegerField(null=True, blank=True)
+    sla_breached = models.BooleanField(default=False)
+
+class DailyTicketAggregate(models.Model):
+    """
+    Daily ticket figures. Rows with stage=None carry the category's volume,
+    resolution and SLA numbers; rows with a stage carry its dwell times.
+    Report endpoints read only this table.
+    """
+    date = models.DateField()
+    category = models.ForeignKey(TicketCategory, null=True, related_name='+', on_delete=models.CASCADE)
+    stage = models.ForeignKey(WorkflowStage, null=True, related_name='+', on_delete=models.CASCADE)
+    created = models.IntegerField(default=0)
+    resolved = models.IntegerField(default=0)
+    resolution_seconds = models.BigIntegerField(default=0)
+    sla_met = models.IntegerField(default=0)
+    sla_breached = models.IntegerField(default=0)
+    stage_exits = models.IntegerField(default=0)
+    dwell_seconds = models.BigIntegerField(default=0)
+
+    class Meta:
+        unique_together = ('date', 'category', 'stage')
+        ordering = ['date']
+
+class AnalyticsCursor(models.Model):
+    """Keyset position of the last TicketActivity folded into the analytics tables."""
+    name = models.CharField(max_length=50, primary_key=True)
+    last_created_at = models.DateTimeField(null=True, blank=True)
+    last_id = models.UUIDField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+# -----------------------------
+# Cold storage (ticketing/archive.py)
+# -----------------------------
+class ArchivedTicket(models.Model):
+    """
+    A closed ticket moved out of the hot tables. Same columns and ids as
+    Ticket (so CanViewTicket and visible_tickets_q apply unchanged), plus
+    the SLA outcome and the text the archive search scans.
+    """
+    id = models.UUIDField(primary_key=True, editable=False)
+    ticket_number = models.CharField(max_length=50, unique=True)
+    title = models.CharField(max_length=512)
+    description = models.TextField(blank=True, null=True)
+    priority = models.PositiveSmallIntegerField(choices=PRIORITY_CHOICES, default=2)
+    category = models.ForeignKey(TicketCategory, related_name='+', on_delete=models.SET_NULL, null=True)
+    current_stage = models.ForeignKey(WorkflowStage, related_name='+', on_delete=models.SET_NULL, null=True)
+    status = models.CharField(max_length=32, choices=STATUS_CHOICES)
+    raised_by = models.ForeignKey(User, related_name='+', on_delete=models.SET_NULL, null=True)
+    assigned_to = models.ForeignKey(User, related_name='+', on_delete=models.SET_NULL, null=True, blank=True)
+    department = models.CharField(max_length=100, blank=True, null=True)
+    due_date = models.DateTimeField(null=True, blank=True)
+    sla_started_at = models.DateTimeField(null=True, blank=True)
+    sla_deadline = models.DateTimeField(null=True, blank=True)
+    is_internal = models.BooleanField(default=False)
+    source_system = models.CharField(max_length=100, null=True, blank=True)
+    source_id = models.CharField(max_length=200, null=True, blank=True)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+    sla_breached = models.BooleanField(default=False)
+    search_text = models.TextField(blank=True, default='')
+    archived_at = models.DateTimeField(default=timezone.now)
+
+    def __str__(self):
+        return self.ticket_number
+
+class ArchivedTicketComment(models.Model):
+    id = models.UUIDField(primary_key=True, editable=False)
+    ticket = models.ForeignKey(ArchivedTicket, related_name='comments', on_delete=models.CASCADE)
+    author = models.ForeignKey(User, related_name='+', on_delete=models.SET_NULL, null=True)
+    content = models.TextField()
+    is_internal = models.BooleanField(default=False)
+    created_at = models.DateTimeField()
+    updated_at = models.DateTimeField()
+
+class ArchivedTicketActivity(models.Model):
+    id = models.UUIDField(primary_key=True, editable=False)
+    ticket = models.ForeignKey(ArchivedTicket, related_name='activities', on_delete=models.CASCADE)
+    actor = models.ForeignKey(User, related_name='+', null=True, on_delete=models.SET_NULL)
+    action = models.CharField(max_length=200)
+    meta = models.JSONField(null=True, blank=True)
+    created_at = models.DateTimeField()
+
+class ArchivedTicketAttachment(models.Model):
+    id = models.UUIDField(primary_key=True, editable=False)
+    ticket = models.ForeignKey(ArchivedTicket, related_name='attachments', on_delete=models.CASCADE)
+    uploaded_by = models.ForeignKey(User, related_name='+', null=True, on_delete=models.SET_NULL)
+    file = models.FileField(upload_to='ticket_attachments/')  # the stored file is not moved
+    filename = models.CharField(max_length=255)
+    content_type = models.CharField(max_length=100, blank=True, null=True)
+    size = models.BigIntegerField(null=True, blank=True)
+    created_at = models.DateTimeField()
+
+class ArchivedTicketAssignment(models.Model):
+    id = models.UUIDField(primary_key=True, editable=False)
+    ticket = models.ForeignKey(ArchivedTicket, related_name='assignments', on_delete=models.CASCADE)
+    from_user = models.ForeignKey(User, null=True, blank=True, related_name='+', on_delete=models.SET_NULL)
+    to_user = models.ForeignKey(User, null=True, blank=True, related_name='+', on_delete=models.SET_NULL)
+    to_role = models.CharField(max_length=100, blank=True, null=True)
+    reason = models.TextField(blank=True, null=True)
+    performed_by = models.ForeignKey(User, null=True, blank=True, related_name='+', on_delete=models.SET_NULL)
+    created_at = models.DateTimeField()
+
 class TicketSequence(models.Model):
     id = models.CharField(max_length=20, primary_key=True)  # e.g., 'TCK-202511'
     seq = models.BigIntegerField(default=0)
     updated_at = models.DateTimeField(auto_now=True)
 
+
+WEEKDAY_CHOICES = (
+    (0, 'Monday'),
+    (1, 'Tuesday'),
+    (2, 'Wednesday'),
+    (3, 'Thursday'),
+    (4, 'Friday'),
+    (5, 'Saturday'),
+    (6, 'Sunday'),
+)
+
+class SLACalendar(models.Model):
+    """Working time for business-hours SLAs; department=None is the hospital-wide default."""
+    id = models.UUIDField(primary_key=True, default=gen_uuid, editable=False)
+    name = models.CharField(max_length=200)
+    department = models.CharField(max_length=100, blank=True, null=True, unique=True)
+    time_zone = models.CharField(max_length=64, default='Asia/Kolkata')
+    is_active = models.BooleanField(default=True)
+    created_at = models.DateTimeField(default=timezone.now)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return self.name
+
+    def touch(self):
+        # bumps the version the cached working-time index is keyed on
+        SLACalendar.objects.filter(pk=self.pk).update(updated_at=timezone.now())
+
+class SLAWorkingHours(models.Model):
+    """A working window on a weekday; end_time <= start_time means it runs past midnight."""
+    id = models.UUIDField(primary_key=True, default=gen_uuid, editable=False)
+    calendar = models.ForeignKey(SLACalendar, related_name='working_hours', on_delete=models.CASCADE)
+    weekday = models.PositiveSmallIntegerField(choices=WEEKDAY_CHOICES)
+    start_time = models.TimeField()
+    end_time = models.TimeField()
+
+    class Meta:
+        ordering = ['weekday', 'start_time']
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.calendar.touch()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        self.calendar.touch()
+        return result
+
+class SLAHoliday(models.Model):
+    id = models.UUIDField(primary_key=True, default=gen_uuid, editable=False)
+    calendar = models.ForeignKey(SLACalendar, related_name='holidays', on_delete=models.CASCADE)
+    date = models.DateField()
+    name = models.CharField(max_length=200, blank=True)
+
+    class Meta:
+        unique_together = ('calendar', 'date')
+        ordering = ['date']
+
+    def save(self, *args, **kwargs):
+        super().save(*args, **kwargs)
+        self.calendar.touch()
+
+    def delete(self, *args, **kwargs):
+        result = super().delete(*args, **kwargs)
+        self.calendar.touch()
+        return result
@@ -0,0 +1,321 @@
+"""
+Ticket email notifications, delivered through a transactional outbox.
+
+notify_* functions only write NotificationOutbox rows, one per recipient,
+inside the caller's transaction, so a ticket change and its notifications
+commit or roll back together and no request waits on SMTP. After commit
+the dispatcher (tasks.dispatch_notifications) is kicked; it claims due
+rows in batches, coalesces each recipient's rows into a single email,
+sends the batch over one connection and retries failures with
+exponential backoff.
+
+Recipients whose NotificationPreference asks for a digest have their rows
+held until the end of their current digest window (windows are aligned,
+so everything in one window flushes as one email), or until
+NOTIFICATION_DIGEST_MAX_EVENTS are waiting. The first row held for a
+window queues the dispatcher with that window's end as its ETA; a
+periodic dispatch from celery beat picks up anything whose kick was lost,
+and rows waiting to be retried.
+"""
+import logging
+import re
+from datetime import datetime, timedelta, timezone as dt_timezone
+from functools import lru_cache
+from pathlib import Path
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.mail import EmailMessage, get_connection
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import NotificationOutbox, NotificationPreference
+
+logger = logging.getLogger(__name__)
+
+TEMPLATE_PATH = Path(__file__).with_name('emailTemplate.py')
+
+
+def display_name(user):
+    if user is None:
+        return 'System'
+    return user.get_full_name() or user.username
+
+
+def ticket_url(ticket):
+    return f"{settings.FRONTEND_URL}/tickets/{ticket.id}"
+
+
+# -----------------------------
+# Templates
+# -----------------------------
+class EmailTemplate:
+    """
+    Compiles a `{{ expression }}` template once. Expressions are Python,
+    evaluated against the render context; callables are called (so
+    `ticket.get_priority_display` works without parentheses) and failing
+    lookups such as a missing category render as ''.
+    """
+    PLACEHOLDER = re.compile(r'{{\s*(.+?)\s*}}')
+
+    def __init__(self, source, name='<template>'):
+        self.parts = []
+        pos = 0
+        for match in self.PLACEHOLDER.finditer(source):
+            self.parts.append(source[pos:match.start()])
+            self.parts.append(compile(match.group(1), name, 'eval'))
+            pos = match.end()
+        self.parts.append(source[pos:])
+
+    def render(self, context):
+        out = []
+        for part in self.parts:
+            if isinstance(part, str):
+                out.append(part)
+                continue
+            try:
+                value = eval(part, {'__builtins__': {}}, context)
+                if callable(value):
+                    value = value()
+            except Exception:
+                value = ''
+            out.append('' if value is None else str(value))
+        return ''.join(out)
+
+
+@lru_cache(maxsize=None)
+def ticket_created_template():
+    return EmailTemplate(TEMPLATE_PATH.read_text(), name=str(TEMPLATE_PATH))
+
+
+# -----------------------------
+# Enqueueing
+# -----------------------------
+def outbox_rows(event, ticket, recipients, actor=None, **payload):
+    """Unsaved outbox rows, one per distinct recipient with an email (never the actor)."""
+    seen = set()
+    rows = []
+    for user in recipients:
+        if not user or not user.email or user.pk in seen or (actor is not None and user.pk == actor.pk):
+            continue
+        seen.add(user.pk)
+        rows.append(NotificationOutbox(event=event, ticket=ticket, actor=actor, recipient=user, payload=payload))
+    return rows
+
+
+def digest_due(now, minutes):
+    """End of the digest window containing `now`."""
+    interval = max(minutes, 1) * 60
+    return datetime.fromtimestamp((int(now.timestamp()) // interval + 1) * interval, tz=dt_timezone.utc)
+
+
+def save_outbox_rows(rows):
+    if not rows:
+        return 0
+    now = timezone.now()
+    digests = dict(
+        NotificationPreference.objects.filter(user_id__in={row.recipient_id for row in rows}, delivery='digest')
+        .values_list('user_id', 'digest_interval_minutes')
+    )
+    for row in rows:
+        if row.recipient_id in digests:
+            row.digest = True
+            row.next_attempt_at = digest_due(now, digests[row.recipient_id])
+    windows = {row.next_attempt_at for row in rows if row.digest}
+    if windows:
+        # the first row held for a window schedules its flush; later ones ride along
+        windows -= set(
+            NotificationOutbox.objects.filter(status='pending', digest=True, next_attempt_at__in=windows)
+            .values_list('next_attempt_at', flat=True).distinct()
+        )
+    NotificationOutbox.objects.bulk_create(rows)
+
+    flushed = flush_full_digests(digests, now) if digests else 0
+    if flushed or not all(row.digest for row in rows):
+        transaction.on_commit(kick_dispatcher)
+    for due in windows:
+        transaction.on_commit(lambda due=due: kick_dispatcher(eta=due))
+    return len(rows)
+
+
+def flush_full_digests(recipient_ids, now):
+    """Make digests holding NOTIFICATION_DIGEST_MAX_EVENTS or more due immediately."""
+    held = NotificationOutbox.objects.filter(
+        status='pending', digest=True, recipient_id__in=recipient_ids, next_attempt_at__gt=now,
+    )
+    full = list(
+        held.values('recipient_id').annotate(waiting=Count('id'))
+        .filter(waiting__gte=settings.NOTIFICATION_DIGEST_MAX_EVENTS)
+        .values_list('recipient_id', flat=True)
+    )
+    if full:
+        held.filter(recipient_id__in=full).update(next_attempt_at=now)
+    return len(full)
+
+
+def enqueue(event, ticket, recipients, actor=None, **payload):
+    return save_outbox_rows(outbox_rows(event, ticket, recipients, actor, **payload))
+
+
+def kick_dispatcher(eta=None):
+    """Queue the dispatcher now, or at `eta` (the end of a digest window)."""
+    from .tasks import dispatch_notifications
+    try:
+        dispatch_notifications.apply_async(eta=eta, retry=False)
+    except Exception:
+        logger.warning('Could not queue the notification dispatcher; pending rows wait for the next run')
+
+
+def notify_ticket_created(ticket, actor):
+    return enqueue('ticket_created', ticket, [ticket.assigned_to], actor)
+
+
+def notify_stage_change(ticket, actor, comment=None):
+    stage = ticket.current_stage.name if ticket.current_stage else 'N/A'
+    return enqueue('stage_changed', ticket, [ticket.raised_by, ticket.assigned_to], actor,
+                   stage=stage, comment=comment)
+
+
+def notify_assignment(ticket, actor, to_user):
+    return enqueue('assigned', ticket, [to_user], actor)
+
+
+def notify_sla_breaches(tickets):
+    """Escalate a batch of breached tickets to their assignees and HR."""
+    hr = list(get_user_model().objects.filter(groups__name='HR', is_active=True).exclude(email='').distinct())
+    return save_outbox_rows([
+        row
+        for ticket in tickets
+        for row in outbox_rows('sla_breached', ticket, [ticket.assigned_to, *hr],
+                               deadline=f"{ticket.sla_deadline:%Y-%m-%d %H:%M}")
+    ])
+
+
+def notify_sla_breach(ticket):
+    return notify_sla_breaches([ticket])
+
+
+# -----------------------------
+# Rendering
+# -----------------------------
+def _render_ticket_created(row):
+    ticket = row.ticket
+    body = ticket_created_template().render({
+        'ticket': ticket, 'recipient': row.recipient, 'actor': row.actor, 'base_url': settings.FRONTEND_URL,
+    })
+    return f"[{ticket.ticket_number}] New ticket: {ticket.title}", body
+
+
+def _render_stage_changed(row):
+    ticket, stage = row.ticket, row.payload.get('stage', 'N/A')
+    body = (
+        f"Ticket {ticket.ticket_number} ({ticket.title}) moved to stage '{stage}' "
+        f"by {display_name(row.actor)}.\n"
+    )
+    if row.payload.get('comment'):
+        body += f"\nComment: {row.payload['comment']}\n"
+    body += f"\nView: {ticket_url(ticket)}"
+    return f"[{ticket.ticket_number}] Stage changed to {stage}", body
+
+
+def _render_assigned(row):
+    ticket = row.ticket
+    return (
+        f"[{ticket.ticket_number}] Assigned to you",
+        f"{display_name(row.actor)} assigned ticket {ticket.ticket_number} ({ticket.title}) to you.\n"
+        f"\nView: {ticket_url(ticket)}",
+    )
+
+
+def _render_mentioned(row):
+    ticket = row.ticket
+    return (
+        f"[{ticket.ticket_number}] {display_name(row.actor)} mentioned you",
+        f"{display_name(row.actor)} mentioned you on ticket {ticket.ticket_number} ({ticket.title}):\n"
+        f"\n{row.payload.get('comment', '')}\n\nView: {ticket_url(ticket)}",
+    )
+
+
+def _render_sla_breached(row):
+    ticket = row.ticket
+    return (
+        f"[{ticket.ticket_number}] SLA breached",
+        f"Ticket {ticket.ticket_number} ({ticket.title}) passed its SLA deadline "
+        f"{row.payload.get('deadline')} UTC.\n\nView: {ticket_url(ticket)}",
+    )
+
+
+RENDERERS = {
+    'ticket_created': _render_ticket_created,
+    'stage_changed': _render_stage_changed,
+    'assigned': _render_assigned,
+    'mentioned': _render_mentioned,
+    'sla_breached': _render_sla_breached,
+}
+
+
+def render_message(recipient, rows):
+    """One email for all of a recipient's pending rows."""
+    rendered = [RENDERERS[row.event](row) for row in rows]
+    sections = "\n\n----------\n\n".join(f"{s}\n\n{b}" for s, b in rendered)
+    if any(row.digest for row in rows):
+        subject = f"Ticket digest: {len(rendered)} update{'s' if len(rendered) != 1 else ''}"
+        body = f"Hello {display_name(recipient)},\n\nHere is what happened on your tickets:\n\n{sections}"
+    elif len(rendered) == 1:
+        subject, body = rendered[0]
+    else:
+        subject, body = f"{len(rendered)} ticket updates", sections
+    return EmailMessage(subject, body, settings.DEFAULT_FROM_EMAIL, [recipient.email])
+
+
+# -----------------------------
+# Delivery
+# -----------------------------
+def retry_delay(attempts):
+    return timedelta(seconds=settings.NOTIFICATION_RETRY_SECONDS * 2 ** max(attempts - 1, 0))
+
+
+def deliver(rows):
+    """
+    Send claimed rows, one coalesced email per recipient over a single
+    connection, and record the outcome. Returns the number of emails sent.
+    """
+    by_recipient = {}
+    for row in rows:
+        by_recipient.setdefault(row.recipient_id, []).append(row)
+
+    sent, failed = [], []
+    connection = get_connection()
+    try:
+        connection.open()
+        for group in by_recipient.values():
+            try:
+                connection.send_messages([render_message(group[0].recipient, group)])
+                sent.extend(group)
+            except Exception as exc:
+                logger.warning('Notification to %s failed: %s', group[0].recipient.email, exc)
+                failed.extend((row, str(exc)) for row in group)
+    except Exception as exc:
+        logger.exception('Could not open a mail connection for %d notification(s)', len(rows))
+        failed = [(row, str(exc)) for row in rows if row not in sent]
+    finally:
+        try:
+            connection.close()
+        except Exception:
+            pass
+
+    now = timezone.now()
+    for row in sent:
+        row.status, row.sent_at, row.last_error = 'sent', now, ''
+    for row, error in failed:
+        row.last_error = error[:2000]
+        if row.attempts >= settings.NOTIFICATION_MAX_ATTEMPTS:
+            row.status = 'failed'
+        else:
+            row.next_attempt_at = now + retry_delay(row.attempts)
+    NotificationOutbox.objects.bulk_update(
+        [row for row in sent] + [row for row, _ in failed],
+        ['status', 'sent_at', 'last_error', 'next_attempt_at'],
+    )
+    return len({row.recipient_id for row in sent})
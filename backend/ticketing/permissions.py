@@ -1,5 +1,86 @@
+from django.contrib.auth.models import Group
+from django.db.models import Exists, Q
 from rest_framework.permissions import BasePermission
 
+
+def group_names(user):
+    """
+    The user's group names, loaded with one query and memoised on the user
+    object. request.user lives for a single request, so every permission
+    check after the first runs in memory.
+    """
+    if not user or not user.is_authenticated:
+        return frozenset()
+    names = getattr(user, '_group_names', None)
+    if names is None:
+        names = frozenset(user.groups.values_list('name', flat=True))
+        user._group_names = names
+    return names
+
+
+def is_hr(user):
+    return 'HR' in group_names(user)
+
+
+def visible_tickets_q(user):
+    """
+    CanViewTicket's rules as a single queryset filter. The HR check is an
+    uncorrelated EXISTS so the inbox stays one query even before the user's
+    groups are loaded.
+    """
+    if not user or not user.is_authenticated:
+        return Q(pk__in=[])
+    if user.is_superuser:
+        return Q()
+    visible = Q(raised_by=user) | Q(assigned_to=user)
+    names = getattr(user, '_group_names', None)
+    if names is None:
+        visible |= Q(Exists(Group.objects.filter(user=user, name='HR')), category__key='RECRUIT')
+    elif 'HR' in names:
+        visible |= Q(category__key='RECRUIT')
+    return visible
+
+
+def can_view_ticket(user, raised_by_id, assigned_to_id, category_key):
+    """
+    CanViewTicket's rule on plain values, so callers holding only a
+    snapshot of a ticket (e.g. a real-time event) apply the same check.
+    """
+    if not user or not user.is_authenticated:
+        return False
+    if user.is_superuser:
+        return True
+    # compare ids so the related users are never fetched
+    if user.pk in (raised_by_id, assigned_to_id):
+        return True
+    # HR can see the Recruitment category
+    return category_key == 'RECRUIT' and is_hr(user)
+
+
+def can_see_internal(user, assigned_to_id):
+    """Internal comments are for staff and the ticket's assignee, not the requester."""
+    return user.is_superuser or user.pk == assigned_to_id or is_hr(user)
+
+
+def visible_comments_q(user):
+    """Comments on tickets the user may see, without the internal ones they may not."""
+    from .models import Ticket
+    visible = Q(ticket__in=Ticket.objects.filter(visible_tickets_q(user)).values('pk'))
+    if user and user.is_authenticated and not (user.is_superuser or is_hr(user)):
+        visible &= Q(is_internal=False) | Q(ticket__assigned_to=user)
+    return visible
+
+
+def can_transition(user, ticket):
+    if not user or not user.is_authenticated:
+        return False
+    if user.is_superuser:
+        return True
+    if ticket.assigned_to_id == user.pk:
+        return True
+    return is_hr(user)
+
+
 class IsAdmin(BasePermission):
     def has_permission(self, request, view):
         return request.user and request.user.is_superuser
@@ -7,25 +88,14 @@ class IsAdmin(BasePermission):
 
 class IsHR(BasePermission):
     def has_permission(self, request, view):
-        return request.user.groups.filter(name='HR').exists()
+        return is_hr(request.user)
 
 
 class CanViewTicket(BasePermission):
     def has_object_permission(self, request, view, obj):
-        if request.user.is_superuser:
-            return True
-
-        if obj.raised_by == request.user:
-            return True
-        
-        if obj.assigned_to == request.user:
-            return True
-
-        # HR can see Recruitment category
-        if request.user.groups.filter(name='HR').exists() and obj.category.key == 'RECRUIT':
-            return True
-        
-        return False
+        # category is select_related by the ticket views
+        return can_view_ticket(request.user, obj.raised_by_id, obj.assigned_to_id,
+                               obj.category.key if obj.category_id else None)
 
 
 class CanTransitionTicket(BasePermission):
@@ -34,13 +104,4 @@ class CanTransitionTicket(BasePermission):
     or the user assigned to the ticket can move it forward.
     """
     def has_object_permission(self, request, view, obj):
-        if request.user.is_superuser:
-            return True
-
-        if obj.assigned_to == request.user:
-            return True
-        
-        if request.user.groups.filter(name='HR').exists():
-            return True
-
-        return False
+        return can_transition(request.user, obj)
@@ -0,0 +1,98 @@
+"""
+Real-time ticket events over WebSockets (Django Channels).
+
+Ticket changes publish a small event after their transaction commits. It
+goes to the channel-layer groups of everyone who may see the ticket:
+
+* tickets.user.<id>  - the requester and the assignee
+* tickets.recruit    - HR, for Recruitment tickets
+* tickets.all        - superusers
+
+which mirrors CanViewTicket. Each socket (consumers.TicketEventsConsumer)
+joins the groups for its user and re-checks every event with
+can_receive() before sending it. Group membership only routes events; that
+check is what decides. So an assignee who has just been replaced, or a
+requester receiving an internal comment, is filtered out.
+"""
+import logging
+import uuid
+
+from asgiref.sync import async_to_sync
+from channels.layers import get_channel_layer
+from django.db import transaction
+from django.utils import timezone
+
+from .permissions import can_see_internal, can_view_ticket, group_names
+
+logger = logging.getLogger(__name__)
+
+ALL_TICKETS_GROUP = 'tickets.all'
+RECRUIT_GROUP = 'tickets.recruit'
+# what a client sees of an event; routing fields stay server-side
+PUBLIC_FIELDS = ('id', 'event', 'ticket', 'ticket_number', 'actor', 'at', 'data')
+
+
+def user_group(user_id):
+    return f'tickets.user.{user_id}'
+
+
+def ticket_event(ticket, event, actor=None, internal=False, **data):
+    return {
+        'type': 'ticket.event',  # dispatched to TicketEventsConsumer.ticket_event
+        'id': uuid.uuid4().hex,
+        'event': event,
+        'ticket': str(ticket.pk),
+        'ticket_number': ticket.ticket_number,
+        'raised_by': ticket.raised_by_id,
+        'assigned_to': ticket.assigned_to_id,
+        'category': ticket.category.key if ticket.category_id else None,
+        'internal': internal,
+        'actor': actor.pk if actor is not None else None,
+        'at': timezone.now().isoformat(),
+        'data': data,
+    }
+
+
+def audience_groups(event):
+    groups = {ALL_TICKETS_GROUP}
+    groups.update(user_group(uid) for uid in (event['raised_by'], event['assigned_to']) if uid)
+    if event['category'] == 'RECRUIT':
+        groups.add(RECRUIT_GROUP)
+    return groups
+
+
+def subscriber_groups(user):
+    """Groups a user's socket joins; loads (and memoises) their group names."""
+    if user.is_superuser:
+        return [ALL_TICKETS_GROUP]
+    groups = [user_group(user.pk)]
+    if 'HR' in group_names(user):
+        groups.append(RECRUIT_GROUP)
+    return groups
+
+
+def can_receive(user, event):
+    if not can_view_ticket(user, event['raised_by'], event['assigned_to'], event['category']):
+        return False
+    # internal comments are for staff and the assignee, as on the timeline
+    return not event['internal'] or can_see_internal(user, event['assigned_to'])
+
+
+def publish(events):
+    """Send `events` to their audiences once the current transaction commits."""
+    events = list(events)
+    if events:
+        transaction.on_commit(lambda: send(events))
+
+
+def send(events):
+    layer = get_channel_layer()
+    if layer is None:  # CHANNEL_LAYERS not configured
+        return
+    try:
+        for event in events:
+            for group in audience_groups(event):
+                async_to_sync(layer.group_send)(group, event)
+    except Exception:
+        # clients resync over the REST API on reconnect; never fail the request
+        logger.warning('Could not publish %d ticket event(s)', len(events), exc_info=True)
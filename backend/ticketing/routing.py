@@ -0,0 +1,9 @@
+# backend/ticketing/routing.py
+
+from django.urls import path
+
+from .consumers import TicketEventsConsumer
+
+websocket_urlpatterns = [
+    path('ws/tickets/', TicketEventsConsumer.as_asgi()),
+]
@@ -0,0 +1,166 @@
+"""
+Full-text ticket search.
+
+Every ticket has a TicketSearchDocument holding its title and, as body, the
+description plus all non-internal comments. Saving a ticket's text or any
+comment rewrites that one document after commit. The database indexes the
+document table itself:
+
+* PostgreSQL: a stored generated tsvector column (title weighted A, body B)
+  with a GIN index, queried with websearch_to_tsquery, ts_rank_cd and
+  ts_headline.
+* SQLite: an external-content FTS5 table kept in step by triggers, queried
+  with MATCH, bm25() and snippet(). Its rowids come from an INTEGER
+  PRIMARY KEY per document in KEY_TABLE, which VACUUM never renumbers.
+
+Other backends fall back to icontains over the document table. The
+index DDL lives in migrations 0006_ticket_search and 0015_ticket_search_fts_key.
+"""
+import re
+
+from django.db import connection, transaction
+from django.db.models import Q
+from django.utils.html import escape
+
+from .models import Ticket, TicketComment, TicketSearchDocument
+
+DOCUMENT_TABLE = 'ticketing_ticketsearchdocument'
+FTS_TABLE = 'ticketing_ticket_fts'
+KEY_TABLE = 'ticketing_ticket_fts_key'
+
+
+# -----------------------------
+# Indexing
+# -----------------------------
+def build_documents(ticket_ids):
+    tickets = Ticket.objects.filter(id__in=ticket_ids).values_list('id', 'title', 'description')
+    bodies = {tid: [description or ''] for tid, _, description in tickets}
+    comments = (
+        TicketComment.objects.filter(ticket_id__in=bodies, is_internal=False)
+        .order_by('created_at').values_list('ticket_id', 'content')
+    )
+    for tid, content in comments:
+        bodies[tid].append(content)
+    return [
+        TicketSearchDocument(ticket_id=tid, title=title, body='\n'.join(bodies[tid]))
+        for tid, title, _ in tickets
+    ]
+
+
+def index_tickets(ticket_ids):
+    """Rewrite the search documents of `ticket_ids` (three queries per call, any batch size)."""
+    documents = build_documents(ticket_ids)
+    if documents:
+        TicketSearchDocument.objects.bulk_create(
+            documents, update_conflicts=True,
+            unique_fields=['ticket'], update_fields=['title', 'body', 'updated_at'],
+        )
+    return len(documents)
+
+
+def schedule_index(ticket_id):
+    transaction.on_commit(lambda: index_tickets([ticket_id]))
+
+
+# -----------------------------
+# Querying
+# -----------------------------
+def _fts5_query(text):
+    # quote every term so user input can never be read as FTS5 syntax; the last term is a prefix
+    terms = re.findall(r'\w+', text)
+    if not terms:
+        return None
+    quoted = [f'"{t}"' for t in terms]
+    quoted[-1] += '*'
+    return ' '.join(quoted)
+
+
+def _match(text, tickets):
+    """
+    The `FROM ... WHERE` clause (sql, params) selecting the documents `d`
+    of `tickets` that match `text`, or None when `text` cannot match
+    anything. Vendors without a full-text index get an icontains queryset.
+    """
+    scope_sql, scope_params = tickets.values('id').query.sql_with_params()
+    if connection.vendor == 'postgresql':
+        return (
+            f"FROM {DOCUMENT_TABLE} d, websearch_to_tsquery('english', %s) q "
+            f"WHERE d.search_vector @@ q AND d.ticket_id IN ({scope_sql})",
+            [text, *scope_params],
+        )
+    if connection.vendor == 'sqlite':
+        match = _fts5_query(text)
+        if match is None:
+            return None
+        return (
+            f"FROM {FTS_TABLE} JOIN {KEY_TABLE} d ON d.id = {FTS_TABLE}.rowid "
+            f"WHERE {FTS_TABLE} MATCH %s AND d.ticket_id IN ({scope_sql})",
+            [match, *scope_params],
+        )
+    return TicketSearchDocument.objects.filter(
+        Q(title__icontains=text) | Q(body__icontains=text), ticket__in=tickets.values('id'),
+    ).order_by('ticket_id')
+
+
+def search_tickets(text, tickets, limit=20, offset=0):
+    """
+    Rank the tickets in `tickets` (a queryset, so visibility and filters
+    apply inside the same SQL) against `text`. Returns a list of
+    (ticket_id, rank, snippet) for one page, best match first; snippets
+    are HTML with matches wrapped in <mark>.
+    """
+    text = (text or '').strip()
+    match = _match(text, tickets) if text else None
+    if match is None:
+        return []
+    if not isinstance(match, tuple):
+        return [(d.ticket_id, 1.0, escape(d.title)) for d in match[offset:offset + limit]]
+    where, params = match
+
+    if connection.vendor == 'postgresql':
+        sql = f"""
+            SELECT page.ticket_id, page.score,
+                   ts_headline('english', d.title || ' ' || d.body, page.query,
+                               'StartSel="\x02", StopSel="\x03", MaxFragments=2, MaxWords=20')
+            FROM (
+                SELECT d.ticket_id, ts_rank_cd(d.search_vector, q) AS score, q AS query
+                {where}
+                ORDER BY score DESC, d.ticket_id
+                LIMIT %s OFFSET %s
+            ) page
+            JOIN {DOCUMENT_TABLE} d ON d.ticket_id = page.ticket_id
+            ORDER BY page.score DESC, page.ticket_id
+        """
+    else:
+        sql = f"""
+            SELECT d.ticket_id, -bm25({FTS_TABLE}, 5.0, 1.0) AS score,
+                   snippet({FTS_TABLE}, -1, char(2), char(3), '…', 16)
+            {where}
+            ORDER BY score DESC, d.ticket_id
+            LIMIT %s OFFSET %s
+        """
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [*params, limit, offset])
+        rows = cursor.fetchall()
+    field = TicketSearchDocument._meta.pk
+    return [(field.to_python(tid), float(score), _highlight(snippet)) for tid, score, snippet in rows]
+
+
+def count_matches(text, tickets):
+    """How many of `tickets` match `text` (sizes the hot result set when paging on into the archive)."""
+    text = (text or '').strip()
+    match = _match(text, tickets) if text else None
+    if match is None:
+        return 0
+    if not isinstance(match, tuple):
+        return match.count()
+    where, params = match
+    with connection.cursor() as cursor:
+        cursor.execute(f"SELECT COUNT(*) {where}", params)
+        return cursor.fetchone()[0]
+
+
+def _highlight(snippet):
+    # matches come back between \x02/\x03 so the ticket text can be escaped before marking up
+    return escape(snippet or '').replace('\x02', '<mark>').replace('\x03', '</mark>')
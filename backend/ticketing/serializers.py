@@ -1,5 +1,11 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import transaction
 from rest_framework import serializers
-from .models import Ticket, TicketComment, TicketAttachment, TicketCategory, WorkflowStage
+from .models import (
+    Ticket, TicketComment, TicketAttachment, TicketCategory, WorkflowStage, NotificationPreference, AttachmentUpload,
+    ArchivedTicket, CLOSED_STATUSES, PRIORITY_CHOICES,
+)
 
 class TicketCategorySerializer(serializers.ModelSerializer):
     class Meta:
@@ -22,22 +28,42 @@ class TicketCreateSerializer(serializers.ModelSerializer):
         from .services import generate_ticket_number, compute_sla_deadline
         user = self.context['request'].user
         validated_data.setdefault('raised_by', user)
-        validated_data['ticket_number'] = generate_ticket_number()
-        ticket = super().create(validated_data)
-        # compute SLA deadline
-        compute_sla_deadline(ticket)
-        # create initial activity
-        from .models import TicketActivity
-        TicketActivity.objects.create(ticket=ticket, actor=user, action='ticket_created', meta={})
+        # the ticket, its assignment, activity and outbox rows commit together or not at all
+        with transaction.atomic():
+            validated_data['ticket_number'] = generate_ticket_number()
+            ticket = super().create(validated_data)
+            # compute SLA deadline
+            compute_sla_deadline(ticket)
+            # route unassigned tickets to the least-loaded holder of the default role
+            if not ticket.assigned_to_id:
+                from .assignment import auto_assign
+                auto_assign(ticket, actor=user)
+            # create initial activity
+            from .models import TicketActivity
+            TicketActivity.objects.create(ticket=ticket, actor=user, action='ticket_created', meta={})
+            from .notifications import notify_ticket_created
+            notify_ticket_created(ticket, user)
         return ticket
 
 class TicketSerializer(serializers.ModelSerializer):
     category = TicketCategorySerializer(read_only=True)
     current_stage = WorkflowStageSerializer(read_only=True)
+    # annotated by the ticket list/retrieve queryset; omitted elsewhere
+    comment_count = serializers.IntegerField(read_only=True)
+    attachment_count = serializers.IntegerField(read_only=True)
     class Meta:
         model = Ticket
         fields = '__all__'
 
+class ArchivedTicketSerializer(serializers.ModelSerializer):
+    category = TicketCategorySerializer(read_only=True)
+    current_stage = WorkflowStageSerializer(read_only=True)
+    comment_count = serializers.IntegerField(read_only=True)
+    attachment_count = serializers.IntegerField(read_only=True)
+    class Meta:
+        model = ArchivedTicket
+        exclude = ('search_text',)
+
 class CommentSerializer(serializers.ModelSerializer):
     author = serializers.StringRelatedField(read_only=True)
     class Meta:
@@ -52,4 +78,62 @@ class CommentSerializer(serializers.ModelSerializer):
         # parse mentions and create TicketActivity + mention records and send notifications
         from .services import handle_comment_mentions
         handle_comment_mentions(comment)
+        from .realtime import publish, ticket_event
+        publish([ticket_event(comment.ticket, 'comment_added', user, internal=comment.is_internal, comment={
+            'id': str(comment.id), 'author': user.pk, 'content': comment.content,
+            'is_internal': comment.is_internal, 'created_at': comment.created_at.isoformat(),
+        })])
         return comment
+
+class NotificationPreferenceSerializer(serializers.ModelSerializer):
+    digest_interval_minutes = serializers.IntegerField(min_value=5, max_value=1440, required=False)
+
+    class Meta:
+        model = NotificationPreference
+        fields = ('delivery', 'digest_interval_minutes', 'updated_at')
+        read_only_fields = ('updated_at',)
+
+class AttachmentUploadSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = AttachmentUpload
+        fields = ('id', 'ticket', 'filename', 'content_type', 'size', 'sha256', 'received',
+                  'status', 'error', 'attachment', 'created_at', 'updated_at')
+        read_only_fields = ('ticket', 'received', 'status', 'error', 'attachment', 'created_at', 'updated_at')
+
+class BulkTicketSerializer(serializers.Serializer):
+    ticket_ids = serializers.ListField(child=serializers.UUIDField(), min_length=1)
+
+    def validate_ticket_ids(self, value):
+        if len(value) > settings.TICKET_BULK_MAX:
+            raise serializers.ValidationError(f'At most {settings.TICKET_BULK_MAX} tickets per request.')
+        return list(dict.fromkeys(value))
+
+class BulkTransitionSerializer(BulkTicketSerializer):
+    to_stage_id = serializers.PrimaryKeyRelatedField(queryset=WorkflowStage.objects.all(), source='to_stage')
+    comment = serializers.CharField(required=False, allow_blank=True)
+
+class BulkAssignSerializer(BulkTicketSerializer):
+    to_user = serializers.PrimaryKeyRelatedField(queryset=get_user_model().objects.filter(is_active=True))
+    reason = serializers.CharField(required=False, allow_blank=True, default='')
+
+class BulkCloseSerializer(BulkTicketSerializer):
+    status = serializers.ChoiceField(choices=CLOSED_STATUSES, default='closed')
+
+class IngestTicketSerializer(serializers.Serializer):
+    source_system = serializers.CharField(max_length=100)
+    source_id = serializers.CharField(max_length=200)
+    title = serializers.CharField(max_length=512)
+    description = serializers.CharField(required=False, allow_blank=True, allow_null=True)
+    priority = serializers.ChoiceField(choices=PRIORITY_CHOICES, required=False)
+    category = serializers.CharField(max_length=64, required=False, help_text='TicketCategory key')
+    department = serializers.CharField(max_length=100, required=False, allow_blank=True, allow_null=True)
+    due_date = serializers.DateTimeField(required=False, allow_null=True)
+    is_internal = serializers.BooleanField(required=False)
+
+class BulkIngestSerializer(serializers.Serializer):
+    tickets = IngestTicketSerializer(many=True, allow_empty=False)
+
+    def validate_tickets(self, value):
+        if len(value) > settings.TICKET_INGEST_MAX:
+            raise serializers.ValidationError(f'At most {settings.TICKET_INGEST_MAX} records per batch.')
+        return value
@@ -1,29 +1,177 @@
+import logging
+import os
+import re
+import threading
+
+from django.conf import settings
 from django.db import transaction
-from .models import TicketSequence, icketActivity, TicketAssignment, WorkflowTransition
+from django.db.models import F
+from .models import TicketSequence, TicketActivity, TicketAssignment, WorkflowTransition, CLOSED_STATUSES
 from datetime import timedelta
 from django.utils import timezone
 
+logger = logging.getLogger(__name__)
+
+
+class TicketNumberAllocator:
+    """
+    Hi-lo allocator for TCK-YYYYMM-XXXXXX numbers.
+
+    Each process reserves a block of numbers with a single UPDATE on the
+    month's TicketSequence row and hands them out from memory, so the row
+    lock is taken once per block instead of once per ticket. Numbers stay
+    unique; across workers they are only roughly ordered, and the unused
+    tail of a block is lost when a process exits.
+
+    A caller inside a transaction must not hold the row lock until it
+    commits, or transactional creates serialize on it again. On PostgreSQL
+    such reservations run on a private autocommit connection, so the lock
+    ends with the UPDATE and a rolled-back caller only leaves a gap. Other
+    databases (SQLite allows a single writer anyway) reserve in the
+    caller's transaction: the reservation could still roll back, so only
+    the numbers needed are taken and no block is kept.
+    """
+
+    def __init__(self, block_size=None):
+        self.block_size = block_size
+        self._lock = threading.Lock()
+        self._reset(None)
+
+    def _reset(self, prefix):
+        self._pid = os.getpid()
+        self._prefix = prefix
+        self._next = 0
+        self._limit = 0
+        self._local = threading.local()
+
+    def _reserve(self, prefix, count):
+        with transaction.atomic():
+            TicketSequence.objects.get_or_create(id=prefix)
+            TicketSequence.objects.filter(id=prefix).update(seq=F('seq') + count)
+            hi = TicketSequence.objects.values_list('seq', flat=True).get(id=prefix)
+        return hi - count + 1, hi + 1
+
+    def _reserve_apart(self, prefix, count):
+        """_reserve on this thread's own autocommit connection, outside the caller's transaction."""
+        from django.db import DEFAULT_DB_ALIAS, connections
+        conn = getattr(self._local, 'connection', None)
+        if conn is None:
+            conn = self._local.connection = connections.create_connection(DEFAULT_DB_ALIAS)
+        conn.close_if_unusable_or_obsolete()
+        table = conn.ops.quote_name(TicketSequence._meta.db_table)
+        now = timezone.now()
+        with conn.cursor() as cursor:
+            cursor.execute(
+                f'INSERT INTO {table} (id, seq, updated_at) VALUES (%s, 0, %s) ON CONFLICT (id) DO NOTHING',
+                [prefix, now],
+            )
+            cursor.execute(
+                f'UPDATE {table} SET seq = seq + %s, updated_at = %s WHERE id = %s RETURNING seq',
+                [count, now, prefix],
+            )
+            hi = cursor.fetchone()[0]
+        return hi - count + 1, hi + 1
+
+    def allocate(self, count=1):
+        prefix = timezone.now().strftime('TCK-%Y%m')
+        block_size = self.block_size or settings.TICKET_NUMBER_BLOCK_SIZE
+        numbers = []
+        with self._lock:
+            # a new month, or a forked worker that inherited its parent's block
+            if prefix != self._prefix or os.getpid() != self._pid:
+                self._reset(prefix)
+            while len(numbers) < count:
+                if self._next >= self._limit:
+                    needed = count - len(numbers)
+                    connection = transaction.get_connection()
+                    if not connection.in_atomic_block:
+                        self._next, self._limit = self._reserve(prefix, max(block_size, needed))
+                    elif connection.vendor == 'postgresql':
+                        self._next, self._limit = self._reserve_apart(prefix, max(block_size, needed))
+                    else:
+                        # the caller's transaction may still roll the reservation back,
+                        # so take exactly what is needed and keep nothing in memory
+                        numbers.extend(range(*self._reserve(prefix, needed)))
+                        break
+                take = min(count - len(numbers), self._limit - self._next)
+                numbers.extend(range(self._next, self._next + take))
+                self._next += take
+        return [f'{prefix}-{seq:06d}' for seq in numbers]
+
+
+ticket_numbers = TicketNumberAllocator()
+
+
 def generate_ticket_number():
-    # TCK-YYYYMM-XXXX
-    prefix = timezone.now().strftime('TCK-%Y%m')
-    with transaction.atomic():
-        seq_obj, created = TicketSequence.objects.select_for_update().get_or_create(id=prefix)
-        seq_obj.seq += 1
-        seq = seq_obj.seq
-        seq_obj.save()
-    return f'{prefix}-{seq:06d}'
+    # TCK-YYYYMM-XXXXXX
+    return ticket_numbers.allocate()[0]
+
+
+def generate_ticket_numbers(count):
+    return ticket_numbers.allocate(count)
+
+def sla_timer_id(ticket_id, deadline):
+    return f'sla-timer:{ticket_id}:{deadline.isoformat()}'
+
+
+def schedule_sla_timer(ticket):
+    from .tasks import fire_sla_timer
+    try:
+        fire_sla_timer.apply_async(
+            (str(ticket.id), ticket.sla_deadline.isoformat()),
+            eta=ticket.sla_deadline,
+            task_id=sla_timer_id(ticket.id, ticket.sla_deadline),
+            retry=False,
+        )
+    except Exception:
+        logger.exception('Could not arm SLA timer for ticket %s; the periodic sweep will catch it', ticket.id)
+
+
+def cancel_sla_timer(ticket_id, deadline):
+    from celery import current_app
+    try:
+        current_app.control.revoke(sla_timer_id(ticket_id, deadline))
+    except Exception:
+        # fire_sla_timer re-checks the deadline, so a missed revoke is harmless
+        logger.warning('Could not revoke SLA timer for ticket %s', ticket_id)
+
+
+def sync_sla_timer(ticket, previous_deadline, previous_status):
+    """Cancel/replace the ticket's SLA timer after its deadline or status changed."""
+    if not settings.SLA_TIMERS_ENABLED:
+        return
+    was_armed = bool(previous_deadline) and previous_status not in CLOSED_STATUSES
+    now_armed = bool(ticket.sla_deadline) and ticket.status not in CLOSED_STATUSES
+    moved = previous_deadline != ticket.sla_deadline
+    if not (was_armed or now_armed):
+        return
+
+    def apply():
+        if was_armed and (moved or not now_armed):
+            cancel_sla_timer(ticket.id, previous_deadline)
+        if now_armed and (moved or not was_armed):
+            schedule_sla_timer(ticket)
+
+    transaction.on_commit(apply)
+
 
 def compute_sla_deadline(ticket):
-    stage = ticket.current_stage
-    sla_hours = None
-    if stage and stage.sla_hours:
-        sla_hours = stage.sla_hours
-    else:
-        # fallback: category default (you might add a category field)
-        sla_hours = getattr(ticket.category, 'default_sla_hours', None)
+    from .sla import sla_deadline_for, sla_hours_for
+    sla_hours = sla_hours_for(ticket)
     if sla_hours:
-        ticket.sla_deadline = timezone.now() + timedelta(hours=sla_hours)
-        ticket.save(update_fields=['sla_deadline'])
+        # business-hours categories count only SLACalendar working time
+        now = timezone.now()
+        ticket.sla_started_at = now
+        ticket.sla_deadline = sla_deadline_for(ticket, now, sla_hours)
+        ticket.save(update_fields=['sla_started_at', 'sla_deadline'])
+
+
+def validate_transition(ticket, to_stage):
+    # checked against the category's compiled workflow graph; no queries once it is cached
+    if ticket.category is None:
+        return False
+    from .workflow import workflow_for
+    return workflow_for(ticket.category).can_transition(ticket, to_stage.id)
 
 
 @transaction.atomic
@@ -50,10 +198,79 @@ def transition_ticket(ticket, to_stage, actor, comment=None, assign_to=None):
         TicketAssignment.objects.create(ticket=ticket, from_user=ticket.assigned_to, to_user=assign_to, performed_by=actor)
         ticket.assigned_to = assign_to
         ticket.save(update_fields=['assigned_to'])
+    elif to_stage.default_assignee_role:
+        # hand the ticket to the stage's role unless its assignee already holds it
+        from .assignment import auto_assign, eligible_user_ids
+        if ticket.assigned_to_id not in eligible_user_ids(to_stage.default_assignee_role):
+            auto_assign(ticket, actor=actor, role=to_stage.default_assignee_role)
 
     # notifications
     from .notifications import notify_stage_change
     notify_stage_change(ticket, actor, comment)
 
+    from .realtime import publish, ticket_event
+    publish([ticket_event(ticket, 'stage_changed', actor, stage={'id': str(to_stage.id), 'name': to_stage.name},
+                          previous_stage=str(prev_stage.id) if prev_stage else None,
+                          assigned_to=ticket.assigned_to_id)])
+
     return ticket
 
+
+
+# @handle: Django username characters, not preceded by a word char (skips emails)
+MENTION_RE = re.compile(r'(?<![\w@.+-])@([\w.+-]{1,150})')
+
+
+def extract_mentions(text):
+    """Distinct @handles in `text`, in order of first appearance."""
+    handles = {}
+    for match in MENTION_RE.finditer(text or ''):
+        handle = match.group(1).rstrip('.')  # sentence punctuation
+        if handle:
+            handles.setdefault(handle, None)
+    return list(handles)
+
+
+@transaction.atomic
+def handle_comment_mentions(comment):
+    """
+    Record and notify everyone @mentioned in a comment. A handle is a
+    username or a group name (mentioning a team reaches its members); all
+    handles resolve in one query, and activities and notifications are
+    written in bulk, so the cost does not grow with the number mentioned.
+    Only users who may read the comment are notified. Returns them.
+    """
+    from django.contrib.auth import get_user_model
+    from django.db.models import Q
+
+    from .permissions import can_see_internal, can_view_ticket
+
+    handles = extract_mentions(comment.content)
+    if not handles:
+        return []
+    ticket = comment.ticket
+    category_key = ticket.category.key if ticket.category_id else None
+    users = []
+    for user in (
+        get_user_model().objects.filter(Q(username__in=handles) | Q(groups__name__in=handles), is_active=True)
+        .exclude(pk=comment.author_id).distinct().order_by('pk').prefetch_related('groups')
+    ):
+        user._group_names = frozenset(group.name for group in user.groups.all())
+        # a mention must not leak the ticket, or an internal note, to someone who cannot read it
+        if not can_view_ticket(user, ticket.raised_by_id, ticket.assigned_to_id, category_key):
+            continue
+        if comment.is_internal and not can_see_internal(user, ticket.assigned_to_id):
+            continue
+        users.append(user)
+    if not users:
+        return []
+
+    TicketActivity.objects.bulk_create([
+        TicketActivity(ticket_id=comment.ticket_id, actor_id=comment.author_id, action='mentioned',
+                       meta={'user': str(user.pk), 'comment': str(comment.pk)})
+        for user in users
+    ])
+    from .notifications import outbox_rows, save_outbox_rows
+    save_outbox_rows(outbox_rows('mentioned', ticket, users, comment.author,
+                                 comment=comment.content[:500]))
+    return users
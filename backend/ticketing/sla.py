@@ -0,0 +1,204 @@
+"""
+Business-hours SLA calendars.
+
+A calendar's working windows are expanded once into sorted interval
+arrays with the cumulative working seconds before each interval. Adding
+N working hours to a timestamp is then two binary searches instead of a
+walk through the calendar. Indexes are cached per process and keyed on
+the calendar's updated_at, which every edit bumps.
+"""
+import threading
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta, timezone as dt_timezone
+from zoneinfo import ZoneInfo
+
+from django.db import transaction
+from django.db.models import Q
+from django.utils import timezone
+
+from .models import SLACalendar, Ticket, CLOSED_STATUSES
+
+INDEX_PAST_DAYS = 31
+INDEX_FUTURE_DAYS = 400
+
+_cache = {}
+_cache_lock = threading.Lock()
+
+
+class WorkingTimeIndex:
+    def __init__(self, intervals):
+        # intervals: sorted, non-overlapping (start, end) epoch seconds
+        self.starts = [s for s, _ in intervals]
+        self.ends = [e for _, e in intervals]
+        self.cum_end = []
+        total = 0
+        for s, e in intervals:
+            total += e - s
+            self.cum_end.append(total)
+
+    @classmethod
+    def build(cls, calendar, first_day, last_day):
+        tz = ZoneInfo(calendar.time_zone)
+        windows = {}
+        for wh in calendar.working_hours.all():
+            windows.setdefault(wh.weekday, []).append((wh.start_time, wh.end_time))
+        holidays = {h.date for h in calendar.holidays.all()}
+
+        intervals = []
+        day = first_day
+        while day <= last_day:
+            if day not in holidays:
+                for start, end in windows.get(day.weekday(), ()):
+                    end_day = day if end > start else day + timedelta(days=1)
+                    intervals.append((
+                        int(datetime.combine(day, start, tz).timestamp()),
+                        int(datetime.combine(end_day, end, tz).timestamp()),
+                    ))
+            day += timedelta(days=1)
+
+        merged = []
+        for s, e in sorted(intervals):
+            if merged and s <= merged[-1][1]:
+                merged[-1] = (merged[-1][0], max(merged[-1][1], e))
+            else:
+                merged.append((s, e))
+        index = cls(merged)
+        index.first_day, index.last_day = first_day, last_day
+        return index
+
+    def covers(self, day):
+        return self.first_day <= day <= self.last_day
+
+    def add(self, start, seconds):
+        """Timestamp `seconds` of working time after `start`, or None past the index horizon."""
+        t = int(start.timestamp())
+        i = bisect_right(self.ends, t)
+        if i == len(self.ends):
+            return None
+        worked_before = self.cum_end[i] - (self.ends[i] - self.starts[i])
+        base = worked_before + max(t - self.starts[i], 0)
+        target = base + seconds
+
+        j = bisect_left(self.cum_end, target)
+        if j == len(self.cum_end):
+            return None
+        into = target - (self.cum_end[j] - (self.ends[j] - self.starts[j]))
+        return datetime.fromtimestamp(self.starts[j] + into, tz=dt_timezone.utc)
+
+
+def calendar_for(department):
+    """The department's own active calendar, else the hospital-wide default."""
+    scope = Q(department__isnull=True)
+    if department:
+        scope |= Q(department=department)
+    calendars = list(SLACalendar.objects.filter(scope, is_active=True))
+    calendars.sort(key=lambda c: (c.department is None, c.created_at))
+    return calendars[0] if calendars else None
+
+
+def index_for(calendar, day):
+    key = (calendar.id, calendar.updated_at)
+    with _cache_lock:
+        index = _cache.get(calendar.id)
+    if index is not None and index.version == key and index.covers(day):
+        return index
+
+    today = timezone.now().date()
+    first = min(today, day) - timedelta(days=INDEX_PAST_DAYS)
+    index = WorkingTimeIndex.build(calendar, first, max(today, day) + timedelta(days=INDEX_FUTURE_DAYS))
+    index.version = key
+    with _cache_lock:
+        _cache[calendar.id] = index
+    return index
+
+
+def add_working_hours(calendar, start, hours):
+    index = index_for(calendar, start.date())
+    deadline = index.add(start, int(hours * 3600))
+    if deadline is None:
+        # beyond the cached horizon: build a one-off index wide enough to hold it
+        span = INDEX_FUTURE_DAYS
+        while deadline is None and span <= INDEX_FUTURE_DAYS * 8:
+            span *= 2
+            wide = WorkingTimeIndex.build(calendar, start.date() - timedelta(days=1), start.date() + timedelta(days=span))
+            deadline = wide.add(start, int(hours * 3600))
+    return deadline
+
+
+def sla_deadline_for(ticket, start, hours, calendar=None):
+    """Wall-clock deadline, or working-time deadline for business-hours categories."""
+    if ticket.category and ticket.category.sla_business_hours:
+        calendar = calendar or calendar_for(ticket.department)
+        if calendar is not None:
+            deadline = add_working_hours(calendar, start, hours)
+            if deadline is not None:
+                return deadline
+    return start + timedelta(hours=hours)
+
+
+def sla_hours_for(ticket):
+    stage = ticket.current_stage
+    if stage and stage.sla_hours:
+        return stage.sla_hours
+    return getattr(ticket.category, 'default_sla_hours', None)
+
+
+def start_sla_clocks(tickets, start):
+    """
+    compute_sla_deadline for a batch, without saving: each department's
+    calendar is looked up once however many tickets share it.
+    """
+    calendars = {}
+    for ticket in tickets:
+        hours = sla_hours_for(ticket)
+        if not hours:
+            continue
+        calendar = None
+        if ticket.category and ticket.category.sla_business_hours:
+            if ticket.department not in calendars:
+                calendars[ticket.department] = calendar_for(ticket.department)
+            calendar = calendars[ticket.department]
+        ticket.sla_started_at = start
+        ticket.sla_deadline = sla_deadline_for(ticket, start, hours, calendar=calendar)
+
+
+def recompute_sla_deadlines(calendar, chunk_size=1000):
+    """Recompute deadlines of open business-hours tickets governed by `calendar` after it changed."""
+    from .services import sync_sla_timer
+
+    tickets = (
+        Ticket.objects.filter(category__sla_business_hours=True, sla_started_at__isnull=False)
+        .exclude(status__in=CLOSED_STATUSES)
+        .select_related('category', 'current_stage')
+    )
+    if calendar.department:
+        tickets = tickets.filter(department=calendar.department)
+    else:
+        overridden = SLACalendar.objects.filter(is_active=True, department__isnull=False).values('department')
+        tickets = tickets.exclude(department__in=overridden)
+
+    changed = 0
+    batch = []
+    for ticket in tickets.iterator(chunk_size=chunk_size):
+        hours = sla_hours_for(ticket)
+        if not hours:
+            continue
+        deadline = sla_deadline_for(ticket, ticket.sla_started_at, hours, calendar=calendar)
+        if deadline != ticket.sla_deadline:
+            batch.append((ticket, ticket.sla_deadline))
+            ticket.sla_deadline = deadline
+        if len(batch) >= chunk_size:
+            changed += _flush(batch, sync_sla_timer)
+            batch = []
+    changed += _flush(batch, sync_sla_timer)
+    return changed
+
+
+def _flush(batch, sync_sla_timer):
+    if not batch:
+        return 0
+    with transaction.atomic():
+        Ticket.objects.bulk_update([t for t, _ in batch], ['sla_deadline'])
+        for ticket, previous in batch:
+            sync_sla_timer(ticket, previous, ticket.status)
+    return len(batch)
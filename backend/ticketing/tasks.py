@@ -1,21 +1,209 @@
+from datetime import datetime, timedelta
+
 from celery import shared_task
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef
 from django.utils import timezone
-from .models import Ticket, SLARecord
-from .notifications import notify_sla_breach
+from .models import Ticket, SLARecord, TicketActivity, NotificationOutbox, CLOSED_STATUSES
+from .notifications import deliver, notify_sla_breaches
+
+# how long a dispatcher owns claimed outbox rows before another may retry them
+NOTIFICATION_LEASE = timedelta(minutes=5)
+
+
+def breached_tickets(now):
+    """Open tickets past their deadline without a breached SLARecord (uses the partial sla_deadline index)."""
+    already_breached = SLARecord.objects.filter(ticket=OuterRef('pk'), breached=True)
+    return (
+        Ticket.objects.filter(sla_deadline__lte=now)
+        .exclude(status__in=CLOSED_STATUSES)
+        .filter(~Exists(already_breached))
+    )
+
+
+def record_sla_breaches(tickets, now):
+    """Mark a batch of tickets as breached with bulk writes; caller holds the transaction."""
+    ids = [t.id for t in tickets]
+
+    # reuse pending records left by earlier sweeps, create the rest
+    SLARecord.objects.filter(ticket_id__in=ids, breached=False).update(
+        breached=True, breached_at=now, escalated=True, escalated_to='HR'
+    )
+    has_record = set(SLARecord.objects.filter(ticket_id__in=ids).values_list('ticket_id', flat=True))
+    SLARecord.objects.bulk_create([
+        SLARecord(ticket_id=tid, breached=True, breached_at=now, escalated=True, escalated_to='HR')
+        for tid in ids if tid not in has_record
+    ])
+    TicketActivity.objects.bulk_create([
+        TicketActivity(ticket_id=tid, action='sla_breached', actor=None, meta={}, created_at=now)
+        for tid in ids
+    ])
+
+
+def _lock_breached(queryset, limit=None):
+    return list(
+        queryset.select_related('assigned_to')
+        .select_for_update(skip_locked=True, of=('self',))
+        .order_by('sla_deadline')[:limit]
+    )
+
+
+@shared_task
+def check_sla_breaches(batch_size=None):
+    """
+    Safety-net sweep, run by celery beat; breaches normally fire from
+    per-ticket timers (fire_sla_timer). Also catches up on anything missed
+    while workers were down.
+    """
+    batch_size = batch_size or settings.SLA_SWEEP_BATCH_SIZE
+    now = timezone.now()
+    total = 0
+    while True:
+        with transaction.atomic():
+            tickets = _lock_breached(breached_tickets(now), batch_size)
+            if not tickets:
+                break
+            record_sla_breaches(tickets, now)
+            # escalate to assignee + HR through the outbox, committed with the breach
+            notify_sla_breaches(tickets)
+
+        total += len(tickets)
+        if len(tickets) < batch_size:
+            break
+    return total
+
 
 @shared_task
-def check_sla_breaches():
+def fire_sla_timer(ticket_id, deadline):
+    """
+    ETA task scheduled for a ticket's sla_deadline. A no-op when the
+    deadline has since moved or the ticket was closed, so stale timers
+    that escaped revocation are harmless.
+    """
     now = timezone.now()
-    qs = Ticket.objects.filter(sla_deadline__lte=now).exclude(status__in=['closed','resolved'])
-    for ticket in qs:
-        # avoid duplicate escalations — check SLARecord
-        sr, created = SLARecord.objects.get_or_create(ticket=ticket)
-        if not sr.breached:
-            sr.breached = True
-            sr.breached_at = now
-            sr.save()
-            # create activity
-            from .models import TicketActivity
-            TicketActivity.objects.create(ticket=ticket, action='sla_breached', actor=None, meta={})
-            # escalate (notify role)
-            notify_sla_breach(ticket)
+    with transaction.atomic():
+        tickets = _lock_breached(
+            breached_tickets(now).filter(pk=ticket_id, sla_deadline=datetime.fromisoformat(deadline))
+        )
+        if tickets:
+            record_sla_breaches(tickets, now)
+            notify_sla_breaches(tickets)
+    return bool(tickets)
+
+
+def restore_sla_timers():
+    """
+    Re-arm timers for every open ticket with a future deadline (range scan on
+    the partial index). ETA messages survive worker restarts, so this is only
+    for a broker that lost its queue - run it once, via the
+    restore_sla_timers command, or every pending ticket gets a duplicate timer.
+    """
+    from .services import schedule_sla_timer
+
+    pending = (
+        Ticket.objects.filter(sla_deadline__gt=timezone.now())
+        .exclude(status__in=CLOSED_STATUSES)
+        .only('id', 'sla_deadline', 'status')
+    )
+    count = 0
+    for ticket in pending.iterator():
+        schedule_sla_timer(ticket)
+        count += 1
+    return count
+
+
+@shared_task
+def recompute_calendar_deadlines(calendar_id):
+    from .models import SLACalendar
+    from .sla import recompute_sla_deadlines
+    return recompute_sla_deadlines(SLACalendar.objects.get(pk=calendar_id))
+
+
+def claim_notifications(limit, now):
+    """Lease up to `limit` due outbox rows to this dispatcher; returns their ids."""
+    with transaction.atomic():
+        ids = list(
+            NotificationOutbox.objects.filter(status='pending', next_attempt_at__lte=now)
+            .select_for_update(skip_locked=True)
+            .order_by('next_attempt_at')
+            .values_list('id', flat=True)[:limit]
+        )
+        if ids:
+            NotificationOutbox.objects.filter(id__in=ids).update(
+                attempts=F('attempts') + 1, next_attempt_at=now + NOTIFICATION_LEASE,
+            )
+    return ids
+
+
+@shared_task
+def dispatch_notifications(batch_size=None):
+    """
+    Deliver pending outbox rows in batches. Rows are leased rather than held
+    under lock while mail is sent, so a dispatcher that dies mid-batch only
+    delays its rows until the lease runs out.
+    """
+    batch_size = batch_size or settings.NOTIFICATION_BATCH_SIZE
+    sent = 0
+    while True:
+        ids = claim_notifications(batch_size, timezone.now())
+        if not ids:
+            break
+        rows = list(
+            NotificationOutbox.objects.filter(id__in=ids)
+            .select_related('ticket__category', 'ticket__current_stage', 'actor', 'recipient')
+            .order_by('created_at')
+        )
+        sent += deliver(rows)
+        if len(ids) < batch_size:
+            break
+    return sent
+
+
+@shared_task
+def assemble_upload(upload_id):
+    """Build the attachment for an upload whose last chunk has arrived."""
+    from .models import AttachmentUpload
+    from .uploads import assemble
+
+    upload = AttachmentUpload.objects.select_related('ticket', 'uploaded_by').filter(
+        pk=upload_id, status='assembling',
+    ).first()
+    if upload is None:
+        return None
+    return assemble(upload).status
+
+
+@shared_task
+def purge_stale_uploads(max_age_hours=None):
+    """Drop chunked uploads abandoned before completion, along with their stored chunks."""
+    from .models import AttachmentUpload
+    from .uploads import discard_chunks
+
+    max_age_hours = max_age_hours or settings.ATTACHMENT_UPLOAD_MAX_AGE_HOURS
+    cutoff = timezone.now() - timedelta(hours=max_age_hours)
+    stale = AttachmentUpload.objects.filter(updated_at__lt=cutoff).exclude(status='complete')
+    count = 0
+    for upload in stale.iterator():
+        discard_chunks(upload)
+        upload.delete()
+        count += 1
+    return count
+
+
+@shared_task
+def refresh_assignee_loads():
+    from .assignment import refresh_assignee_loads as refresh
+    return refresh()
+
+
+@shared_task
+def update_ticket_analytics(chunk_size=1000):
+    from .analytics import process_activities
+    return process_activities(chunk_size=chunk_size)
+
+
+@shared_task
+def archive_closed_tickets():
+    from .archive import archive_closed_tickets as archive
+    return archive()
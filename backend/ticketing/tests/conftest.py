@@ -1,11 +1,20 @@
 import pytest
 from django.contrib.auth import get_user_model
+from rest_framework.test import APIClient
 from ticketing.models import TicketCategory, WorkflowStage, Ticket
 
+@pytest.fixture
+def api_client():
+    return APIClient()
+
 @pytest.fixture
 def user(db):
     return get_user_model().objects.create_user("testuser", "user@test.com", "password")
 
+@pytest.fixture
+def user2(db):
+    return get_user_model().objects.create_user("otheruser", "other@test.com", "password")
+
 @pytest.fixture
 def category(db):
     return TicketCategory.objects.create(name="Recruit", key="RECRUIT")
@@ -14,6 +23,10 @@ def category(db):
 def stage(db, category):
     return WorkflowStage.objects.create(category=category, name="Shortlisted", key="SHORTLISTED", position=1)
 
+@pytest.fixture
+def stage2(db, category):
+    return WorkflowStage.objects.create(category=category, name="Interview", key="INTERVIEW", position=2)
+
 @pytest.fixture
 def ticket(db, user, category, stage):
     return Ticket.objects.create(
@@ -21,5 +34,6 @@ def ticket(db, user, category, stage):
         ticket_number="TCK-123456",
         category=category,
         current_stage=stage,
-        raised_by=user
+        raised_by=user,
+        assigned_to=user,
     )
@@ -0,0 +1,74 @@
+from datetime import timedelta
+
+from django.utils import timezone
+
+from ticketing.archive import archive_closed_tickets, restore_ticket
+from ticketing.models import (
+    ArchivedTicket, ArchivedTicketActivity, ArchivedTicketComment, SLARecord, Ticket, TicketActivity, TicketComment,
+)
+from ticketing.search import index_tickets
+
+
+def close_long_ago(ticket, days=400):
+    Ticket.objects.filter(pk=ticket.pk).update(status='closed', updated_at=timezone.now() - timedelta(days=days))
+
+
+def test_archive_moves_old_closed_tickets_with_children(ticket, user, category):
+    TicketComment.objects.create(ticket=ticket, author=user, content="offer letter sent")
+    TicketComment.objects.create(ticket=ticket, author=user, content="salary band", is_internal=True)
+    TicketActivity.objects.create(ticket=ticket, actor=user, action="ticket_created", meta={})
+    SLARecord.objects.create(ticket=ticket, breached=True)
+    close_long_ago(ticket)
+    recent = Ticket.objects.create(title="recent", ticket_number="TCK-R", category=category, raised_by=user,
+                                   status='closed')
+
+    assert archive_closed_tickets(chunk_size=1) == 1
+    assert list(Ticket.objects.values_list('pk', flat=True)) == [recent.pk]
+    archived = ArchivedTicket.objects.get(pk=ticket.pk)
+    assert archived.sla_breached
+    assert ArchivedTicketComment.objects.filter(ticket=archived).count() == 2
+    assert ArchivedTicketActivity.objects.filter(ticket=archived).count() == 1
+    assert "offer letter" in archived.search_text and "salary band" not in archived.search_text
+
+    restored = restore_ticket(ticket.pk)
+    assert restored.ticket_number == ticket.ticket_number
+    assert restored.comments.count() == 2
+    assert not ArchivedTicket.objects.exists()
+
+
+def test_retrieve_and_search_fall_back_to_the_archive(api_client, ticket, user, user2, category):
+    TicketComment.objects.create(ticket=ticket, author=user, content="Relocation allowance approved")
+    close_long_ago(ticket)
+    live = Ticket.objects.create(title="Relocation request", ticket_number="TCK-L", category=category,
+                                 raised_by=user)
+    index_tickets([live.pk])
+    archive_closed_tickets()
+
+    api_client.force_authenticate(user)
+    resp = api_client.get(f'/api/tickets/{ticket.pk}/')
+    assert resp.status_code == 200
+    assert resp.data["ticket_number"] == "TCK-123456"
+    assert resp.data["comment_count"] == 1
+    assert resp.data["archived_at"]
+
+    resp = api_client.get('/api/tickets/search/', {'q': 'relocation', 'page_size': 1})
+    assert [r["ticket_number"] for r in resp.data["results"]] == ["TCK-L"]
+    assert resp.data["has_next"]
+    resp = api_client.get('/api/tickets/search/', {'q': 'relocation', 'page_size': 1, 'page': 2})
+    assert [r["ticket_number"] for r in resp.data["results"]] == ["TCK-123456"]
+    assert "<mark>Relocation</mark>" in resp.data["results"][0]["snippet"]
+    assert not resp.data["has_next"]
+
+    # archived tickets keep the live visibility rules
+    api_client.force_authenticate(user2)
+    assert api_client.get(f'/api/tickets/{ticket.pk}/').status_code == 403
+    assert api_client.get('/api/tickets/search/', {'q': 'relocation'}).data["results"] == []
+
+
+def test_archival_runs_nightly_on_the_beat_schedule(settings):
+    from backend.celery import app
+
+    app.loader.import_default_modules()
+    entry = settings.CELERY_BEAT_SCHEDULE["archive-closed-tickets"]
+    assert entry["task"] in app.tasks
+    assert entry["schedule"].hour == {settings.TICKET_ARCHIVE_HOUR}
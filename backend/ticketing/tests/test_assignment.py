@@ -0,0 +1,63 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+
+from ticketing.assignment import auto_assign, refresh_assignee_loads
+from ticketing.models import AssigneeLoad, Ticket
+
+
+def make_recruiters(n):
+    User = get_user_model()
+    return [User.objects.create_user(f"rec{i}", f"rec{i}@test.com", "pw", role="HR") for i in range(n)]
+
+
+def test_auto_assign_balances_by_open_tickets(db, category, user):
+    category.default_assignee_role = "HR"
+    category.save()
+    a, b = make_recruiters(2)
+    Ticket.objects.create(title="busy", ticket_number="TCK-1", category=category, raised_by=user, assigned_to=a)
+
+    assigned = []
+    for i in range(4):
+        ticket = Ticket.objects.create(title=f"t{i}", ticket_number=f"TCK-N{i}", category=category, raised_by=user)
+        assigned.append(auto_assign(ticket).username)
+    assert AssigneeLoad.objects.get(user=a).open_tickets == 3
+    assert AssigneeLoad.objects.get(user=b).open_tickets == 2
+    assert assigned[0] == "rec1"
+
+
+def test_counters_follow_reassignment_and_close(db, category, user):
+    a, b = make_recruiters(2)
+    ticket = Ticket.objects.create(title="t", ticket_number="TCK-1", category=category, raised_by=user, assigned_to=a)
+    assert AssigneeLoad.objects.get(user=a).open_tickets == 1
+
+    ticket.assigned_to = b
+    ticket.save()
+    ticket.status = 'closed'
+    ticket.save()
+    assert AssigneeLoad.objects.get(user=a).open_tickets == 0
+    assert AssigneeLoad.objects.get(user=b).open_tickets == 0
+
+    Ticket.objects.filter(pk=ticket.pk).update(status='open')  # bypasses save()
+    refresh_assignee_loads()
+    assert AssigneeLoad.objects.get(user=b).open_tickets == 1
+
+
+def test_ticket_create_api_auto_assigns(api_client, user, category, stage):
+    category.default_assignee_role = "HR"
+    category.save()
+    (recruiter,) = make_recruiters(1)
+    api_client.force_authenticate(user)
+    resp = api_client.post('/api/tickets/', {"title": "New hire", "category": str(category.id),
+                                             "current_stage": str(stage.id)})
+    assert resp.status_code == 201
+    assert Ticket.objects.get(pk=resp.data["id"]).assigned_to == recruiter
+
+
+def test_counters_are_refreshed_on_the_beat_schedule(settings):
+    from backend.celery import app
+
+    app.loader.import_default_modules()
+    entry = settings.CELERY_BEAT_SCHEDULE["refresh-assignee-loads"]
+    assert entry["task"] in app.tasks
+    assert entry["schedule"] == timedelta(minutes=settings.ASSIGNEE_LOAD_REFRESH_INTERVAL_MINUTES)
@@ -0,0 +1,141 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+
+from ticketing.models import (
+    AssigneeLoad, NotificationOutbox, Ticket, TicketActivity, TicketAssignment, WorkflowStage,
+)
+
+
+def make_tickets(n, category, stage, user, **extra):
+    return Ticket.objects.bulk_create([
+        Ticket(title=f"t{i}", ticket_number=f"TCK-B{i}", category=category, current_stage=stage,
+               raised_by=user, **extra)
+        for i in range(n)
+    ])
+
+
+def hr_user(name="lead"):
+    lead = get_user_model().objects.create_user(name, f"{name}@test.com", "pw")
+    lead.groups.add(Group.objects.get_or_create(name="HR")[0])
+    return lead
+
+
+def test_bulk_transition_costs_the_same_for_many_tickets(api_client, category, stage, stage2, user,
+                                                         django_assert_max_num_queries):
+    stage2.sla_hours = 8
+    stage2.save()
+    tickets = make_tickets(40, category, stage, user, assigned_to=user)
+    api_client.force_authenticate(hr_user())
+
+    with django_assert_max_num_queries(20):
+        resp = api_client.post('/api/tickets/bulk-transition/', {
+            "ticket_ids": [str(t.pk) for t in tickets], "to_stage_id": str(stage2.id), "comment": "batch",
+        }, format='json')
+    assert resp.status_code == 200, resp.data
+    assert resp.data["count"] == 40
+    assert Ticket.objects.filter(current_stage=stage2, sla_deadline__isnull=False).count() == 40
+    assert TicketActivity.objects.filter(action="stage_changed").count() == 40
+    assert NotificationOutbox.objects.filter(event="stage_changed").count() == 40
+
+
+def test_bulk_transition_auto_assigns_across_the_role(api_client, category, stage, stage2, user):
+    stage2.default_assignee_role = "Recruiter"
+    stage2.save()
+    User = get_user_model()
+    a, b = [User.objects.create_user(f"rec{i}", f"rec{i}@test.com", "pw", role="Recruiter") for i in range(2)]
+    tickets = make_tickets(6, category, stage, user)
+    api_client.force_authenticate(hr_user())
+
+    resp = api_client.post('/api/tickets/bulk-transition/', {
+        "ticket_ids": [str(t.pk) for t in tickets], "to_stage_id": str(stage2.id),
+    }, format='json')
+    assert resp.status_code == 200, resp.data
+    assert AssigneeLoad.objects.get(user=a).open_tickets == 3
+    assert AssigneeLoad.objects.get(user=b).open_tickets == 3
+    assert TicketAssignment.objects.filter(reason="auto-assigned").count() == 6
+
+
+def test_bulk_is_all_or_nothing(api_client, category, stage, user, user2):
+    mine = make_tickets(2, category, stage, user, assigned_to=user)
+    theirs = Ticket.objects.create(title="x", ticket_number="TCK-X", category=category, raised_by=user2,
+                                   assigned_to=user2)
+    api_client.force_authenticate(user)
+
+    resp = api_client.post('/api/tickets/bulk-close/', {
+        "ticket_ids": [str(t.pk) for t in mine] + [str(theirs.pk)],
+    }, format='json')
+    assert resp.status_code == 400
+    assert resp.data["errors"] == {str(theirs.pk): "Not allowed"}
+    assert not Ticket.objects.filter(status="closed").exists()
+
+
+def test_single_assign_follows_the_bulk_rule(api_client, category, stage, user, user2):
+    (ticket,) = make_tickets(1, category, stage, user, assigned_to=user2)
+    api_client.force_authenticate(user)  # the requester can see the ticket but not reassign it
+    resp = api_client.post(f'/api/tickets/{ticket.pk}/assign/', {"to_user": user.pk}, format='json')
+    assert resp.status_code == 403
+    resp = api_client.post('/api/tickets/bulk-assign/', {"ticket_ids": [str(ticket.pk)], "to_user": user.pk},
+                           format='json')
+    assert resp.status_code == 400
+
+    api_client.force_authenticate(user2)
+    resp = api_client.post(f'/api/tickets/{ticket.pk}/assign/', {"to_user": user.pk}, format='json')
+    assert resp.status_code == 200
+    assert TicketAssignment.objects.get(ticket=ticket).to_user == user
+
+
+def test_bulk_assign_and_close_keep_counters_and_log(api_client, category, stage, user, user2):
+    tickets = make_tickets(5, category, stage, user, assigned_to=user)
+    for t in tickets:
+        Ticket.objects.get(pk=t.pk).save()  # seed the load counter
+    api_client.force_authenticate(hr_user())
+    ids = [str(t.pk) for t in tickets]
+
+    resp = api_client.post('/api/tickets/bulk-assign/', {"ticket_ids": ids, "to_user": user2.pk}, format='json')
+    assert resp.data["count"] == 5
+    assert AssigneeLoad.objects.get(user=user).open_tickets == 0
+    assert AssigneeLoad.objects.get(user=user2).open_tickets == 5
+    assert NotificationOutbox.objects.filter(event="assigned", recipient=user2).count() == 5
+
+    resp = api_client.post('/api/tickets/bulk-close/', {"ticket_ids": ids, "status": "resolved"}, format='json')
+    assert resp.data["count"] == 5
+    assert AssigneeLoad.objects.get(user=user2).open_tickets == 0
+    assert TicketActivity.objects.filter(action="status_changed").count() == 5
+
+
+def test_ingest_is_idempotent_and_batched(api_client, category, stage, user, django_assert_max_num_queries):
+    category.default_assignee_role = "Recruiter"
+    category.default_sla_hours = 24
+    category.save()
+    get_user_model().objects.create_user("rec", "rec@test.com", "pw", role="Recruiter")
+    records = [{"source_system": "recruitment", "source_id": f"APP-{i}", "title": f"Candidate {i}",
+                "category": "RECRUIT"} for i in range(50)]
+    api_client.force_authenticate(hr_user())
+
+    with django_assert_max_num_queries(35):  # independent of the batch size
+        resp = api_client.post('/api/tickets/ingest/', {"tickets": records}, format='json')
+    assert resp.status_code == 200, resp.data
+    assert resp.data["created"] == 50
+    tickets = Ticket.objects.filter(source_system="recruitment")
+    assert tickets.count() == 50
+    assert len(set(tickets.values_list("ticket_number", flat=True))) == 50
+    assert tickets.filter(current_stage=stage, sla_deadline__isnull=False, assigned_to__username="rec").count() == 50
+    assert AssigneeLoad.objects.get(user__username="rec").open_tickets == 50
+
+    # the integration retries after a timeout, with one record edited
+    records[0]["title"] = "Candidate 0 (rescheduled)"
+    resp = api_client.post('/api/tickets/ingest/', {"tickets": records}, format='json')
+    assert (resp.data["created"], resp.data["updated"], resp.data["unchanged"]) == (0, 1, 49)
+    assert Ticket.objects.filter(source_system="recruitment").count() == 50
+    assert Ticket.objects.get(source_id="APP-0").title == "Candidate 0 (rescheduled)"
+    assert TicketActivity.objects.filter(action="ticket_created").count() == 50
+
+
+def test_ingest_rejects_unknown_categories(db, api_client):
+    api_client.force_authenticate(hr_user())
+    resp = api_client.post('/api/tickets/ingest/', {"tickets": [
+        {"source_system": "erp", "source_id": "1", "title": "x", "category": "NOPE"},
+    ]}, format='json')
+    assert resp.status_code == 400
+    assert resp.data["errors"] == {"erp:1": "Unknown category 'NOPE'"}
+    assert not Ticket.objects.exists()
@@ -1,3 +1,6 @@
+from ticketing.models import Ticket
+
+
 def test_ticket_creation(db, user, category, stage):
     ticket = Ticket.objects.create(
         title="Test Ticket",
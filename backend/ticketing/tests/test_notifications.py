@@ -0,0 +1,118 @@
+import pytest
+from django.db import transaction
+from django.utils import timezone
+
+from ticketing.models import NotificationOutbox, NotificationPreference, Ticket, TicketActivity
+from ticketing.notifications import EmailTemplate, notify_assignment, notify_stage_change, ticket_created_template
+from ticketing.tasks import dispatch_notifications
+
+
+def test_outbox_rows_roll_back_with_the_change(ticket, user, user2):
+    with pytest.raises(RuntimeError):
+        with transaction.atomic():
+            notify_assignment(ticket, user, user2)
+            raise RuntimeError
+    assert not NotificationOutbox.objects.exists()
+
+
+def test_ticket_create_commits_with_its_notifications(api_client, user, category, stage, monkeypatch):
+    def broken(ticket, actor):
+        raise RuntimeError("outbox unavailable")
+
+    monkeypatch.setattr("ticketing.notifications.notify_ticket_created", broken)
+    api_client.raise_request_exception = False
+    api_client.force_authenticate(user)
+    resp = api_client.post('/api/tickets/', {"title": "New hire", "category": str(category.id),
+                                             "current_stage": str(stage.id)})
+    assert resp.status_code == 500
+    assert not Ticket.objects.exists() and not TicketActivity.objects.exists()
+
+
+def test_dispatch_coalesces_per_recipient(ticket, user, user2, mailoutbox):
+    notify_assignment(ticket, user2, user)
+    notify_stage_change(ticket, user2, comment="Moving on")
+    notify_stage_change(ticket, user, comment="actor is never notified")
+
+    assert dispatch_notifications() == 1
+    assert len(mailoutbox) == 1
+    assert mailoutbox[0].to == ["user@test.com"]
+    assert mailoutbox[0].subject == "2 ticket updates"
+    assert "Moving on" in mailoutbox[0].body
+    assert set(NotificationOutbox.objects.values_list('status', flat=True)) == {'sent'}
+    assert dispatch_notifications() == 0
+
+
+def test_failed_delivery_backs_off_then_gives_up(ticket, user, user2, settings, monkeypatch):
+    settings.NOTIFICATION_MAX_ATTEMPTS = 2
+
+    def broken(self, messages):
+        raise OSError("smtp down")
+    monkeypatch.setattr("django.core.mail.backends.locmem.EmailBackend.send_messages", broken)
+    notify_assignment(ticket, user2, user)
+
+    assert dispatch_notifications() == 0
+    row = NotificationOutbox.objects.get()
+    assert (row.status, row.attempts, row.last_error) == ('pending', 1, 'smtp down')
+    assert row.next_attempt_at > timezone.now()
+
+    NotificationOutbox.objects.update(next_attempt_at=timezone.now())
+    dispatch_notifications()
+    assert NotificationOutbox.objects.get().status == 'failed'
+
+
+def test_ticket_created_template(ticket, user):
+    ticket.priority = 3
+    body = ticket_created_template().render({"ticket": ticket, "recipient": user, "actor": user, "base_url": "http://hrms"})
+    assert "Ticket: TCK-123456" in body
+    assert "Priority: High" in body
+    assert "Stage: Shortlisted" in body
+    assert f"View: http://hrms/tickets/{ticket.id}" in body
+    assert EmailTemplate("{{ missing.attr }}!").render({}) == "!"
+
+
+def test_digest_recipients_get_one_message_per_window(ticket, user, user2, mailoutbox):
+    NotificationPreference.objects.create(user=user, delivery='digest', digest_interval_minutes=60)
+    notify_assignment(ticket, user2, user)
+    notify_stage_change(ticket, user2)
+
+    # held until the window closes
+    assert dispatch_notifications() == 0
+    assert NotificationOutbox.objects.filter(digest=True, next_attempt_at__gt=timezone.now()).count() == 2
+
+    NotificationOutbox.objects.update(next_attempt_at=timezone.now())
+    assert dispatch_notifications() == 1
+    assert mailoutbox[0].subject == "Ticket digest: 2 updates"
+
+
+def test_full_digest_flushes_early(ticket, user, user2, settings):
+    settings.NOTIFICATION_DIGEST_MAX_EVENTS = 3
+    NotificationPreference.objects.create(user=user, delivery='digest', digest_interval_minutes=1440)
+    for _ in range(2):
+        notify_stage_change(ticket, user2)
+    assert not NotificationOutbox.objects.filter(next_attempt_at__lte=timezone.now()).exists()
+    notify_stage_change(ticket, user2)
+    assert NotificationOutbox.objects.filter(next_attempt_at__lte=timezone.now()).count() == 3
+
+
+def test_preference_endpoint(api_client, user):
+    api_client.force_authenticate(user)
+    assert api_client.get('/api/notification-preferences/me/').data["delivery"] == "immediate"
+    resp = api_client.put('/api/notification-preferences/me/', {"delivery": "digest", "digest_interval_minutes": 30})
+    assert resp.status_code == 200
+    assert NotificationPreference.objects.get(user=user).digest_interval_minutes == 30
+    assert api_client.put('/api/notification-preferences/me/', {"digest_interval_minutes": 1}).status_code == 400
+
+
+def test_digest_window_schedules_its_own_flush(ticket, user, user2, monkeypatch, django_capture_on_commit_callbacks):
+    queued = []
+    monkeypatch.setattr(dispatch_notifications, 'apply_async', lambda **kwargs: queued.append(kwargs['eta']))
+    NotificationPreference.objects.create(user=user, delivery='digest', digest_interval_minutes=60)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        notify_assignment(ticket, user2, user)
+    with django_capture_on_commit_callbacks(execute=True):
+        notify_stage_change(ticket, user2)
+
+    # one dispatch at the window's end, however many rows the window collects
+    window_end = NotificationOutbox.objects.values_list('next_attempt_at', flat=True).distinct().get()
+    assert queued == [window_end]
@@ -4,3 +4,22 @@ def test_non_assignee_cannot_transition(api_client, ticket, user2):
         "to_stage_id": ticket.current_stage.id
     })
     assert resp.status_code == 403
+
+
+def test_permission_checks_load_groups_once(api_client, django_assert_num_queries, ticket, user2):
+    from django.contrib.auth.models import Group
+    from ticketing.permissions import CanTransitionTicket, CanViewTicket, IsHR
+
+    user2.groups.add(Group.objects.create(name='HR'))
+    request = type('Request', (), {'user': user2})()
+    with django_assert_num_queries(1):
+        assert IsHR().has_permission(request, None)
+        assert CanViewTicket().has_object_permission(request, None, ticket)
+        assert CanTransitionTicket().has_object_permission(request, None, ticket)
+
+
+def test_anonymous_cannot_view_unowned_ticket(api_client, ticket):
+    ticket.raised_by = None
+    ticket.save()
+    resp = api_client.get(f'/api/tickets/{ticket.id}/')
+    assert resp.status_code in (401, 403)
@@ -0,0 +1,179 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from asgiref.sync import async_to_sync, sync_to_async
+from channels.layers import channel_layers, get_channel_layer
+from channels.testing import WebsocketCommunicator
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from rest_framework_simplejwt.tokens import AccessToken
+
+from ticketing import realtime
+from ticketing.bulk import bulk_close
+from ticketing.models import Ticket, TicketCategory
+from ticketing.realtime import (
+    ALL_TICKETS_GROUP, RECRUIT_GROUP, audience_groups, can_receive, subscriber_groups, ticket_event, user_group,
+)
+from ticketing.serializers import CommentSerializer
+from ticketing.services import transition_ticket
+
+
+@pytest.fixture
+def channel_layer(settings):
+    settings.CHANNEL_LAYERS = {"default": {"BACKEND": "channels.layers.InMemoryChannelLayer"}}
+    channel_layers.backends.clear()
+    layer = get_channel_layer()
+    yield layer
+    async_to_sync(layer.flush)()
+    channel_layers.backends.clear()
+
+
+@pytest.fixture
+def hr_user(db):
+    hr = get_user_model().objects.create_user("hruser", "hr@test.com", "password")
+    hr.groups.add(Group.objects.get_or_create(name="HR")[0])
+    return hr
+
+
+def listen(layer, *groups):
+    """A channel subscribed to `groups`, standing in for a connected socket."""
+    channel = async_to_sync(layer.new_channel)()
+    for group in groups:
+        async_to_sync(layer.group_add)(group, channel)
+    return channel
+
+
+def drain(layer, channel):
+    async def receive_all():
+        messages = []
+        while True:
+            try:
+                messages.append(await asyncio.wait_for(layer.receive(channel), timeout=0.05))
+            except asyncio.TimeoutError:
+                return messages
+    return async_to_sync(receive_all)()
+
+
+def test_audience_mirrors_ticket_visibility(ticket, user, user2, hr_user):
+    event = ticket_event(ticket, 'assigned')
+
+    assert audience_groups(event) == {ALL_TICKETS_GROUP, RECRUIT_GROUP, user_group(user.pk)}
+    assert subscriber_groups(hr_user) == [user_group(hr_user.pk), RECRUIT_GROUP]
+    assert can_receive(user, event) and can_receive(hr_user, event)
+    assert not can_receive(user2, event)
+
+
+def test_internal_comments_skip_the_requester(ticket, user, user2, hr_user):
+    ticket.assigned_to = user2
+    event = ticket_event(ticket, 'comment_added', internal=True)
+
+    assert can_receive(user2, event) and can_receive(hr_user, event)
+    assert not can_receive(user, event)
+
+
+def test_transition_publishes_after_commit(ticket, stage2, user, channel_layer, django_capture_on_commit_callbacks):
+    channel = listen(channel_layer, user_group(user.pk))
+    with django_capture_on_commit_callbacks() as callbacks:
+        transition_ticket(ticket, stage2, user)
+    assert drain(channel_layer, channel) == []  # nothing leaves before the commit
+
+    for callback in callbacks:
+        callback()
+    [message] = drain(channel_layer, channel)
+    assert message['event'] == 'stage_changed'
+    assert message['data']['stage'] == {'id': str(stage2.id), 'name': stage2.name}
+
+
+def test_comment_and_bulk_close_publish(ticket, user, hr_user, channel_layer, django_capture_on_commit_callbacks):
+    channel = listen(channel_layer, RECRUIT_GROUP)
+    serializer = CommentSerializer(data={'ticket': str(ticket.pk), 'content': 'note', 'is_internal': True},
+                                   context={'request': SimpleNamespace(user=hr_user)})
+    assert serializer.is_valid(), serializer.errors
+    with django_capture_on_commit_callbacks(execute=True):
+        serializer.save()
+        bulk_close([ticket.pk], user)
+
+    comment, closed = drain(channel_layer, channel)
+    assert comment['event'] == 'comment_added' and comment['internal']
+    assert comment['data']['comment']['content'] == 'note'
+    assert closed['event'] == 'status_changed' and closed['data'] == {'status': 'closed'}
+
+
+def test_publish_failure_does_not_raise(ticket, channel_layer, monkeypatch):
+    async def broken(group, message):
+        raise ConnectionError('redis is down')
+
+    monkeypatch.setattr(channel_layer, 'group_send', broken)
+    realtime.send([ticket_event(ticket, 'assigned')])
+
+
+@pytest.fixture
+def sockets(transactional_db, channel_layer):
+    from backend.asgi import application
+
+    def connect(user=None, **params):
+        query = '&'.join(f'{key}={value}' for key, value in params.items())
+        if user is not None:
+            query = f'token={AccessToken.for_user(user)}' + (f'&{query}' if query else '')
+        return WebsocketCommunicator(application, f'/ws/tickets/?{query}')
+    return connect
+
+
+def test_socket_rejects_anonymous_and_bad_tokens(sockets):
+    async def scenario():
+        for socket in (sockets(), sockets(token='not-a-jwt')):
+            connected, code = await socket.connect()
+            assert not connected and code == 4401
+
+    async_to_sync(scenario)()
+
+
+def test_socket_only_delivers_events_its_user_may_see(sockets, user, user2, hr_user, category, stage):
+    it = TicketCategory.objects.create(name="IT", key="IT")
+    mine = Ticket.objects.create(title="Mine", ticket_number="TCK-000001", category=it,
+                                 current_stage=None, raised_by=user, assigned_to=user2)
+    recruit = Ticket.objects.create(title="Hire", ticket_number="TCK-000002", category=category,
+                                    current_stage=stage, raised_by=user2)
+    events = [
+        ticket_event(recruit, 'assigned'),                             # user: not theirs
+        ticket_event(mine, 'comment_added', internal=True, body='x'),  # user: requester, internal
+        ticket_event(mine, 'comment_added', body='hello'),             # user: yes
+    ]
+
+    async def scenario():
+        requester, hr = sockets(user), sockets(hr_user, ticket=recruit.pk)
+        assert (await requester.connect())[0] and (await hr.connect())[0]
+        await sync_to_async(realtime.send)(events)
+
+        received = await requester.receive_json_from()
+        assert received['ticket'] == str(mine.pk) and received['data'] == {'body': 'hello'}
+        assert set(received) == set(realtime.PUBLIC_FIELDS)  # routing fields stay server-side
+        assert await requester.receive_nothing()
+
+        # HR sees recruitment tickets, narrowed to the one on the page
+        assert (await hr.receive_json_from())['ticket'] == str(recruit.pk)
+        assert await hr.receive_nothing()
+
+        await requester.send_json_to({'action': 'ping'})
+        assert await requester.receive_json_from() == {'event': 'pong'}
+        await requester.disconnect()
+        await hr.disconnect()
+
+    async_to_sync(scenario)()
+
+
+def test_event_reaching_a_socket_through_two_groups_is_sent_once(sockets, hr_user, category, stage):
+    own = Ticket.objects.create(title="Hire", ticket_number="TCK-000003", category=category,
+                                current_stage=stage, raised_by=hr_user)
+    event = ticket_event(own, 'assigned')  # routed to the HR group and to hr_user's own group
+
+    async def scenario():
+        socket = sockets(hr_user)
+        assert (await socket.connect())[0]
+        await sync_to_async(realtime.send)([event])
+        assert (await socket.receive_json_from())['id'] == event['id']
+        assert await socket.receive_nothing()
+        await socket.disconnect()
+
+    async_to_sync(scenario)()
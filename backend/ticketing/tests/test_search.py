@@ -0,0 +1,73 @@
+import pytest
+
+from ticketing.models import Ticket, TicketComment, TicketSearchDocument
+from ticketing.search import index_tickets, search_tickets
+
+
+@pytest.fixture
+def indexed(ticket, user, user2, category):
+    ticket.title = "Night shift nurse vacancy"
+    ticket.description = "Cardiology ward needs cover"
+    ticket.save()
+    TicketComment.objects.create(ticket=ticket, author=user, content="Candidate has <b>ICU</b> experience")
+    TicketComment.objects.create(ticket=ticket, author=user, content="salary band confidential", is_internal=True)
+    other = Ticket.objects.create(title="Payslip missing", ticket_number="TCK-2", category=category, raised_by=user2)
+    index_tickets([ticket.id, other.id])
+    return ticket
+
+
+def test_documents_combine_ticket_and_public_comments(indexed):
+    document = TicketSearchDocument.objects.get(ticket=indexed)
+    assert "Cardiology" in document.body and "ICU" in document.body
+    assert "confidential" not in document.body
+
+
+def test_search_ranks_and_highlights(indexed):
+    hits = search_tickets("icu", Ticket.objects.all())
+    assert [h[0] for h in hits] == [indexed.id]
+    assert "<mark>ICU</mark>" in hits[0][2]
+    assert "<b>" not in hits[0][2]
+
+    # prefix match on the last term, scoped by the ticket queryset
+    assert [h[0] for h in search_tickets("nurse vac", Ticket.objects.all())] == [indexed.id]
+    assert search_tickets("nurse", Ticket.objects.exclude(pk=indexed.pk)) == []
+    assert search_tickets('"unterminated OR', Ticket.objects.all()) == []
+
+
+@pytest.mark.django_db(transaction=True)
+def test_saving_a_comment_reindexes_the_ticket(user, category):
+    ticket = Ticket.objects.create(title="Badge request", ticket_number="TCK-3", category=category, raised_by=user)
+    TicketComment.objects.create(ticket=ticket, author=user, content="printer jammed")
+    assert [h[0] for h in search_tickets("printer", Ticket.objects.all())] == [ticket.id]
+
+
+def test_search_endpoint_respects_visibility(api_client, indexed, user2):
+    api_client.force_authenticate(user2)
+    resp = api_client.get('/api/tickets/search/?q=cardiology')
+    assert resp.status_code == 200
+    assert resp.data["results"] == []
+
+    resp = api_client.get('/api/tickets/search/?q=payslip&status=open')
+    assert [t["ticket_number"] for t in resp.data["results"]] == ["TCK-2"]
+    assert "<mark>Payslip</mark>" in resp.data["results"][0]["snippet"]
+
+
+
+@pytest.mark.django_db(transaction=True)
+def test_index_survives_vacuum(user, category):
+    from django.db import connection
+
+    tickets = [
+        Ticket.objects.create(title=title, ticket_number=f"TCK-V{i}", category=category, raised_by=user)
+        for i, title in enumerate(["Broken chair", "Printer toner", "Parking badge"])
+    ]
+    index_tickets([t.id for t in tickets])
+    TicketSearchDocument.objects.filter(ticket=tickets[0]).delete()
+    with connection.cursor() as cursor:
+        cursor.execute("VACUUM")  # may renumber implicit rowids
+
+    assert [h[0] for h in search_tickets("toner", Ticket.objects.all())] == [tickets[1].id]
+    assert [h[0] for h in search_tickets("parking", Ticket.objects.all())] == [tickets[2].id]
+    index_tickets([tickets[1].id])  # the update trigger removes the old entry by key
+    with connection.cursor() as cursor:
+        cursor.execute("INSERT INTO ticketing_ticket_fts(ticketing_ticket_fts) VALUES ('integrity-check')")
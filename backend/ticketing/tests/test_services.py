@@ -0,0 +1,136 @@
+from datetime import date, datetime, time, timedelta
+from zoneinfo import ZoneInfo
+
+import pytest
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+from django.db import transaction
+
+from ticketing.models import (
+    NotificationOutbox, TicketActivity, TicketComment, TicketSequence, SLACalendar, SLAWorkingHours, SLAHoliday,
+)
+from ticketing.services import TicketNumberAllocator, extract_mentions, handle_comment_mentions
+from ticketing.sla import sla_deadline_for, recompute_sla_deadlines
+
+
+def test_allocator_reserves_blocks(transactional_db):
+    allocator = TicketNumberAllocator(block_size=10)
+
+    first = allocator.allocate()[0]
+    batch = allocator.allocate(5)
+    prefix = first.rsplit('-', 1)[0]
+
+    assert first == f'{prefix}-000001'
+    assert batch == [f'{prefix}-{n:06d}' for n in range(2, 7)]
+    # one block reserved for six numbers
+    assert TicketSequence.objects.get(id=prefix).seq == 10
+
+
+def test_allocators_never_share_numbers(db):
+    a, b = TicketNumberAllocator(block_size=3), TicketNumberAllocator(block_size=3)
+
+    numbers = a.allocate(2) + b.allocate(4) + a.allocate(3)
+
+    assert len(set(numbers)) == len(numbers)
+
+
+def test_allocator_keeps_no_block_inside_transactions(db):
+    allocator = TicketNumberAllocator(block_size=10)
+
+    numbers = allocator.allocate(3)
+    prefix = numbers[0].rsplit('-', 1)[0]
+
+    assert TicketSequence.objects.get(id=prefix).seq == 3
+
+
+def test_allocator_reserves_blocks_apart_from_the_callers_connection(transactional_db):
+    allocator = TicketNumberAllocator(block_size=10)
+
+    assert allocator._reserve_apart('TCK-209901', 10) == (1, 11)
+    assert allocator._reserve_apart('TCK-209901', 5) == (11, 16)
+    # committed by its own connection, and visible to the caller's
+    assert TicketSequence.objects.get(id='TCK-209901').seq == 15
+    assert allocator._local.connection is not transaction.get_connection()
+    allocator._local.connection.close()
+
+
+@pytest.fixture
+def calendar(db):
+    cal = SLACalendar.objects.create(name="Office hours", time_zone="Asia/Kolkata")
+    for weekday in range(5):
+        SLAWorkingHours.objects.create(calendar=cal, weekday=weekday, start_time=time(9), end_time=time(17))
+    return SLACalendar.objects.get(pk=cal.pk)
+
+
+def test_business_hours_deadline_skips_nights_and_holidays(calendar, ticket):
+    ist = ZoneInfo("Asia/Kolkata")
+    SLAHoliday.objects.create(calendar=calendar, date=date(2026, 10, 21), name="Diwali")
+    calendar.refresh_from_db()
+    ticket.category.sla_business_hours = True
+
+    # Tuesday 16:00 + 4h: one hour Tuesday, Wednesday is a holiday, three hours Thursday
+    start = datetime(2026, 10, 20, 16, 0, tzinfo=ist)
+    assert sla_deadline_for(ticket, start, 4) == datetime(2026, 10, 22, 12, 0, tzinfo=ist)
+
+    # Friday 15:00 + 4h lands Monday 11:00
+    start = datetime(2026, 10, 23, 15, 0, tzinfo=ist)
+    assert sla_deadline_for(ticket, start, 4) == datetime(2026, 10, 26, 11, 0, tzinfo=ist)
+
+    ticket.category.sla_business_hours = False
+    assert sla_deadline_for(ticket, start, 4) == start + timedelta(hours=4)
+
+
+def test_calendar_change_recomputes_open_deadlines(calendar, ticket):
+    ist = ZoneInfo("Asia/Kolkata")
+    ticket.category.sla_business_hours = True
+    ticket.category.save()
+    ticket.sla_started_at = datetime(2026, 10, 20, 16, 0, tzinfo=ist)
+    ticket.sla_deadline = ticket.sla_started_at + timedelta(hours=1)
+    ticket.current_stage.sla_hours = 2
+    ticket.current_stage.save()
+    ticket.save()
+
+    assert recompute_sla_deadlines(calendar) == 1
+    ticket.refresh_from_db()
+    assert ticket.sla_deadline == datetime(2026, 10, 21, 10, 0, tzinfo=ist)
+
+    SLAHoliday.objects.create(calendar=calendar, date=date(2026, 10, 21))
+    calendar.refresh_from_db()
+    assert recompute_sla_deadlines(calendar) == 1
+    ticket.refresh_from_db()
+    assert ticket.sla_deadline == datetime(2026, 10, 22, 10, 0, tzinfo=ist)
+
+
+def test_extract_mentions_skips_emails_and_duplicates():
+    assert extract_mentions("@bob ping @alice, mail bob@example.com, thanks @bob.") == ["bob", "alice"]
+
+
+def test_comment_mentions_resolve_users_and_teams_in_bulk(ticket, user, user2, django_assert_max_num_queries):
+    team, hr = Group.objects.create(name="recruiters"), Group.objects.create(name="HR")
+    user2.groups.add(hr)
+    for i in range(5):
+        get_user_model().objects.create_user(f"rec{i}", f"rec{i}@test.com", "pw").groups.add(team, hr)
+    comment = TicketComment.objects.create(ticket=ticket, author=user, content="@otheruser @recruiters @testuser @ghost")
+
+    with django_assert_max_num_queries(8):
+        mentioned = handle_comment_mentions(comment)
+    assert len(mentioned) == 6  # the author is never notified about their own comment
+    assert TicketActivity.objects.filter(ticket=ticket, action="mentioned").count() == 6
+    assert NotificationOutbox.objects.filter(event="mentioned").count() == 6
+
+
+def test_comment_mentions_skip_users_who_cannot_read_the_comment(ticket, user, user2):
+    team, hr = Group.objects.create(name="everyone"), Group.objects.create(name="HR")
+    staff = get_user_model().objects.create_user("staff", "staff@test.com", "pw")
+    staff.groups.add(team, hr)
+    user.groups.add(team)
+    user2.groups.add(team)  # not HR: cannot see the recruitment ticket at all
+    ticket.assigned_to = staff
+    ticket.save()
+
+    public = TicketComment.objects.create(ticket=ticket, author=staff, content="@everyone")
+    assert handle_comment_mentions(public) == [user]
+
+    internal = TicketComment.objects.create(ticket=ticket, author=user2, content="@everyone", is_internal=True)
+    assert handle_comment_mentions(internal) == [staff]  # the requester is not told about internal notes
+    assert NotificationOutbox.objects.filter(event="mentioned").count() == 2
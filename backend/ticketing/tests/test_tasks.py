@@ -1,3 +1,97 @@
+from datetime import timedelta
+
+from django.utils import timezone
+
+from ticketing.models import Ticket, SLARecord, TicketActivity, NotificationOutbox
+from ticketing import services
+from ticketing.tasks import check_sla_breaches, dispatch_notifications, fire_sla_timer
+
+
 def test_sla_task(db, ticket):
+    ticket.sla_deadline = timezone.now() - timedelta(hours=1)
+    ticket.save()
     result = check_sla_breaches()
     assert SLARecord.objects.filter(ticket=ticket, breached=True).exists()
+
+
+def test_sla_sweep_is_set_based_and_idempotent(db, user, category, stage, django_assert_max_num_queries, mailoutbox):
+    past = timezone.now() - timedelta(hours=1)
+    for i in range(25):
+        Ticket.objects.create(title=f"T{i}", category=category, current_stage=stage,
+                              raised_by=user, assigned_to=user, sla_deadline=past)
+    Ticket.objects.create(title="closed", category=category, raised_by=user, sla_deadline=past, status='closed')
+
+    # 3 batches of 10: query count depends on batches, not tickets
+    with django_assert_max_num_queries(30):
+        assert check_sla_breaches(batch_size=10) == 25
+
+    assert SLARecord.objects.filter(breached=True).count() == 25
+    assert TicketActivity.objects.filter(action='sla_breached').count() == 25
+    # escalations go through the outbox and reach the one assignee as a single email
+    assert NotificationOutbox.objects.filter(event='sla_breached').count() == 25
+    assert dispatch_notifications() == 1
+    assert len(mailoutbox) == 1
+    assert check_sla_breaches(batch_size=10) == 0
+
+
+def test_sla_timer_fires_only_for_current_deadline(db, ticket):
+    deadline = timezone.now() - timedelta(minutes=1)
+    ticket.sla_deadline = deadline
+    ticket.save()
+
+    assert fire_sla_timer(str(ticket.id), (deadline - timedelta(hours=1)).isoformat()) is False
+    assert fire_sla_timer(str(ticket.id), deadline.isoformat()) is True
+    assert SLARecord.objects.filter(ticket=ticket, breached=True).count() == 1
+    assert fire_sla_timer(str(ticket.id), deadline.isoformat()) is False
+
+
+def test_deadline_changes_replace_and_cancel_timers(db, ticket, monkeypatch, django_capture_on_commit_callbacks):
+    scheduled, cancelled = [], []
+    monkeypatch.setattr(services, 'schedule_sla_timer', lambda t: scheduled.append(t.sla_deadline))
+    monkeypatch.setattr(services, 'cancel_sla_timer', lambda tid, deadline: cancelled.append(deadline))
+    first = timezone.now() + timedelta(hours=4)
+    second = first + timedelta(hours=4)
+
+    with django_capture_on_commit_callbacks(execute=True):
+        ticket.sla_deadline = first
+        ticket.save()
+    with django_capture_on_commit_callbacks(execute=True):
+        ticket.sla_deadline = second
+        ticket.save()
+    with django_capture_on_commit_callbacks(execute=True):
+        ticket.status = 'closed'
+        ticket.save()
+
+    assert scheduled == [first, second]
+    assert cancelled == [first, second]
+
+
+def test_deferred_sla_fields_do_not_rearm_timers(db, ticket, monkeypatch, django_capture_on_commit_callbacks):
+    scheduled = []
+    monkeypatch.setattr(services, 'schedule_sla_timer', lambda t: scheduled.append(t.sla_deadline))
+    ticket.sla_deadline = timezone.now() + timedelta(hours=4)
+    ticket.save()
+
+    with django_capture_on_commit_callbacks(execute=True):
+        partial = Ticket.objects.only('id', 'title').get(pk=ticket.pk)
+        partial.title = "Renamed"
+        partial.save()
+    assert scheduled == []
+
+    with django_capture_on_commit_callbacks(execute=True):
+        partial = Ticket.objects.only('id').get(pk=ticket.pk)
+        partial.status = 'closed'
+        partial.save()
+    assert TicketActivity.objects.filter(ticket=ticket, action='status_changed').count() == 1
+
+
+def test_restore_command_rearms_each_pending_timer_once(db, ticket, monkeypatch):
+    from django.core.management import call_command
+
+    scheduled = []
+    monkeypatch.setattr(services, 'schedule_sla_timer', lambda t: scheduled.append(t.pk))
+    ticket.sla_deadline = timezone.now() + timedelta(hours=4)
+    ticket.save()
+
+    call_command('restore_sla_timers')
+    assert scheduled == [ticket.pk]
@@ -0,0 +1,39 @@
+from datetime import timedelta
+
+from django.utils import timezone
+
+from ticketing.models import TicketActivity, TicketAssignment, TicketComment
+
+
+def test_timeline_merges_sources_with_keyset_pages(api_client, django_assert_num_queries, ticket, user, user2):
+    base = timezone.now() - timedelta(days=1)
+    for i in range(3):
+        TicketComment.objects.create(ticket=ticket, author=user, content=f"c{i}",
+                                     created_at=base + timedelta(minutes=3 * i))
+        TicketActivity.objects.create(ticket=ticket, actor=user, action=f"a{i}", meta={"n": i},
+                                      created_at=base + timedelta(minutes=3 * i + 1))
+    TicketAssignment.objects.create(ticket=ticket, from_user=user, to_user=user2, performed_by=user,
+                                    reason="cover", created_at=base + timedelta(minutes=2))
+    TicketComment.objects.create(ticket=ticket, author=user, content="hidden", is_internal=True,
+                                 created_at=base + timedelta(minutes=20))
+
+    api_client.force_authenticate(user)
+    resp = api_client.get(f'/api/tickets/{ticket.id}/timeline/?order=asc&page_size=4')
+    page = resp.data["results"]
+    assert [(e["kind"], e["body"] or e["action"]) for e in page] == [
+        ("comment", "c0"), ("activity", "a0"), ("assignment", "cover"), ("comment", "c1"),
+    ]
+    assert page[2]["meta"]["to_role"] is None
+    assert page[0]["actor"]["username"] == "testuser"
+
+    with django_assert_num_queries(2):  # ticket lookup + one UNION
+        rest = api_client.get(resp.data["next"]).data
+    assert [e["body"] or e["action"] for e in rest["results"]] == ["a1", "c2", "a2", "hidden"]
+    assert rest["next"] is None
+
+    # the raiser sees no internal comments once someone else is assigned
+    ticket.assigned_to = user2
+    ticket.save()
+    newest = api_client.get(f'/api/tickets/{ticket.id}/timeline/?page_size=1').data["results"]
+    assert newest[0]["action"] == "a2"
+    assert api_client.get(f'/api/tickets/{ticket.id}/timeline/?cursor=bogus').status_code == 400
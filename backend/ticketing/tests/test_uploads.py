@@ -0,0 +1,109 @@
+import hashlib
+from datetime import timedelta
+
+import pytest
+from django.utils import timezone
+
+from ticketing.models import AttachmentChunk, AttachmentUpload, TicketAttachment
+
+CONTENT = b"%PDF-1.7 radiology report, page one of many"
+
+
+@pytest.fixture(autouse=True)
+def media(settings, tmp_path):
+    settings.MEDIA_ROOT = tmp_path
+    settings.ATTACHMENT_CHUNK_MAX_BYTES = 16
+
+
+@pytest.fixture(autouse=True)
+def inline_assembly(monkeypatch):
+    from ticketing.tasks import assemble_upload
+    monkeypatch.setattr(assemble_upload, "apply_async", lambda args, **options: assemble_upload.apply(args))
+
+
+def start(api_client, ticket, content=CONTENT, digest=None):
+    api_client.force_authenticate(ticket.raised_by)
+    resp = api_client.post(f'/api/tickets/{ticket.id}/uploads/', {
+        "filename": "scan.pdf", "size": len(content),
+        "sha256": digest or hashlib.sha256(content).hexdigest(),
+    })
+    assert resp.status_code == 201
+    return resp.data["id"]
+
+
+def send(api_client, upload_id, offset, data):
+    return api_client.patch(f'/api/ticket-uploads/{upload_id}/', data,
+                            content_type='application/offset+octet-stream', HTTP_UPLOAD_OFFSET=str(offset))
+
+
+def test_chunked_upload_resumes_and_assembles(api_client, ticket, django_capture_on_commit_callbacks):
+    upload_id = start(api_client, ticket)
+    assert send(api_client, upload_id, 0, CONTENT[:16]).data["received"] == 16
+
+    # a retried or skipped chunk is rejected with the offset to resume from
+    resp = send(api_client, upload_id, 0, CONTENT[:16])
+    assert (resp.status_code, resp.data["received"]) == (409, 16)
+    assert api_client.get(f'/api/ticket-uploads/{upload_id}/').data["received"] == 16
+
+    send(api_client, upload_id, 16, CONTENT[16:32])
+    with django_capture_on_commit_callbacks(execute=True):
+        resp = send(api_client, upload_id, 32, CONTENT[32:])
+    assert resp.data["status"] == "assembling"  # built by a task, off the request
+    assert api_client.get(f'/api/ticket-uploads/{upload_id}/').data["status"] == "complete"
+
+    attachment = TicketAttachment.objects.get(ticket=ticket)
+    assert (attachment.size, attachment.content_type) == (len(CONTENT), "application/pdf")
+    with attachment.file.open('rb') as f:
+        assert f.read() == CONTENT
+    assert not AttachmentChunk.objects.exists()
+
+
+def test_hash_mismatch_fails_the_upload(api_client, ticket, django_capture_on_commit_callbacks):
+    upload_id = start(api_client, ticket, content=b"short", digest="0" * 64)
+    with django_capture_on_commit_callbacks(execute=True):
+        send(api_client, upload_id, 0, b"short")
+    resp = api_client.get(f'/api/ticket-uploads/{upload_id}/')
+    assert (resp.data["status"], resp.data["error"]) == ("failed", "SHA-256 mismatch")
+    assert not TicketAttachment.objects.exists()
+
+
+def test_assembly_error_fails_the_upload_instead_of_wedging_it(api_client, ticket, monkeypatch,
+                                                               django_capture_on_commit_callbacks):
+    def broken(self, buffer):
+        raise OSError("storage unavailable")
+
+    monkeypatch.setattr("ticketing.uploads.ChunkReader.readinto", broken)
+    upload_id = start(api_client, ticket, content=b"short")
+    with django_capture_on_commit_callbacks(execute=True):
+        send(api_client, upload_id, 0, b"short")
+
+    upload = AttachmentUpload.objects.get(pk=upload_id)
+    assert upload.status == "failed" and upload.error
+    assert not AttachmentChunk.objects.exists() and not TicketAttachment.objects.exists()
+    # the client is told to start over rather than being stuck on offset errors
+    assert send(api_client, upload_id, 0, b"short").data["detail"] == "Upload is failed"
+
+
+def test_oversized_chunk_and_other_users_are_rejected(api_client, ticket, user2):
+    upload_id = start(api_client, ticket)
+    assert send(api_client, upload_id, 0, CONTENT[:17]).status_code == 400
+    api_client.force_authenticate(user2)
+    assert send(api_client, upload_id, 0, CONTENT[:16]).status_code == 404
+
+
+def test_abandoned_uploads_are_purged_on_the_beat_schedule(api_client, ticket, settings):
+    from backend.celery import app
+    from ticketing.tasks import purge_stale_uploads
+
+    upload_id = start(api_client, ticket)
+    send(api_client, upload_id, 0, CONTENT[:16])
+    AttachmentUpload.objects.filter(pk=upload_id).update(
+        updated_at=timezone.now() - timedelta(hours=settings.ATTACHMENT_UPLOAD_MAX_AGE_HOURS + 1),
+    )
+    assert purge_stale_uploads() == 1
+    assert not AttachmentUpload.objects.exists() and not AttachmentChunk.objects.exists()
+
+    app.loader.import_default_modules()
+    entry = settings.CELERY_BEAT_SCHEDULE["purge-stale-uploads"]
+    assert entry["task"] in app.tasks
+    assert entry["schedule"] == timedelta(hours=settings.ATTACHMENT_PURGE_INTERVAL_HOURS)
@@ -1,3 +1,8 @@
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import Group
+
+from ticketing.models import TicketCategory
+
 def test_ticket_create_api(api_client, user, category, stage):
     api_client.force_authenticate(user=user)
     resp = api_client.post('/api/tickets/', {
@@ -6,3 +11,68 @@ def test_ticket_create_api(api_client, user, category, stage):
         "current_stage": str(stage.id),
     })
     assert resp.status_code == 201
+
+
+def test_ticket_list_shows_only_visible_tickets(api_client, django_assert_num_queries, ticket, user, user2, category):
+    from ticketing.models import Ticket, TicketComment
+    from django.contrib.auth.models import Group
+
+    TicketComment.objects.create(ticket=ticket, author=user, content="first")
+    TicketComment.objects.create(ticket=ticket, author=user, content="second")
+    other = TicketCategory.objects.create(name="IT", key="IT")
+    Ticket.objects.create(title="Laptop", ticket_number="TCK-2", category=other, raised_by=user2)
+
+    api_client.force_authenticate(user)
+    with django_assert_num_queries(1):
+        resp = api_client.get('/api/tickets/')
+    assert resp.status_code == 200
+    assert [t["ticket_number"] for t in resp.data["results"]] == ["TCK-123456"]
+    assert resp.data["results"][0]["comment_count"] == 2
+    assert resp.data["results"][0]["attachment_count"] == 0
+
+    # HR sees recruitment tickets in addition to their own
+    user2.groups.add(Group.objects.create(name="HR"))
+    api_client.force_authenticate(user2)
+    resp = api_client.get('/api/tickets/?page_size=1')
+    assert [t["ticket_number"] for t in resp.data["results"]] == ["TCK-2"]
+    resp = api_client.get(resp.data["next"])
+    assert [t["ticket_number"] for t in resp.data["results"]] == ["TCK-123456"]
+
+
+def test_comments_follow_ticket_visibility(api_client, ticket, user, user2):
+    from ticketing.models import TicketComment
+
+    ticket.assigned_to = user2
+    ticket.save()
+    TicketComment.objects.create(ticket=ticket, author=user2, content="internal note", is_internal=True)
+    TicketComment.objects.create(ticket=ticket, author=user2, content="public reply")
+    outsider = get_user_model().objects.create_user("outsider", "out@test.com", "password")
+
+    # the requester does not see internal notes, and cannot write one
+    api_client.force_authenticate(user)
+    resp = api_client.get('/api/ticket-comments/')
+    assert [c["content"] for c in resp.data] == ["public reply"]
+    resp = api_client.post('/api/ticket-comments/', {"ticket": str(ticket.pk), "content": "x", "is_internal": True})
+    assert resp.status_code == 403
+
+    # the assignee sees both
+    api_client.force_authenticate(user2)
+    assert len(api_client.get('/api/ticket-comments/').data) == 2
+
+    # anyone else sees nothing and cannot comment
+    api_client.force_authenticate(outsider)
+    assert api_client.get('/api/ticket-comments/').data == []
+    resp = api_client.post('/api/ticket-comments/', {"ticket": str(ticket.pk), "content": "hi"})
+    assert resp.status_code == 403
+    assert not TicketComment.objects.filter(author=outsider).exists()
+
+
+def test_only_admin_and_hr_change_workflow_configuration(api_client, user, category):
+    api_client.force_authenticate(user)
+    assert api_client.get('/api/ticket-categories/').status_code == 200
+    assert api_client.post('/api/ticket-categories/', {"name": "IT", "key": "IT"}).status_code == 403
+    assert api_client.delete(f'/api/ticket-categories/{category.pk}/').status_code == 403
+
+    user.groups.add(Group.objects.create(name="HR"))
+    api_client.force_authenticate(get_user_model().objects.get(pk=user.pk))
+    assert api_client.post('/api/ticket-categories/', {"name": "IT", "key": "IT"}).status_code == 201
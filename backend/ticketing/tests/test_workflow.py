@@ -1,6 +1,49 @@
+from ticketing.models import Ticket, WorkflowStage, WorkflowTransition
+from ticketing.services import validate_transition
+from ticketing.workflow import compile_condition, workflow_for
+
+
 def test_valid_transition(api_client, ticket, stage2):
     api_client.force_authenticate(ticket.assigned_to)
     resp = api_client.post(f'/api/tickets/{ticket.id}/transition/', {
         "to_stage_id": str(stage2.id)
     })
     assert resp.status_code == 200
+
+
+def test_configured_transitions_and_conditions(ticket, category, stage, stage2):
+    stage3 = WorkflowStage.objects.create(category=category, name="Offer", key="OFFER", position=3)
+    WorkflowTransition.objects.create(category=category, from_stage=stage, to_stage=stage2)
+    WorkflowTransition.objects.create(category=category, from_stage=stage, to_stage=stage3,
+                                      condition={"priority__gte": 3})
+    ticket = Ticket.objects.select_related('category').get(pk=ticket.pk)
+
+    assert validate_transition(ticket, stage2)
+    assert not validate_transition(ticket, stage3)
+    ticket.priority = 4
+    assert [s.key for s in workflow_for(ticket.category).next_stages(ticket)] == ["INTERVIEW", "OFFER"]
+
+
+def test_graph_is_cached_until_the_workflow_changes(django_assert_num_queries, ticket, category, stage, stage2):
+    ticket = Ticket.objects.select_related('category').get(pk=ticket.pk)
+    workflow_for(ticket.category)
+    with django_assert_num_queries(0):
+        assert validate_transition(ticket, stage2)
+
+    WorkflowTransition.objects.create(category=category, from_stage=stage2, to_stage=stage)
+    ticket = Ticket.objects.select_related('category').get(pk=ticket.pk)
+    assert not validate_transition(ticket, stage2)
+
+
+def test_compile_condition():
+    ticket = Ticket(priority=3, department="ICU", is_internal=False)
+    assert compile_condition({"any": [{"department": "ER"}, {"department__in": ["ICU"]}]})(ticket)
+    assert not compile_condition({"not": {"priority__lt": 4}, "is_internal": False})(ticket)
+    assert compile_condition({"assigned_to__isnull": True})(ticket)
+
+
+def test_next_stages_endpoint(api_client, ticket, stage2):
+    api_client.force_authenticate(ticket.assigned_to)
+    resp = api_client.get(f'/api/tickets/{ticket.id}/next-stages/')
+    assert resp.status_code == 200
+    assert [s["key"] for s in resp.data] == ["INTERVIEW"]
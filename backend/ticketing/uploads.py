@@ -0,0 +1,225 @@
+"""
+Chunked, resumable attachment uploads.
+
+1. start_upload() records the file's name, size and SHA-256.
+2. The client sends the bytes in order as raw chunks, each tagged with the
+   offset it starts at. append_chunk() streams every chunk straight into
+   storage as its own object; the upload's `received` counter is the offset
+   to resume from after a dropped connection.
+3. When the last byte arrives the upload moves to `assembling` and the
+   assemble_upload task streams the chunks in order into the final
+   TicketAttachment file while hashing them, checks the hash and fills
+   size/content_type, then removes the chunk objects. Assembly runs off the
+   request: a 2 GB copy would otherwise hold the final PATCH open. If it
+   fails, the upload is marked `failed` with an `error` and the client
+   starts a new one.
+
+Memory per upload is bounded by the copy buffer, whatever the file size.
+"""
+import hashlib
+import io
+import logging
+import mimetypes
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import AttachmentChunk, AttachmentUpload, TicketActivity, TicketAttachment
+
+logger = logging.getLogger(__name__)
+
+COPY_BUFFER = 64 * 1024
+
+# leading bytes of the formats wards actually upload
+SIGNATURES = (
+    (b'%PDF-', 'application/pdf'),
+    (b'\x89PNG\r\n\x1a\n', 'image/png'),
+    (b'\xff\xd8\xff', 'image/jpeg'),
+    (b'II*\x00', 'image/tiff'),
+    (b'MM\x00*', 'image/tiff'),
+)
+
+
+class UploadError(Exception):
+    pass
+
+
+class OffsetMismatch(UploadError):
+    def __init__(self, expected):
+        super().__init__(f'Expected offset {expected}')
+        self.expected = expected
+
+
+def start_upload(ticket, user, filename, size, sha256, content_type=None):
+    if size <= 0 or size > settings.ATTACHMENT_MAX_BYTES:
+        raise UploadError(f'size must be between 1 and {settings.ATTACHMENT_MAX_BYTES} bytes')
+    sha256 = (sha256 or '').lower()
+    if len(sha256) != 64 or any(c not in '0123456789abcdef' for c in sha256):
+        raise UploadError('sha256 must be a hex digest')
+    return AttachmentUpload.objects.create(
+        ticket=ticket, uploaded_by=user, filename=filename[:255],
+        size=size, sha256=sha256, content_type=content_type or None,
+    )
+
+
+def chunk_name(upload, offset):
+    return f'ticket_uploads/{upload.id}/{offset:012d}'
+
+
+def append_chunk(upload, offset, stream, length):
+    """
+    Store `length` bytes read from `stream` as the chunk starting at
+    `offset`. Returns the upload; after the last chunk it is `assembling`
+    and a task builds the attachment.
+    """
+    if upload.status != 'uploading':
+        raise UploadError(f'Upload is {upload.status}')
+    if offset != upload.received:
+        raise OffsetMismatch(upload.received)
+    if length <= 0 or length > settings.ATTACHMENT_CHUNK_MAX_BYTES:
+        raise UploadError(f'Chunks must be between 1 and {settings.ATTACHMENT_CHUNK_MAX_BYTES} bytes')
+    if offset + length > upload.size:
+        raise UploadError('Chunk runs past the declared size')
+
+    chunk = File(stream, name='chunk')
+    chunk.size = length
+    name = default_storage.save(chunk_name(upload, offset), chunk)
+    try:
+        if default_storage.size(name) != length:
+            raise UploadError('Chunk was truncated')
+        last = offset + length == upload.size
+        with transaction.atomic():
+            # a concurrent retry of the same chunk loses here instead of double-counting
+            claimed = AttachmentUpload.objects.filter(
+                pk=upload.pk, status='uploading', received=offset,
+            ).update(
+                received=F('received') + length, updated_at=timezone.now(),
+                status='assembling' if last else 'uploading',
+            )
+            if not claimed:
+                upload.refresh_from_db(fields=['received'])
+                raise OffsetMismatch(upload.received)
+            AttachmentChunk.objects.create(upload=upload, offset=offset, size=length, name=name)
+            if last:
+                transaction.on_commit(lambda: queue_assembly(upload))
+    except Exception:
+        default_storage.delete(name)
+        raise
+
+    upload.received = offset + length
+    if last and upload.status == 'uploading':  # unless queueing it already failed
+        upload.status = 'assembling'
+    return upload
+
+
+def queue_assembly(upload):
+    from .tasks import assemble_upload
+    try:
+        assemble_upload.apply_async((str(upload.pk),), retry=False)
+    except Exception:
+        logger.exception('Could not queue assembly of upload %s', upload.pk)
+        fail(upload, 'Could not start assembling the file; upload it again')
+
+
+class ChunkReader(io.RawIOBase):
+    """Reads an upload's chunk objects back to back, hashing as it goes."""
+
+    def __init__(self, names):
+        self.names = iter(names)
+        self.current = None
+        self.digest = hashlib.sha256()
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        while True:
+            if self.current is None:
+                name = next(self.names, None)
+                if name is None:
+                    return 0
+                self.current = default_storage.open(name, 'rb')
+            data = self.current.read(len(buffer))
+            if data:
+                self.digest.update(data)
+                buffer[:len(data)] = data
+                return len(data)
+            self.current.close()
+            self.current = None
+
+    def close(self):
+        if self.current is not None:
+            self.current.close()
+        super().close()
+
+
+def sniff_content_type(upload, head):
+    for signature, content_type in SIGNATURES:
+        if head.startswith(signature):
+            return content_type
+    if head[128:132] == b'DICM':
+        return 'application/dicom'
+    return upload.content_type or mimetypes.guess_type(upload.filename)[0] or 'application/octet-stream'
+
+
+def fail(upload, error):
+    upload.status, upload.error = 'failed', error
+    upload.save(update_fields=['status', 'error', 'updated_at'])
+    discard_chunks(upload)
+    return upload
+
+
+def assemble(upload):
+    """Build the attachment from an `assembling` upload; any error fails the upload."""
+    try:
+        return build_attachment(upload)
+    except Exception:
+        logger.exception('Could not assemble upload %s', upload.pk)
+        return fail(upload, 'Could not assemble the file; upload it again')
+
+
+def build_attachment(upload):
+    chunks = list(upload.chunks.order_by('offset').values_list('name', flat=True))
+    with default_storage.open(chunks[0], 'rb') as first:
+        head = first.read(132)
+
+    reader = ChunkReader(chunks)
+    content = File(io.BufferedReader(reader, buffer_size=COPY_BUFFER), name=upload.filename)
+    content.size = upload.size
+    attachment = TicketAttachment(
+        ticket=upload.ticket, uploaded_by=upload.uploaded_by, filename=upload.filename,
+        content_type=sniff_content_type(upload, head), size=upload.size,
+    )
+    try:
+        attachment.file.save(upload.filename, content, save=False)
+    finally:
+        reader.close()
+
+    if reader.digest.hexdigest() != upload.sha256:
+        attachment.file.delete(save=False)
+        return fail(upload, 'SHA-256 mismatch')
+    try:
+        with transaction.atomic():
+            attachment.save()
+            upload.status, upload.attachment = 'complete', attachment
+            upload.save(update_fields=['status', 'attachment', 'updated_at'])
+            TicketActivity.objects.create(ticket=upload.ticket, actor=upload.uploaded_by, action='attachment_added',
+                                          meta={'attachment': str(attachment.id), 'filename': attachment.filename})
+    except Exception:
+        attachment.file.delete(save=False)
+        raise
+    discard_chunks(upload)
+    return upload
+
+
+def discard_chunks(upload):
+    for name in upload.chunks.values_list('name', flat=True):
+        try:
+            default_storage.delete(name)
+        except Exception:
+            logger.warning('Could not delete upload chunk %s', name)
+    upload.chunks.all().delete()
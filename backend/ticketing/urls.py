@@ -0,0 +1,28 @@
+# backend/ticketing/urls.py
+
+from django.urls import path
+from rest_framework.routers import DefaultRouter
+from .views import (
+    AttachmentUploadViewSet,
+    NotificationPreferenceView,
+    TicketAnalyticsView,
+    TicketViewSet,
+    TicketCommentViewSet,
+    TicketCategoryViewSet,
+    WorkflowStageViewSet,
+)
+
+app_name = "ticketing"
+
+router = DefaultRouter()
+
+router.register(r'tickets', TicketViewSet, basename='tickets')
+router.register(r'ticket-comments', TicketCommentViewSet, basename='ticket-comments')
+router.register(r'ticket-categories', TicketCategoryViewSet, basename='ticket-categories')
+router.register(r'workflow-stages', WorkflowStageViewSet, basename='workflow-stages')
+router.register(r'ticket-uploads', AttachmentUploadViewSet, basename='ticket-uploads')
+
+urlpatterns = router.urls + [
+    path('notification-preferences/me/', NotificationPreferenceView.as_view(), name='notification-preference'),
+    path('ticket-analytics/', TicketAnalyticsView.as_view(), name='ticket-analytics'),
+]
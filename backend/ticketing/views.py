@@ -1,17 +1,50 @@
 from rest_framework import viewsets, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import PermissionDenied
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.permissions import IsAuthenticated
+from rest_framework.pagination import CursorPagination
+from django.db import transaction
+from django.http import Http404
+from django.shortcuts import get_object_or_404
+from django.db.models import Count, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
 
-from .models import Ticket, TicketComment, TicketCategory, WorkflowStage, TicketAssignment, TicketActivity
+from .models import (
+    Ticket, TicketComment, TicketAttachment, TicketCategory, WorkflowStage, TicketAssignment, TicketActivity,
+    NotificationPreference, AttachmentUpload, ArchivedTicket, ArchivedTicketAttachment, ArchivedTicketComment,
+)
 from .serializers import (
     TicketSerializer,
     TicketCreateSerializer,
     CommentSerializer,
     TicketCategorySerializer,
-    WorkflowStageSerializer
+    WorkflowStageSerializer,
+    NotificationPreferenceSerializer,
+    AttachmentUploadSerializer,
+    BulkAssignSerializer,
+    BulkCloseSerializer,
+    BulkTransitionSerializer,
+    ArchivedTicketSerializer,
+    BulkIngestSerializer,
+)
+from .permissions import (
+    CanViewTicket, CanTransitionTicket, IsAdmin, IsHR, can_see_internal, can_view_ticket, visible_comments_q,
+    visible_tickets_q,
 )
-from .permissions import CanViewTicket, CanTransitionTicket, IsAdmin
+
+
+def _count_of(model):
+    rows = model.objects.filter(ticket=OuterRef('pk')).order_by().values('ticket').annotate(n=Count('*')).values('n')
+    return Coalesce(Subquery(rows, output_field=IntegerField()), 0)
+
+
+class TicketCursorPagination(CursorPagination):
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 200
+    ordering = ('-created_at', '-id')
 
 
 # -----------------------------
@@ -23,6 +56,19 @@ class TicketViewSet(viewsets.ModelViewSet):
     )
     filterset_fields = ['category', 'status', 'assigned_to', 'priority', 'current_stage']
     search_fields = ['ticket_number', 'title', 'description']
+    pagination_class = TicketCursorPagination
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        if self.action in ['list', 'search']:
+            # one query: visibility filter, counts and keyset page together
+            queryset = queryset.filter(visible_tickets_q(self.request.user))
+        if self.action in ['list', 'retrieve']:
+            queryset = queryset.annotate(
+                comment_count=_count_of(TicketComment),
+                attachment_count=_count_of(TicketAttachment),
+            )
+        return queryset
 
     def get_serializer_class(self):
         if self.action == 'create':
@@ -32,12 +78,15 @@ class TicketViewSet(viewsets.ModelViewSet):
     def get_permissions(self):
         if self.action in ['create', 'list']:
             return [IsAuthenticated()]
-        if self.action == 'retrieve':
+        if self.action in ['retrieve', 'next_stages', 'uploads', 'timeline']:
             return [CanViewTicket()]
-        if self.action == 'transition':
+        if self.action in ['transition', 'assign']:
+            # the same rule bulk transition/assign apply per ticket
             return [CanTransitionTicket()]
         if self.action == 'destroy':
             return [IsAdmin()]
+        if self.action == 'ingest':
+            return [IsAuthenticated(), (IsAdmin | IsHR)()]
         return [IsAuthenticated()]
 
     @action(detail=True, methods=['post'])
@@ -60,6 +109,182 @@ class TicketViewSet(viewsets.ModelViewSet):
         except Exception as e:
             return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
 
+    @action(detail=False, methods=['post'])
+    def ingest(self, request):
+        """
+        {tickets: [{source_system, source_id, title, description?, priority?,
+        category? (key), department?, due_date?, is_internal?}, ...]}
+        Upserts on (source_system, source_id): resending a batch is safe.
+        """
+        from .bulk import BulkValidationError, ingest_tickets
+        serializer = BulkIngestSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        try:
+            results = ingest_tickets(serializer.validated_data['tickets'], actor=request.user)
+        except BulkValidationError as e:
+            return Response({'detail': str(e), 'errors': e.errors}, status=status.HTTP_400_BAD_REQUEST)
+
+        counts = {'created': 0, 'updated': 0, 'unchanged': 0, 'archived': 0}
+        for _, result, _ in results:
+            counts[result] += 1
+        return Response({**counts, 'results': [
+            {'source_system': system, 'source_id': source_id, 'result': result,
+             'id': str(ticket.pk), 'ticket_number': ticket.ticket_number}
+            for (system, source_id), result, ticket in results
+        ]})
+
+    def retrieve(self, request, *args, **kwargs):
+        try:
+            return super().retrieve(request, *args, **kwargs)
+        except Http404:
+            # closed tickets past their retention in the hot tables live in the archive
+            archived = get_object_or_404(self._archived_tickets(), pk=kwargs['pk'])
+            self.check_object_permissions(request, archived)
+            return Response(ArchivedTicketSerializer(archived, context={'request': request}).data)
+
+    def _archived_tickets(self):
+        return ArchivedTicket.objects.select_related('category', 'current_stage').annotate(
+            comment_count=_count_of(ArchivedTicketComment),
+            attachment_count=_count_of(ArchivedTicketAttachment),
+        )
+
+    def _bulk(self, request, serializer_class, operation):
+        from .bulk import BulkValidationError
+        serializer = serializer_class(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = dict(serializer.validated_data)
+        try:
+            changed = operation(data.pop('ticket_ids'), actor=request.user, **data)
+        except BulkValidationError as e:
+            return Response({'detail': str(e), 'errors': e.errors}, status=status.HTTP_400_BAD_REQUEST)
+        return Response({'count': len(changed), 'changed': [str(t.pk) for t in changed]})
+
+    @action(detail=False, methods=['post'], url_path='bulk-transition')
+    def bulk_transition(self, request):
+        """{ticket_ids, to_stage_id, comment?}: move every ticket to the stage, or none of them."""
+        from .bulk import bulk_transition
+        return self._bulk(request, BulkTransitionSerializer, bulk_transition)
+
+    @action(detail=False, methods=['post'], url_path='bulk-assign')
+    def bulk_assign(self, request):
+        """{ticket_ids, to_user, reason?}"""
+        from .bulk import bulk_assign
+        return self._bulk(request, BulkAssignSerializer, bulk_assign)
+
+    @action(detail=False, methods=['post'], url_path='bulk-close')
+    def bulk_close(self, request):
+        """{ticket_ids, status?: closed|resolved}"""
+        from .bulk import bulk_close
+        return self._bulk(request, BulkCloseSerializer, bulk_close)
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        """
+        GET ?q=...&status=&category=&priority=&assigned_to=&current_stage=&page=&page_size=&archived=
+        Ranked full-text search over titles, descriptions and comments,
+        limited to the tickets the user can see. Archived matches follow the
+        live ones unless archived=false.
+        """
+        from django.core.exceptions import ValidationError
+        from .archive import search_archive
+        from .search import count_matches, search_tickets
+
+        params = request.query_params
+        try:
+            page = max(int(params.get('page', 1)), 1)
+            page_size = min(max(int(params.get('page_size', 20)), 1), 100)
+        except ValueError:
+            return Response({'detail': 'page and page_size must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+
+        filters = {f: params[f] for f in self.filterset_fields if params.get(f)}
+        try:
+            tickets = self.get_queryset().filter(**filters)
+            hits = search_tickets(params.get('q'), tickets, limit=page_size + 1, offset=(page - 1) * page_size)
+        except (ValueError, ValidationError):
+            return Response({'detail': 'Invalid filter value'}, status=status.HTTP_400_BAD_REQUEST)
+
+        has_next = len(hits) > page_size
+        hits = hits[:page_size]
+        found = self.queryset.in_bulk([ticket_id for ticket_id, _, _ in hits])
+        results = [
+            {**TicketSerializer(found[ticket_id], context={'request': request}).data, 'rank': rank, 'snippet': snippet}
+            for ticket_id, rank, snippet in hits if ticket_id in found
+        ]
+
+        if not has_next and params.get('archived', 'true') != 'false':
+            # the live matches run out on this page: continue into the archive
+            offset = (page - 1) * page_size
+            live_total = offset + len(hits) if hits or not offset else count_matches(params.get('q'), tickets)
+            archived = search_archive(
+                params.get('q'),
+                self._archived_tickets().filter(visible_tickets_q(request.user), **filters),
+                limit=page_size - len(hits) + 1, offset=max(offset + len(hits) - live_total, 0),
+            )
+            has_next = len(hits) + len(archived) > page_size
+            results += [
+                {**ArchivedTicketSerializer(ticket, context={'request': request}).data, 'rank': 0.0, 'snippet': snippet}
+                for ticket, snippet in archived[:page_size - len(hits)]
+            ]
+        return Response({'q': params.get('q', ''), 'page': page, 'has_next': has_next, 'results': results})
+
+    @action(detail=True, methods=['post'])
+    def uploads(self, request, pk=None):
+        """Start a chunked upload: {filename, size, sha256, content_type?}; send chunks to /ticket-uploads/<id>/."""
+        from .uploads import UploadError, start_upload
+        ticket = self.get_object()
+        serializer = AttachmentUploadSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        data = serializer.validated_data
+        try:
+            upload = start_upload(ticket, request.user, data['filename'], data['size'], data['sha256'],
+                                  data.get('content_type'))
+        except UploadError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(AttachmentUploadSerializer(upload).data, status=status.HTTP_201_CREATED)
+
+    @action(detail=True, methods=['get'])
+    def timeline(self, request, pk=None):
+        """
+        GET ?cursor=&page_size=&order=desc|asc
+        Comments, activity and assignments merged by created_at, keyset-paginated.
+        """
+        from .timeline import InvalidCursor, ticket_timeline
+        ticket = self.get_object()
+        params = request.query_params
+        try:
+            page_size = min(max(int(params.get('page_size', 50)), 1), 200)
+        except ValueError:
+            return Response({'detail': 'page_size must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # internal comments are for staff and the assignee, not the requester
+        include_internal = can_see_internal(request.user, ticket.assigned_to_id)
+        try:
+            entries, next_cursor = ticket_timeline(
+                ticket, limit=page_size, cursor=params.get('cursor'),
+                ascending=params.get('order') == 'asc', include_internal=include_internal,
+            )
+        except InvalidCursor as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        next_url = None
+        if next_cursor:
+            query = params.copy()
+            query['cursor'] = next_cursor
+            next_url = request.build_absolute_uri(f'{request.path}?{query.urlencode()}')
+        return Response({'next': next_url, 'results': entries})
+
+    @action(detail=True, methods=['get'], url_path='next-stages')
+    def next_stages(self, request, pk=None):
+        ticket = self.get_object()
+        if ticket.category is None:
+            return Response([])
+        from .workflow import workflow_for
+        stages = workflow_for(ticket.category).next_stages(ticket)
+        return Response([
+            {'id': str(s.id), 'key': s.key, 'name': s.name, 'position': s.position, 'sla_hours': s.sla_hours}
+            for s in stages
+        ])
+
     @action(detail=True, methods=['post'])
     def assign(self, request, pk=None):
         ticket = self.get_object()
@@ -74,48 +299,124 @@ class TicketViewSet(viewsets.ModelViewSet):
         except User.DoesNotExist:
             return Response({'detail': 'User not found'}, status=status.HTTP_400_BAD_REQUEST)
 
-        # create assignment record
-        TicketAssignment.objects.create(
-            ticket=ticket,
-            from_user=ticket.assigned_to,
-            to_user=to_user,
-            performed_by=request.user,
-            reason=reason,
-        )
+        with transaction.atomic():
+            # create assignment record
+            TicketAssignment.objects.create(
+                ticket=ticket,
+                from_user=ticket.assigned_to,
+                to_user=to_user,
+                performed_by=request.user,
+                reason=reason,
+            )
 
-        ticket.assigned_to = to_user
-        ticket.save(update_fields=['assigned_to'])
+            ticket.assigned_to = to_user
+            ticket.save(update_fields=['assigned_to'])
 
-        # activity log
-        TicketActivity.objects.create(
-            ticket=ticket,
-            actor=request.user,
-            action='assigned',
-            meta={'to': str(to_user.id)}
-        )
+            # activity log
+            TicketActivity.objects.create(
+                ticket=ticket,
+                actor=request.user,
+                action='assigned',
+                meta={'to': str(to_user.id)}
+            )
 
-        # notifications
-        from .notifications import notify_assignment
-        notify_assignment(ticket, request.user, to_user)
+            # notifications (outbox rows, committed with the assignment)
+            from .notifications import notify_assignment
+            notify_assignment(ticket, request.user, to_user)
+
+            from .realtime import publish, ticket_event
+            publish([ticket_event(ticket, 'assigned', request.user, assigned_to=to_user.pk)])
 
         return Response(TicketSerializer(ticket, context={'request': request}).data)
 
 
+# -----------------------------
+# Chunked attachment uploads
+# -----------------------------
+class AttachmentUploadViewSet(viewsets.GenericViewSet):
+    """
+    GET   /ticket-uploads/<id>/  -> progress; `received` is the offset to resume from
+    PATCH /ticket-uploads/<id>/  -> raw chunk bytes with an `Upload-Offset` header
+
+    After the last chunk the upload is `assembling`; poll until it is
+    `complete` or `failed` (with `error`).
+    """
+    serializer_class = AttachmentUploadSerializer
+
+    def get_queryset(self):
+        return AttachmentUpload.objects.filter(uploaded_by=self.request.user).select_related('ticket')
+
+    def retrieve(self, request, pk=None):
+        return Response(self.get_serializer(self.get_object()).data)
+
+    def partial_update(self, request, pk=None):
+        from .uploads import OffsetMismatch, UploadError, append_chunk
+        upload = self.get_object()
+        try:
+            offset = int(request.headers.get('Upload-Offset', ''))
+            length = int(request.META.get('CONTENT_LENGTH') or 0)
+        except ValueError:
+            return Response({'detail': 'Upload-Offset and Content-Length are required'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            # read the raw body stream; request.data would buffer the chunk in memory
+            upload = append_chunk(upload, offset, request.stream, length)
+        except OffsetMismatch as e:
+            return Response({'detail': str(e), 'received': e.expected}, status=status.HTTP_409_CONFLICT)
+        except UploadError as e:
+            return Response({'detail': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(self.get_serializer(upload).data)
+
+
 # -----------------------------
 # Comment ViewSet
 # -----------------------------
 class TicketCommentViewSet(viewsets.ModelViewSet):
-    queryset = TicketComment.objects.all()
+    """Comments on the tickets the user can see; internal ones only for staff and the assignee."""
     serializer_class = CommentSerializer
 
+    def get_queryset(self):
+        return TicketComment.objects.filter(visible_comments_q(self.request.user)).select_related('author')
+
+    def _check_ticket(self, serializer):
+        ticket = serializer.validated_data.get('ticket') or serializer.instance.ticket
+        user = self.request.user
+        if not can_view_ticket(user, ticket.raised_by_id, ticket.assigned_to_id,
+                               ticket.category.key if ticket.category_id else None):
+            raise PermissionDenied('You cannot comment on this ticket')
+        is_internal = serializer.validated_data.get('is_internal', getattr(serializer.instance, 'is_internal', False))
+        if is_internal and not can_see_internal(user, ticket.assigned_to_id):
+            raise PermissionDenied('Only staff and the assignee can post internal comments')
+
     def perform_create(self, serializer):
+        self._check_ticket(serializer)
         serializer.save(author=self.request.user)
 
+    def perform_update(self, serializer):
+        if serializer.instance.author_id != self.request.user.pk and not self.request.user.is_superuser:
+            raise PermissionDenied('You can only edit your own comments')
+        self._check_ticket(serializer)
+        serializer.save()
+
+    def perform_destroy(self, instance):
+        if instance.author_id != self.request.user.pk and not self.request.user.is_superuser:
+            raise PermissionDenied('You can only delete your own comments')
+        instance.delete()
+
+
+class _ConfigurationPermissions:
+    """Anyone signed in may read workflow configuration; only Admin and HR change it."""
+
+    def get_permissions(self):
+        if self.action in ['list', 'retrieve']:
+            return [IsAuthenticated()]
+        return [IsAuthenticated(), (IsAdmin | IsHR)()]
+
 
 # -----------------------------
 # Category ViewSet
 # -----------------------------
-class TicketCategoryViewSet(viewsets.ModelViewSet):
+class TicketCategoryViewSet(_ConfigurationPermissions, viewsets.ModelViewSet):
     queryset = TicketCategory.objects.all()
     serializer_class = TicketCategorySerializer
 
@@ -123,6 +424,48 @@ class TicketCategoryViewSet(viewsets.ModelViewSet):
 # -----------------------------
 # Workflow Stage ViewSet
 # -----------------------------
-class WorkflowStageViewSet(viewsets.ModelViewSet):
+class WorkflowStageViewSet(_ConfigurationPermissions, viewsets.ModelViewSet):
     queryset = WorkflowStage.objects.all()
     serializer_class = WorkflowStageSerializer
+
+
+# -----------------------------
+# Notification preference
+# -----------------------------
+class NotificationPreferenceView(APIView):
+    """GET/PUT the current user's ticket notification delivery: immediate or a periodic digest."""
+
+    def get(self, request):
+        preference = NotificationPreference.objects.filter(user=request.user).first() or NotificationPreference(user=request.user)
+        return Response(NotificationPreferenceSerializer(preference).data)
+
+    def put(self, request):
+        preference, _ = NotificationPreference.objects.get_or_create(user=request.user)
+        serializer = NotificationPreferenceSerializer(preference, data=request.data, partial=True)
+        serializer.is_valid(raise_exception=True)
+        serializer.save()
+        return Response(serializer.data)
+
+
+class TicketAnalyticsView(APIView):
+    """
+    GET ?start=YYYY-MM-DD&end=YYYY-MM-DD[&category=<id>]: MTTR, SLA
+    compliance and average stage dwell, read from the daily aggregates.
+    Defaults to the last 30 days.
+    """
+    permission_classes = [IsAuthenticated, IsAdmin | IsHR]
+
+    def get(self, request):
+        from datetime import timedelta
+        from django.utils import timezone
+        from django.utils.dateparse import parse_date
+        from .analytics import ticket_report
+
+        try:
+            end = parse_date(request.query_params.get('end', '')) or timezone.localdate()
+            start = parse_date(request.query_params.get('start', '')) or end - timedelta(days=29)
+        except ValueError:
+            return Response({'detail': 'Dates must be YYYY-MM-DD'}, status=status.HTTP_400_BAD_REQUEST)
+        if start > end:
+            return Response({'detail': 'start must not be after end'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(ticket_report(start, end, request.query_params.get('category')))
@@ -0,0 +1,151 @@
+"""
+Compiled workflow graphs.
+
+Each TicketCategory's stages and transitions are compiled once into an
+adjacency map with WorkflowTransition.condition turned into Python
+predicates. Graphs are cached per process under (category id,
+workflow_version); the version lives on the category row, which the ticket
+views already select_related, so checking a transition or listing the next
+stages needs no queries. Any stage/transition save bumps the version.
+
+Condition format (JSON), evaluated against the ticket:
+    {"priority__gte": 3, "department__in": ["ICU", "ER"], "is_internal": false}
+    {"any": [{...}, {...}]}, {"all": [...]}, {"not": {...}}
+"""
+import logging
+import operator
+import threading
+from dataclasses import dataclass
+
+from .models import Ticket, WorkflowStage, WorkflowTransition
+
+logger = logging.getLogger(__name__)
+
+OPERATORS = {
+    'exact': operator.eq,
+    'ne': operator.ne,
+    'in': lambda value, arg: value in arg,
+    'gt': operator.gt,
+    'gte': operator.ge,
+    'lt': operator.lt,
+    'lte': operator.le,
+    'isnull': lambda value, arg: (value is None) == bool(arg),
+}
+
+TICKET_FIELDS = {f.name: f.attname for f in Ticket._meta.concrete_fields}
+
+
+def compile_condition(condition):
+    """Turn a condition dict into a predicate taking a ticket. Raises ValueError if malformed."""
+    if not condition:
+        return lambda ticket: True
+    if not isinstance(condition, dict):
+        raise ValueError('Condition must be an object')
+
+    predicates = []
+    for key, arg in condition.items():
+        if key in ('all', 'any'):
+            if not isinstance(arg, list):
+                raise ValueError(f'"{key}" expects a list of conditions')
+            parts = [compile_condition(c) for c in arg]
+            combine = all if key == 'all' else any
+            predicates.append(lambda t, parts=parts, combine=combine: combine(p(t) for p in parts))
+        elif key == 'not':
+            inner = compile_condition(arg)
+            predicates.append(lambda t, inner=inner: not inner(t))
+        else:
+            field, _, op = key.partition('__')
+            op = op or 'exact'
+            if field not in TICKET_FIELDS:
+                raise ValueError(f'Unknown ticket field "{field}"')
+            if op not in OPERATORS:
+                raise ValueError(f'Unknown operator "{op}"')
+            attname, compare = TICKET_FIELDS[field], OPERATORS[op]
+
+            def predicate(t, attname=attname, compare=compare, arg=arg):
+                value = getattr(t, attname)
+                if value is None and compare is not OPERATORS['isnull']:
+                    return compare is operator.ne and arg is not None
+                if attname.endswith('_id') and value is not None:
+                    value = str(value)
+                return compare(value, arg)
+            predicates.append(predicate)
+
+    return lambda ticket: all(p(ticket) for p in predicates)
+
+
+@dataclass(frozen=True)
+class StageNode:
+    id: object
+    key: str
+    name: str
+    position: int
+    sla_hours: object
+    default_assignee_role: object
+
+
+class CompiledWorkflow:
+    def __init__(self, category_id, version, stages, transitions):
+        self.category_id = category_id
+        self.version = version
+        self.stages = {
+            s.id: StageNode(s.id, s.key, s.name, s.position, s.sla_hours, s.default_assignee_role)
+            for s in stages
+        }
+        ordered = sorted(self.stages.values(), key=lambda s: s.position)
+        self.initial_stage = ordered[0] if ordered else None
+        # with no transitions configured the workflow is free-form between active stages
+        self.free_form = not transitions
+
+        self.edges = {}
+        for t in transitions:
+            if t.from_stage_id not in self.stages or t.to_stage_id not in self.stages:
+                continue
+            try:
+                predicate = compile_condition(t.condition)
+            except ValueError as exc:
+                logger.warning('Ignoring transition %s with invalid condition: %s', t.id, exc)
+                continue
+            self.edges.setdefault(t.from_stage_id, {}).setdefault(t.to_stage_id, []).append(predicate)
+
+    @classmethod
+    def compile(cls, category):
+        stages = list(WorkflowStage.objects.filter(category=category, is_active=True))
+        transitions = list(WorkflowTransition.objects.filter(category=category))
+        return cls(category.pk, category.workflow_version, stages, transitions)
+
+    def can_transition(self, ticket, to_stage_id):
+        if to_stage_id not in self.stages or to_stage_id == ticket.current_stage_id:
+            return False
+        if ticket.current_stage_id is None:
+            return self.free_form or to_stage_id == self.initial_stage.id
+        if self.free_form:
+            return True
+        predicates = self.edges.get(ticket.current_stage_id, {}).get(to_stage_id, ())
+        return any(p(ticket) for p in predicates)
+
+    def next_stages(self, ticket):
+        if self.free_form or ticket.current_stage_id is None:
+            candidates = self.stages
+        else:
+            candidates = self.edges.get(ticket.current_stage_id, {})
+        return sorted(
+            (self.stages[sid] for sid in candidates if self.can_transition(ticket, sid)),
+            key=lambda s: s.position,
+        )
+
+
+_graphs = {}
+_graphs_lock = threading.Lock()
+
+
+def workflow_for(category):
+    """Compiled graph for `category`, recompiled only when its workflow_version moved."""
+    with _graphs_lock:
+        graph = _graphs.get(category.pk)
+    if graph is not None and graph.version == category.workflow_version:
+        return graph
+    graph = CompiledWorkflow.compile(category)
+    with _graphs_lock:
+        _graphs[category.pk] = graph
+    return graph